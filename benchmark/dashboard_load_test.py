@@ -0,0 +1,305 @@
+"""
+Load test query dashboard Streamlit.
+
+Memutar ulang campuran query dashboard (KPI, trend, kategori, top-N produk/
+kota/karyawan, hari libur, opsi filter, serta histori & forecast precomputed
+untuk halaman Prediction) dengan kombinasi filter acak pada tingkat
+konkurensi tertentu terhadap Postgres lokal. Template query diambil langsung
+dari visualization/utils/dashboard.py, jadi yang diukur sama dengan yang
+dijalankan aplikasi.
+
+Laporan per widget: jumlah request, error, latensi p50/p95/p99/max (ms),
+baris hasil, dan baris yang dipindai (dari sampel EXPLAIN ANALYZE), ditambah
+waktu render satu halaman: query widget berurutan vs serentak.
+
+Contoh:
+    POSTGRES_HOST=localhost python benchmark/dashboard_load_test.py \
+        --concurrency 16 --requests 2000 --path aggregates
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import logging
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+VISUALIZATION_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'visualization')
+
+FILTER_OPTION_QUERIES = {
+    'filter.min_date': "SELECT MIN(fulldate) FROM dwh.dimdate",
+    'filter.max_date': "SELECT MAX(fulldate) FROM dwh.dimdate",
+    'filter.categories': "SELECT DISTINCT categoryname FROM dwh.dimproduct ORDER BY categoryname",
+}
+
+# Query halaman Prediction untuk seri total (lihat visualization/utils/forecast.py):
+# histori dari agregat harian + forecast precomputed dari ETL
+FORECAST_HISTORY_QUERY = """
+SELECT a.fulldate, SUM(a.revenue) as revenue
+FROM dwh.aggdailycategory a
+GROUP BY a.fulldate
+ORDER BY a.fulldate
+"""
+FORECAST_QUERY = """
+SELECT fulldate, revenue
+FROM dwh.forecast
+WHERE seriestype = 'total' AND seriesname = 'All'
+ORDER BY fulldate
+"""
+
+SCAN_NODES = ('Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+
+def setup_dashboard_modules(concurrency):
+    """
+    Mengimpor modul dashboard (config, utils.*) dengan ukuran pool sesuai
+    konkurensi. Default host untuk load test adalah Postgres lokal.
+    """
+    os.environ.setdefault('POSTGRES_HOST', 'localhost')
+    os.environ['DB_POOL_SIZE'] = str(concurrency)
+    sys.path.insert(0, VISUALIZATION_DIR)
+    from utils import dashboard, db
+    return dashboard, db
+
+
+def build_workload(dashboard, path):
+    """
+    Daftar (label, fungsi render SQL) yang dipilih acak oleh setiap request.
+    Setiap fungsi menerima kategori terpilih dan mengembalikan SQL final.
+    """
+    workload = {}
+    use_aggregates = path == 'aggregates'
+    for widget in dashboard.WIDGETS:
+        workload[f'widget.{widget}'] = lambda cats, w=widget: dashboard.widget_queries(cats, use_aggregates)[w]
+    for label, query in FILTER_OPTION_QUERIES.items():
+        workload[label] = lambda cats, q=query: q
+    workload['prediction.history'] = lambda cats: FORECAST_HISTORY_QUERY
+    workload['prediction.forecast'] = lambda cats: FORECAST_QUERY
+    return workload
+
+
+def filter_domain(engine):
+    with engine.connect() as conn:
+        min_date, max_date = conn.execute(text("SELECT MIN(fulldate), MAX(fulldate) FROM dwh.dimdate")).one()
+        categories = conn.execute(text(
+            "SELECT DISTINCT categoryname FROM dwh.dimproduct WHERE categoryname IS NOT NULL ORDER BY categoryname"
+        )).scalars().all()
+    if min_date is None:
+        raise RuntimeError("dwh.dimdate kosong, jalankan ETL terlebih dahulu.")
+    return min_date, max_date, categories
+
+
+def random_filters(rng, min_date, max_date, categories):
+    """Rentang tanggal & subset kategori acak (kadang semua kategori, seperti default UI)."""
+    span = (max_date - min_date).days
+    start_offset = rng.randint(0, span)
+    end_offset = rng.randint(start_offset, span)
+    start = min_date + timedelta(days=start_offset)
+    end = min_date + timedelta(days=end_offset)
+    if rng.random() < 0.3 or not categories:
+        cats = list(categories)
+    else:
+        cats = rng.sample(categories, rng.randint(1, len(categories)))
+    return start, end, cats
+
+
+def rows_scanned(plan):
+    """Total baris yang dibaca node scan pada plan EXPLAIN ANALYZE (JSON)."""
+    total = 0
+    if plan.get('Node Type') in SCAN_NODES:
+        total += plan.get('Actual Rows', 0) * plan.get('Actual Loops', 1)
+        total += plan.get('Rows Removed by Filter', 0) * plan.get('Actual Loops', 1)
+    for child in plan.get('Plans', []):
+        total += rows_scanned(child)
+    return total
+
+
+def explain_workload(engine, dashboard, workload, domain, seed, samples):
+    """Sampel EXPLAIN ANALYZE per label: rata-rata baris dipindai & buffer."""
+    rng = random.Random(seed)
+    explained = {}
+    with engine.connect() as conn:
+        for label, render in workload.items():
+            scanned, buffers = [], []
+            for _ in range(samples):
+                start, end, cats = random_filters(rng, *domain)
+                params = dashboard.get_filter_params(start, end, cats)
+                plan = conn.execute(
+                    text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {render(cats)}"), params
+                ).scalar()[0]['Plan']
+                scanned.append(rows_scanned(plan))
+                buffers.append(plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0))
+            explained[label] = {
+                'rows_scanned': float(np.mean(scanned)),
+                'shared_blocks': float(np.mean(buffers)),
+            }
+    return explained
+
+
+def run_load(dashboard, db, workload, domain, args):
+    engine = db.get_engine()
+    labels = list(workload)
+    samples = []
+
+    def one_request(i):
+        rng = random.Random(args.seed + i)
+        label = rng.choice(labels)
+        start, end, cats = random_filters(rng, *domain)
+        params = dashboard.get_filter_params(start, end, cats)
+        query = workload[label](cats)
+        started = time.perf_counter()
+        try:
+            if args.use_cache:
+                rows = len(db.read_query(query, params))
+            else:
+                with engine.connect() as conn:
+                    rows = len(conn.execute(text(query), params).fetchall())
+            error = None
+        except Exception as e:
+            rows, error = 0, str(e)
+        return {'label': label, 'ms': (time.perf_counter() - started) * 1000, 'rows': rows, 'error': error}
+
+    logging.info(
+        f"Load test: {args.requests} request, konkurensi {args.concurrency}, "
+        f"jalur {args.path}, cache {'aktif' if args.use_cache else 'nonaktif'}..."
+    )
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        samples = list(executor.map(one_request, range(args.requests)))
+    return samples, time.perf_counter() - started
+
+
+def compare_render(engine, dashboard, domain, args):
+    """
+    Waktu satu render halaman Dashboard (tanpa cache): query widget dijalankan
+    berurutan vs serentak di pool koneksi seperti di aplikasi. Render serentak
+    idealnya mendekati query widget paling lambat.
+    """
+    rng = random.Random(args.seed)
+    use_aggregates = args.path == 'aggregates'
+
+    def run_one(query, params):
+        with engine.connect() as conn:
+            started = time.perf_counter()
+            conn.execute(text(query), params).fetchall()
+            return (time.perf_counter() - started) * 1000
+
+    sequential, concurrent, slowest = [], [], []
+    with ThreadPoolExecutor(max_workers=len(dashboard.WIDGETS)) as executor:
+        for _ in range(args.render_samples):
+            start, end, cats = random_filters(rng, *domain)
+            params = dashboard.get_filter_params(start, end, cats)
+            queries = list(dashboard.widget_queries(cats, use_aggregates).values())
+
+            started = time.perf_counter()
+            for query in queries:
+                run_one(query, params)
+            sequential.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            latencies = list(executor.map(lambda q: run_one(q, params), queries))
+            concurrent.append((time.perf_counter() - started) * 1000)
+            slowest.append(max(latencies))
+    return {
+        'render_samples': args.render_samples,
+        'sequential_p50_ms': float(np.percentile(sequential, 50)),
+        'concurrent_p50_ms': float(np.percentile(concurrent, 50)),
+        'slowest_widget_p50_ms': float(np.percentile(slowest, 50)),
+    }
+
+
+def summarize(samples, explained):
+    df = pd.DataFrame(samples)
+    summary = []
+    for label, group in df.groupby('label'):
+        ok = group[group['error'].isna()]
+        latency = ok['ms'].to_numpy() if not ok.empty else np.array([np.nan])
+        summary.append({
+            'label': label,
+            'requests': len(group),
+            'errors': int(group['error'].notna().sum()),
+            'p50_ms': float(np.percentile(latency, 50)),
+            'p95_ms': float(np.percentile(latency, 95)),
+            'p99_ms': float(np.percentile(latency, 99)),
+            'max_ms': float(np.max(latency)),
+            'avg_rows': float(ok['rows'].mean()) if not ok.empty else 0.0,
+            **explained.get(label, {}),
+        })
+    return pd.DataFrame(summary).sort_values('p95_ms', ascending=False)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test query dashboard")
+    parser.add_argument('--concurrency', type=int, default=8, help="Jumlah user virtual paralel.")
+    parser.add_argument('--requests', type=int, default=1000, help="Total request yang dikirim.")
+    parser.add_argument(
+        '--path',
+        choices=['aggregates', 'fact'],
+        default='aggregates',
+        help="Jalur query dashboard: tabel agregat harian atau scan fakta.",
+    )
+    parser.add_argument('--use-cache', action='store_true', help="Lewat read_query (cache hasil query dashboard).")
+    parser.add_argument('--explain-samples', type=int, default=3, help="Sampel EXPLAIN ANALYZE per label (0 = lewati).")
+    parser.add_argument(
+        '--render-samples',
+        type=int,
+        default=20,
+        help="Render dashboard untuk perbandingan berurutan vs serentak (0 = lewati).",
+    )
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    dashboard, db = setup_dashboard_modules(args.concurrency)
+    engine = db.get_engine()
+    domain = filter_domain(engine)
+    workload = build_workload(dashboard, args.path)
+
+    explained = {}
+    if args.explain_samples > 0:
+        explained = explain_workload(engine, dashboard, workload, domain, args.seed, args.explain_samples)
+
+    samples, wall_seconds = run_load(dashboard, db, workload, domain, args)
+    summary = summarize(samples, explained)
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+    logging.info(f"Throughput: {len(samples) / wall_seconds:,.1f} request/detik ({wall_seconds:.1f}s).")
+    if args.use_cache:
+        logging.info(f"Statistik cache: {db.cache_stats()}")
+
+    render = {}
+    if args.render_samples > 0:
+        render = compare_render(engine, dashboard, domain, args)
+        logging.info(
+            f"Render dashboard p50: berurutan {render['sequential_p50_ms']:,.1f} ms, "
+            f"serentak {render['concurrent_p50_ms']:,.1f} ms "
+            f"(widget terlambat {render['slowest_widget_p50_ms']:,.1f} ms)."
+        )
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"dashboard_load_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(out_path, 'w') as f:
+        json.dump({
+            'args': vars(args),
+            'wall_seconds': wall_seconds,
+            'throughput_rps': len(samples) / wall_seconds,
+            'widgets': summary.to_dict(orient='records'),
+            'render': render,
+        }, f, indent=2)
+    logging.info(f"Hasil load test disimpan di {out_path}.")
+    return 1 if summary['errors'].sum() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Generator data sintetis untuk benchmark ETL.
+
+Menghasilkan CSV dengan skema yang sama seperti data/raw/ (dataset grocery
+sales + cuaca), pada faktor skala tertentu. Skala 1x meniru ukuran dataset
+asli; dimensi "besar" (customers, products, employees) dan sales dikalikan
+faktor skala, sedangkan dimensi referensi (kategori, negara, kota) tetap
+sehingga join & cuaca per kota tetap realistis.
+
+Contoh:
+    python benchmark/generate_data.py --scale 10 --out benchmark/data/sf10
+"""
+import os
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Jumlah baris pada skala 1x (mengikuti dataset grocery sales asli)
+BASE_ROWS = {
+    'categories': 11,
+    'countries': 206,
+    'cities': 96,
+    'products': 452,
+    'employees': 23,
+    'customers': 98759,
+    'sales': 6758125,
+}
+# Dimensi yang ikut dikalikan faktor skala
+SCALED_TABLES = ('products', 'employees', 'customers', 'sales')
+
+SALES_START = pd.Timestamp('2018-01-01')
+SALES_END = pd.Timestamp('2018-12-31 23:59:59')
+# Sebagian kecil SalesDate kosong, seperti di data asli
+NULL_DATE_RATIO = 0.01
+SALES_BLOCK_ROWS = 1_000_000
+
+CATEGORY_NAMES = [
+    'Confections', 'Shell fish', 'Cereals', 'Dairy', 'Beverages', 'Seafood',
+    'Meat', 'Grain', 'Poultry', 'Snails', 'Produce',
+]
+FIRST_NAMES = [
+    'Stefanie', 'Sandy', 'Lee', 'Regina', 'Daphne', 'Tonya', 'Kelli', 'Marion',
+    'Devon', 'Wendi', 'Chadwick', 'Pablo', 'Darnell', 'Katina', 'Lance', 'Holly',
+]
+CLASSES = ['Low', 'Medium', 'High']
+ALPHANUM = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'))
+
+
+def scaled_rows(table, scale, sales_rows=None):
+    if table == 'sales' and sales_rows:
+        return int(sales_rows * scale)
+    if table in SCALED_TABLES:
+        return max(1, int(BASE_ROWS[table] * scale))
+    return BASE_ROWS[table]
+
+
+def random_codes(rng, n, length):
+    """n string acak alfanumerik sepanjang length (vektor, tanpa loop Python)."""
+    chars = rng.choice(ALPHANUM, size=(n, length))
+    return chars.view(f'<U{length}').ravel()
+
+
+def write_csv(df, out_dir, file_name):
+    path = os.path.join(out_dir, file_name)
+    df.to_csv(path, index=False)
+    logging.info(f"{file_name}: {len(df)} baris ({os.path.getsize(path) / 1024 / 1024:.1f} MB).")
+
+
+def generate_reference(rng, out_dir, counts):
+    categories = pd.DataFrame({
+        'CategoryID': np.arange(1, counts['categories'] + 1),
+        'CategoryName': [CATEGORY_NAMES[i % len(CATEGORY_NAMES)] for i in range(counts['categories'])],
+    })
+    write_csv(categories, out_dir, 'categories.csv')
+
+    countries = pd.DataFrame({
+        'CountryID': np.arange(1, counts['countries'] + 1),
+        'CountryName': [f'Country {i}' for i in range(1, counts['countries'] + 1)],
+        'CountryCode': random_codes(rng, counts['countries'], 2),
+    })
+    write_csv(countries, out_dir, 'countries.csv')
+
+    cities = pd.DataFrame({
+        'CityID': np.arange(1, counts['cities'] + 1),
+        'CityName': [f'City {i}' for i in range(1, counts['cities'] + 1)],
+        'Zipcode': rng.integers(10000, 99999, counts['cities']),
+        'CountryID': 32,
+        'Latitude': rng.uniform(25, 49, counts['cities']).round(4),
+        'Longitude': rng.uniform(-124, -67, counts['cities']).round(4),
+    })
+    write_csv(cities, out_dir, 'cities_MODIFIED_with_coords.csv')
+    return cities
+
+
+def generate_dimensions(rng, out_dir, counts):
+    products = pd.DataFrame({
+        'ProductID': np.arange(1, counts['products'] + 1),
+        'ProductName': [f'Product {i}' for i in range(1, counts['products'] + 1)],
+        'Price': rng.uniform(0.5, 100, counts['products']).round(4),
+        'CategoryID': rng.integers(1, counts['categories'] + 1, counts['products']),
+        'Class': rng.choice(CLASSES, counts['products']),
+        'ModifyDate': '2018-02-12 03:51:45.850',
+        'Resistant': rng.choice(['Durable', 'Weak', 'Unknown'], counts['products']),
+        'IsAllergic': rng.choice(['True', 'False', 'Unknown'], counts['products']),
+        'VitalityDays': rng.integers(0, 120, counts['products']),
+    })
+    write_csv(products, out_dir, 'products.csv')
+
+    employees = pd.DataFrame({
+        'EmployeeID': np.arange(1, counts['employees'] + 1),
+        'FirstName': rng.choice(FIRST_NAMES, counts['employees']),
+        'MiddleInitial': random_codes(rng, counts['employees'], 1),
+        'LastName': random_codes(rng, counts['employees'], 8),
+        'BirthDate': '1975-06-21 00:00:00.000',
+        'Gender': rng.choice(['M', 'F'], counts['employees']),
+        'CityID': rng.integers(1, counts['cities'] + 1, counts['employees']),
+        'HireDate': pd.to_datetime(
+            rng.integers(pd.Timestamp('2010-01-01').value, pd.Timestamp('2017-12-31').value, counts['employees'])
+        ).strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3],
+    })
+    write_csv(employees, out_dir, 'employees.csv')
+
+    customers = pd.DataFrame({
+        'CustomerID': np.arange(1, counts['customers'] + 1),
+        'FirstName': rng.choice(FIRST_NAMES, counts['customers']),
+        'MiddleInitial': random_codes(rng, counts['customers'], 1),
+        'LastName': random_codes(rng, counts['customers'], 8),
+        'CityID': rng.integers(1, counts['cities'] + 1, counts['customers']),
+        'Address': pd.Series(rng.integers(1, 9999, counts['customers'])).astype(str) + ' Main Street',
+    })
+    write_csv(customers, out_dir, 'customers.csv')
+
+
+def generate_weather(rng, out_dir, cities):
+    """Cuaca harian sepanjang 2018 untuk setiap kota (format export Open-Meteo)."""
+    days = pd.date_range(SALES_START, SALES_END.normalize(), freq='D')
+    grid = pd.MultiIndex.from_product([days, cities['CityName']], names=['time', 'CityName']).to_frame(index=False)
+    n = len(grid)
+    grid['time'] = grid['time'].dt.strftime('%Y-%m-%d')
+    grid['temperature_2m_max'] = rng.normal(20, 8, n).round(1)
+    grid['windspeed_10m_max'] = rng.gamma(2.0, 8.0, n).round(1)
+    grid['precipitation_sum'] = np.where(rng.random(n) < 0.7, 0.0, rng.gamma(1.5, 4.0, n)).round(1)
+    write_csv(grid, out_dir, 'weather_mentah.csv')
+
+
+def generate_sales(rng, out_dir, counts, block_rows=SALES_BLOCK_ROWS):
+    """Menulis sales.csv per blok agar memori tetap kecil berapapun skalanya."""
+    path = os.path.join(out_dir, 'sales.csv')
+    total = counts['sales']
+    span = SALES_END.value - SALES_START.value
+    written = 0
+    with open(path, 'w', newline='') as f:
+        while written < total:
+            n = min(block_rows, total - written)
+            dates = pd.to_datetime(SALES_START.value + rng.integers(0, span, n, dtype=np.int64))
+            sales_date = pd.Series(dates.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3])
+            sales_date[rng.random(n) < NULL_DATE_RATIO] = ''
+            block = pd.DataFrame({
+                'SalesID': np.arange(written + 1, written + n + 1),
+                'SalesPersonID': rng.integers(1, counts['employees'] + 1, n),
+                'CustomerID': rng.integers(1, counts['customers'] + 1, n),
+                'ProductID': rng.integers(1, counts['products'] + 1, n),
+                'Quantity': rng.integers(1, 26, n),
+                'Discount': rng.choice([0.0, 0.0, 0.0, 0.1, 0.2], n),
+                # Sama seperti data asli: TotalPrice 0, dihitung ulang oleh ETL
+                'TotalPrice': 0.0,
+                'SalesDate': sales_date,
+                'TransactionNumber': random_codes(rng, n, 20),
+            })
+            block.to_csv(f, index=False, header=written == 0)
+            written += n
+            logging.info(f"sales.csv: {written}/{total} baris.")
+    logging.info(f"sales.csv: {total} baris ({os.path.getsize(path) / 1024 / 1024:.1f} MB).")
+
+
+def generate(out_dir, scale, seed=42, sales_rows=None):
+    """Membuat seluruh CSV sumber pada skala tertentu di out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    counts = {table: scaled_rows(table, scale, sales_rows) for table in BASE_ROWS}
+    logging.info(f"Membuat data sintetis skala {scale}x di {out_dir}: {counts}")
+    start = time.perf_counter()
+    cities = generate_reference(rng, out_dir, counts)
+    generate_dimensions(rng, out_dir, counts)
+    generate_weather(rng, out_dir, cities)
+    generate_sales(rng, out_dir, counts)
+    logging.info(f"Data skala {scale}x selesai dalam {time.perf_counter() - start:.1f}s.")
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generator data sintetis untuk benchmark ETL")
+    parser.add_argument('--scale', type=float, default=1.0, help="Faktor skala (1 = ukuran dataset asli).")
+    parser.add_argument('--out', help="Folder output (default: benchmark/data/sf<scale>).")
+    parser.add_argument('--seed', type=int, default=42, help="Seed acak agar data dapat direproduksi.")
+    parser.add_argument(
+        '--sales-rows',
+        type=int,
+        help=f"Jumlah baris sales pada skala 1x (default {BASE_ROWS['sales']}).",
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    out_dir = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', f'sf{args.scale:g}')
+    generate(out_dir, args.scale, seed=args.seed, sales_rows=args.sales_rows)
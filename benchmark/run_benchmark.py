@@ -0,0 +1,152 @@
+"""
+Benchmark skala untuk etl.py.
+
+Untuk setiap faktor skala: buat data sintetis (generate_data.py) bila belum
+ada, jalankan pipeline penuh `etl.py --full-refresh` terhadap Postgres lokal,
+lalu kumpulkan statistik per fase (durasi, baris, rows/sec, peak RSS) dari
+JSON lines instrumentasi ETL (meta.etl_run_stats / logs/etl_run_stats.jsonl).
+
+Contoh (Postgres dari docker-compose, port 5432 di-expose ke host):
+    POSTGRES_USER=... POSTGRES_PASSWORD=... POSTGRES_DB=... \
+    python benchmark/run_benchmark.py --scales 1 10 100
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+import subprocess
+import time
+
+import pandas as pd
+
+from generate_data import generate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+
+def prepare_workdir(scale, data_dir):
+    """
+    etl.py memakai path relatif (./data/raw, scheme.sql, logs/), jadi setiap
+    skala dijalankan dari folder kerja sendiri yang menunjuk ke data sintetis.
+    """
+    workdir = os.path.join(RESULTS_DIR, 'runs', f'sf{scale:g}')
+    os.makedirs(os.path.join(workdir, 'data'), exist_ok=True)
+    os.makedirs(os.path.join(workdir, 'logs'), exist_ok=True)
+    links = {
+        os.path.join(workdir, 'data', 'raw'): data_dir,
+        os.path.join(workdir, 'scheme.sql'): os.path.join(REPO_DIR, 'scheme.sql'),
+    }
+    for link, target in links.items():
+        if os.path.islink(link) or os.path.exists(link):
+            os.remove(link)
+        os.symlink(os.path.abspath(target), link)
+    return workdir
+
+
+def run_etl(workdir, extra_args):
+    """Menjalankan etl.py di workdir, mengembalikan (exit code, detik, path stats)."""
+    stats_log = os.path.join(workdir, 'logs', 'etl_run_stats.jsonl')
+    if os.path.exists(stats_log):
+        os.remove(stats_log)
+    env = dict(os.environ)
+    env.setdefault('POSTGRES_HOST', 'localhost')
+    env['ETL_RUN_STATS_LOG'] = stats_log
+    env['ETL_LAKE_DIR'] = os.path.join(workdir, 'data', 'lake')
+
+    command = [sys.executable, os.path.join(REPO_DIR, 'etl.py')] + extra_args
+    logging.info(f"Menjalankan {' '.join(command)} di {workdir}...")
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, env=env)
+    return result.returncode, time.perf_counter() - start, stats_log
+
+
+def summarize(scale, stats_log, wall_seconds, exit_code):
+    """Ringkasan per fase dari JSON lines instrumentasi satu run."""
+    steps = []
+    if os.path.exists(stats_log):
+        with open(stats_log) as f:
+            steps = [json.loads(line) for line in f if line.strip()]
+    phases = [step for step in steps if step['phase'] == 'run']
+    peak_rss = max((step['peak_rss_mb'] or 0 for step in steps), default=None)
+    return {
+        'scale': scale,
+        'exit_code': exit_code,
+        'wall_seconds': round(wall_seconds, 2),
+        'peak_rss_mb': peak_rss,
+        'phases': {
+            step['step']: {
+                'seconds': step['seconds'],
+                'rows': step['rows'],
+                'rows_per_sec': step['rows_per_sec'],
+            }
+            for step in phases
+        },
+        'steps': steps,
+    }
+
+
+def print_report(results):
+    rows = []
+    for result in results:
+        for phase, stat in result['phases'].items():
+            rows.append({
+                'scale': f"{result['scale']:g}x",
+                'phase': phase,
+                'seconds': stat['seconds'],
+                'rows': stat['rows'],
+                'rows_per_sec': stat['rows_per_sec'],
+                'peak_rss_mb': result['peak_rss_mb'],
+            })
+    if not rows:
+        logging.warning("Tidak ada statistik fase yang terkumpul.")
+        return
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark skala pipeline ETL")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100], help="Faktor skala yang diuji.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--sales-rows', type=int, help="Jumlah baris sales pada skala 1x (default: ukuran dataset asli).")
+    parser.add_argument('--regenerate', action='store_true', help="Buat ulang data walaupun sudah ada.")
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Jalankan ETL tanpa --full-refresh (mengukur run incremental di atas DWH yang ada).",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    etl_args = ['--force'] if args.incremental else ['--full-refresh']
+
+    results = []
+    for scale in args.scales:
+        data_dir = os.path.join(DATA_DIR, f'sf{scale:g}')
+        if args.regenerate or not os.path.exists(os.path.join(data_dir, 'sales.csv')):
+            generate(data_dir, scale, seed=args.seed, sales_rows=args.sales_rows)
+        workdir = prepare_workdir(scale, data_dir)
+        exit_code, wall_seconds, stats_log = run_etl(workdir, etl_args)
+        if exit_code != 0:
+            logging.error(f"ETL skala {scale:g}x GAGAL (exit code {exit_code}), lihat {workdir}/logs.")
+        results.append(summarize(scale, stats_log, wall_seconds, exit_code))
+
+    out_path = os.path.join(RESULTS_DIR, f"benchmark_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_report(results)
+    logging.info(f"Hasil benchmark disimpan di {out_path}.")
+    return 1 if any(result['exit_code'] != 0 for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
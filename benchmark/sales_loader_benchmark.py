@@ -0,0 +1,106 @@
+"""
+Benchmark loader to_sql untuk sales.csv: loop lama vs pipeline.
+
+Membandingkan throughput memuat sales.csv ke datalake.sales_mentah dengan
+ukuran chunk yang sama:
+- loop     : etl.to_sql_csv_to_datalake, parse lalu tulis bergantian per chunk
+- pipeline : etl.pipelined_csv_to_datalake, parse & tulis bersamaan dengan
+             antrean terbatas, untuk setiap jumlah writer di --writers
+
+Data sintetis dibuat dengan generate_data.py bila belum ada.
+
+Contoh:
+    POSTGRES_USER=... POSTGRES_PASSWORD=... POSTGRES_DB=... \
+    python benchmark/sales_loader_benchmark.py --scale 1 --writers 1 2 4
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+import time
+
+import pandas as pd
+
+from generate_data import generate
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+
+def setup_etl(writers):
+    """
+    Mengimpor etl.py dari folder kerja sendiri (etl.py menulis ke logs/ relatif),
+    dengan pool koneksi yang cukup untuk jumlah writer terbanyak.
+    """
+    workdir = os.path.join(RESULTS_DIR, 'runs', 'sales_loader')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ.setdefault('POSTGRES_HOST', 'localhost')
+    os.environ['ETL_PIPELINE_WRITERS'] = str(max(writers))
+    os.environ['ETL_RUN_STATS_LOG'] = os.path.join(workdir, 'etl_run_stats.jsonl')
+    sys.path.insert(0, REPO_DIR)
+    import etl
+    return etl
+
+
+def run_variant(name, load):
+    logging.info(f"Menjalankan varian {name}...")
+    start = time.perf_counter()
+    rows = load()
+    seconds = time.perf_counter() - start
+    logging.info(f"{name}: {rows} baris dalam {seconds:.2f}s ({rows / seconds:,.0f} rows/sec).")
+    return {'variant': name, 'rows': rows, 'seconds': round(seconds, 2), 'rows_per_sec': rows / seconds}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark loader to_sql sales: loop vs pipeline")
+    parser.add_argument('--scale', type=float, default=1.0, help="Faktor skala data sintetis.")
+    parser.add_argument('--sales-rows', type=int, help="Jumlah baris sales pada skala 1x (default: ukuran dataset asli).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=100000, help="Baris per chunk, sama untuk semua varian.")
+    parser.add_argument('--parsers', type=int, default=1, help="Jumlah parser pipeline.")
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4], help="Jumlah writer pipeline yang diuji.")
+    parser.add_argument('--queue-chunks', type=int, default=2, help="Kapasitas tiap antrean pipeline (chunk).")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    data_dir = os.path.abspath(os.path.join(DATA_DIR, f'sf{args.scale:g}'))
+    csv_path = os.path.join(data_dir, 'sales.csv')
+    if not os.path.exists(csv_path):
+        generate(data_dir, args.scale, seed=args.seed, sales_rows=args.sales_rows)
+
+    etl = setup_etl(args.writers)
+    results = [run_variant(
+        'loop',
+        lambda: etl.to_sql_csv_to_datalake(csv_path, 'sales_mentah', chunk_size=args.chunk_size),
+    )]
+    for writers in args.writers:
+        results.append(run_variant(
+            f'pipeline ({args.parsers}p/{writers}w)',
+            lambda w=writers: etl.pipelined_csv_to_datalake(
+                csv_path, 'sales_mentah', chunk_size=args.chunk_size,
+                parsers=args.parsers, writers=w, queue_chunks=args.queue_chunks,
+            ),
+        ))
+
+    report = pd.DataFrame(results)
+    report['speedup'] = report['rows_per_sec'] / report['rows_per_sec'].iloc[0]
+    print(report.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"sales_loader_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    with open(out_path, 'w') as f:
+        json.dump({'args': vars(args), 'variants': report.to_dict(orient='records')}, f, indent=2)
+    logging.info(f"Hasil benchmark loader disimpan di {out_path}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
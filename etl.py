@@ -1,8 +1,25 @@
 import os
+import sys
+import argparse
+import re
+import csv
+import json
+import io
+import queue
+import shutil
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, Date, Text
+from sqlalchemy.exc import OperationalError
 import logging
 import requests
+import time
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 # --- 1. Konfigurasi Logging ---
 os.makedirs('logs', exist_ok=True) 
@@ -16,99 +33,1350 @@ logging.basicConfig(
     ]
 )
 
-# --- 2. Konfigurasi Koneksi Database ---
-try:
-    db_user = os.environ.get('POSTGRES_USER')
-    db_pass = os.environ.get('POSTGRES_PASSWORD')
-    db_host = os.environ.get('POSTGRES_HOST')
-    db_name = os.environ.get('POSTGRES_DB')
-    
-    connection_string = f"postgresql://{db_user}:{db_pass}@{db_host}:5432/{db_name}"
-    engine = create_engine(connection_string)
-    logging.info("Koneksi ke database Postgres berhasil!")
+# --- 2. Konfigurasi Loader Data Lake ---
+# 'copy'   : COPY ... FROM STDIN (bulk, byte CSV langsung dari disk)
+# 'to_sql' : cara lama via pandas DataFrame.to_sql (INSERT per baris)
+BULK_LOADER = os.environ.get('ETL_BULK_LOADER', 'copy').lower()
+# Ukuran chunk loader to_sql. Default 0 = dihitung dari anggaran memori
+# (ETL_SALES_MEMORY_MB) dan ukuran baris hasil sampel bertipe.
+SALES_CHUNK_SIZE = int(os.environ.get('ETL_SALES_CHUNK_SIZE', '0'))
+SALES_MEMORY_BUDGET_MB = int(os.environ.get('ETL_SALES_MEMORY_MB', '256'))
+# Faktor pengali ukuran DataFrame untuk salinan sementara saat to_sql
+CHUNK_MEMORY_OVERHEAD = 4
+# Pipeline loader to_sql: 1 pembaca membagi CSV per blok baris, parser
+# mengubah blok jadi DataFrame bertipe, writer menulis ke Postgres dengan
+# koneksi masing-masing. ETL_PIPELINE_WRITERS=0 = loop lama (parse lalu tulis
+# bergantian per chunk).
+PIPELINE_PARSERS = int(os.environ.get('ETL_PIPELINE_PARSERS', '1'))
+PIPELINE_WRITERS = int(os.environ.get('ETL_PIPELINE_WRITERS', '2'))
+# Maksimal chunk yang menunggu di tiap antrean (back-pressure ke pembaca)
+PIPELINE_QUEUE_CHUNKS = int(os.environ.get('ETL_PIPELINE_QUEUE_CHUNKS', '2'))
+PIPELINE_CHUNK_RETRIES = int(os.environ.get('ETL_PIPELINE_RETRIES', '3'))
+PIPELINE_RETRY_BACKOFF = 1.0
+# Jumlah baris sampel untuk menebak tipe kolom sebelum COPY
+COPY_SAMPLE_ROWS = 10000
+# Jumlah worker paralel Fase 1 (tiap worker memakai koneksi sendiri dari pool)
+ETL_MAX_WORKERS = int(os.environ.get('ETL_MAX_WORKERS', '4'))
 
-    with engine.connect() as conn:
-        # Reset schema staging agar bersih dari tabel mentah sisa eksekusi lama
-        conn.execute(text("DROP SCHEMA IF EXISTS staging CASCADE;"))
-        conn.execute(text("CREATE SCHEMA staging;"))
-        
-        conn.execute(text("CREATE SCHEMA IF NOT EXISTS datalake;")) # <-- Tambahan Data Lake
-        conn.commit() 
-    logging.info("Schema 'staging' (bersih) dan 'datalake' dipastikan ada.")
-    
-    # Buat schema dan tabel DWH dari scheme.sql
+# Tier data lake berbasis file (opsional):
+# 'postgres' : CSV dimuat langsung ke tabel datalake.*_mentah (default)
+# 'parquet'  : CSV dikonversi ke Parquet di LAKE_DIR (sales dipartisi per bulan),
+#              tabel datalake diisi dari Parquet saat Fase 2
+LAKE_TIER = os.environ.get('ETL_LAKE_TIER', 'postgres').lower()
+LAKE_DIR = os.environ.get('ETL_LAKE_DIR', './data/lake')
+LAKE_BATCH_ROWS = 100000
+
+# API hari libur (date.nager.at): respons di-cache di meta.holiday_api_cache
+HOLIDAY_API_URL = "https://date.nager.at/api/v3/PublicHolidays/{year}/{country_code}"
+HOLIDAY_CACHE_TTL_HOURS = int(os.environ.get('ETL_HOLIDAY_CACHE_TTL_HOURS', '168'))
+# (connect, read) timeout dalam detik, dan jumlah percobaan dengan backoff
+HOLIDAY_API_TIMEOUT = (3.05, 10)
+HOLIDAY_API_RETRIES = int(os.environ.get('ETL_HOLIDAY_API_RETRIES', '3'))
+HOLIDAY_API_BACKOFF = 1.0
+
+# Kalender (DimDate): seluruh tahun yang ada di sales + horizon forecast,
+# hari libur untuk setiap negara di CALENDAR_COUNTRIES (kode ISO, pisah koma)
+CALENDAR_COUNTRIES = [
+    code.strip().upper() for code in os.environ.get('ETL_HOLIDAY_COUNTRIES', 'US').split(',') if code.strip()
+]
+CALENDAR_FORECAST_YEARS = int(os.environ.get('ETL_CALENDAR_FORECAST_YEARS', '1'))
+CALENDAR_DEFAULT_YEAR = 2018
+
+# Penanda di scheme.sql: statement di bawahnya (indeks) baru dibuat setelah bulk load
+DEFERRED_INDEX_MARKER = '-- ========= INDEKS (DIBUAT SETELAH BULK LOAD) ========='
+
+# Publish full load ke DWH:
+# - 'swap'    : DWH baru (tabel, indeks, agregat) dibangun di schema bayangan,
+#               lalu ditukar dengan rename schema dalam satu transaksi singkat.
+#               Versi lama disimpan di dwh_previous untuk rollback.
+# - 'inplace' : TRUNCATE + INSERT langsung di schema dwh.
+PUBLISH_MODE = os.environ.get('ETL_PUBLISH_MODE', 'swap').lower()
+DWH_SCHEMA = 'dwh'
+DWH_SHADOW_SCHEMA = 'dwh_shadow'
+DWH_PREVIOUS_SCHEMA = 'dwh_previous'
+# Rename schema menunggu lock sesingkat mungkin, lalu dicoba ulang
+PUBLISH_LOCK_TIMEOUT = '5s'
+PUBLISH_RETRIES = 5
+# Penanda akhir DDL schema dwh di scheme.sql (setelahnya schema meta)
+DWH_DDL_END_MARKER = '-- ========= METADATA ETL (DALAM SKEMA META) ========='
+
+# Tabel agregat harian untuk dashboard:
+# (tabel, kolom atribut, ekspresi atribut, join tambahan)
+AGGREGATE_TABLES = [
+    ('dwh.aggdailycategory', 'isholiday', 'd.isholiday', ''),
+    ('dwh.aggdailyproduct', 'productname', 'p.productname', ''),
+    ('dwh.aggdailycity', 'cityname', 'l.cityname', 'JOIN dwh.dimlocation l ON f.locationid = l.locationid'),
+    ('dwh.aggdailyemployee', 'employeename', 'e.employeename', 'JOIN dwh.dimemployee e ON f.employeeid = e.employeeid'),
+]
+
+# Skema eksplisit sales.csv: tipe ringkas & konsisten antar chunk (ID Int32
+# nullable, diskon/harga float32, SalesDate di-parse sebagai timestamp).
+# TransactionNumber hampir unik per baris, jadi string biasa, bukan categorical.
+SALES_DTYPES = {
+    'SalesID': 'Int32',
+    'SalesPersonID': 'Int32',
+    'CustomerID': 'Int32',
+    'ProductID': 'Int32',
+    'Quantity': 'Int32',
+    'Discount': 'float32',
+    'TotalPrice': 'float32',
+    'TransactionNumber': 'string',
+}
+SALES_DATE_COLUMNS = ['SalesDate']
+
+# Tabel datalake dengan skema eksplisit: table -> (dtypes, kolom tanggal)
+TYPED_SOURCES = {
+    'sales_mentah': (SALES_DTYPES, SALES_DATE_COLUMNS),
+}
+
+# Natural key baris sales.csv, dasar dedup staging.sales_delta
+SALES_NATURAL_KEY = '"SalesID"'
+# Hash isi baris sales dari bentuk teks ternormalisasi (cast eksplisit per
+# kolom), jadi tidak berubah bila loader datalake menebak tipe kolom berbeda
+SALES_ROW_HASH = """md5(ROW(
+            s."SalesID"::BIGINT, s."SalesPersonID"::BIGINT, s."CustomerID"::BIGINT,
+            s."ProductID"::BIGINT, s."Quantity"::BIGINT, s."Discount"::NUMERIC(10, 4),
+            s."TotalPrice"::NUMERIC(12, 4), s."SalesDate"::TIMESTAMP(3), s."TransactionNumber"::TEXT
+        )::TEXT)"""
+# Incremental: baris dengan SalesDate sampai sekian hari sebelum watermark
+# ikut dicek ulang untuk menangkap koreksi yang datang terlambat
+SALES_LOOKBACK_DAYS = int(os.environ.get('ETL_SALES_LOOKBACK_DAYS', '3'))
+
+# Kolom dwh.factsales yang diisi dari staging.factsales (SalesID dari sequence)
+FACT_COLUMNS = (
+    'dateid, weatherid, productid, customerid, employeeid, locationid, '
+    'quantity, totalprice, discount, salesid_oltp, rowhash'
+)
+
+# Kolom dimensi SCD2 (dibawa utuh ke schema bayangan saat publish swap)
+DIMPRODUCT_COLUMNS = (
+    'productid, productid_oltp, productname, price, categoryname, class, isallergic, '
+    'rowhash, validfrom, validto, iscurrent'
+)
+DIMCUSTOMER_COLUMNS = (
+    'customerid, customerid_oltp, customername, address, customercityname, customercountryname, '
+    'rowhash, validfrom, validto, iscurrent'
+)
+
+RAW_CSV_SOURCES = [
+    ('./data/raw/products.csv', 'products_mentah'),
+    ('./data/raw/categories.csv', 'categories_mentah'),
+    ('./data/raw/employees.csv', 'employees_mentah'),
+    ('./data/raw/customers.csv', 'customers_mentah'),
+    ('./data/raw/cities_MODIFIED_with_coords.csv', 'cities_mentah'),
+    ('./data/raw/countries.csv', 'countries_mentah'),
+    ('./data/raw/weather_mentah.csv', 'weather_mentah'),
+    ('./data/raw/sales.csv', 'sales_mentah'),
+]
+
+# --- 3. Konfigurasi Koneksi Database ---
+db_user = os.environ.get('POSTGRES_USER')
+db_pass = os.environ.get('POSTGRES_PASSWORD')
+db_host = os.environ.get('POSTGRES_HOST')
+db_name = os.environ.get('POSTGRES_DB')
+
+connection_string = f"postgresql+psycopg2://{db_user}:{db_pass}@{db_host}:5432/{db_name}"
+# Pool cukup besar agar tiap worker Fase 1 (dan writer pipeline) dapat koneksi sendiri
+engine = create_engine(
+    connection_string,
+    pool_size=ETL_MAX_WORKERS,
+    max_overflow=2 + PIPELINE_WRITERS,
+    pool_pre_ping=True
+)
+
+def env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ELT Data Lake -> Staging -> DWH")
+    parser.add_argument(
+        '--full-refresh',
+        action='store_true',
+        default=env_flag('ETL_FULL_REFRESH'),
+        help="Drop & bangun ulang tabel DWH lalu muat ulang seluruh fakta (default: incremental)."
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        default=env_flag('ETL_FORCE'),
+        help="Muat & transformasi ulang semua sumber walaupun fingerprint-nya tidak berubah."
+    )
+    parser.add_argument(
+        '--rollback',
+        action='store_true',
+        help="Kembalikan DWH ke versi sebelum publish terakhir (schema dwh_previous) lalu keluar."
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        default=env_flag('ETL_OFFLINE'),
+        help="Jangan memanggil API eksternal, hanya pakai data libur dari meta.holiday_api_cache."
+    )
+    return parser.parse_args()
+
+def read_schema_sql():
+    """
+    Membaca scheme.sql dan memisahkannya menjadi (DDL tabel, DDL indeks).
+    Indeks dibuat terpisah setelah bulk load, lihat create_deferred_indexes().
+    """
     with open('scheme.sql', 'r') as f:
         schema_sql = f.read()
-    
-    with engine.connect() as conn:
-        try:
-            conn.execute(text("DROP TABLE IF EXISTS dwh.factsales CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimweather CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimproduct CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimcustomer CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimemployee CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimlocation CASCADE;"))
-            conn.execute(text("DROP TABLE IF EXISTS dwh.dimdate CASCADE;"))
+    table_sql, _, index_sql = schema_sql.partition(DEFERRED_INDEX_MARKER)
+    return table_sql, index_sql
+
+def in_schema(sql, schema):
+    """Mengarahkan referensi dwh.* (dan CREATE SCHEMA dwh) di SQL ke schema lain."""
+    if schema == DWH_SCHEMA:
+        return sql
+    return re.sub(r'\bdwh(?=[.;])', schema, sql)
+
+def split_sql_statements(sql):
+    """Memecah SQL per ';', kecuali ';' di dalam blok $$ ... $$ (DO di scheme.sql)."""
+    statements, current = [], ''
+    for i, part in enumerate(sql.split('$$')):
+        if i % 2:
+            current += f'$${part}$$'
+            continue
+        first, *rest = part.split(';')
+        if rest:
+            statements.append(current + first)
+            *complete, current = rest
+            statements.extend(complete)
+        else:
+            current += first
+    statements.append(current)
+    return [s.strip() for s in statements if s.strip()]
+
+def deferred_index_names():
+    _, index_sql = read_schema_sql()
+    return re.findall(r'CREATE INDEX IF NOT EXISTS (\w+) ON (\w+)\.', index_sql)
+
+def drop_deferred_indexes():
+    """
+    Dipanggil sebelum full load agar INSERT massal tidak memelihara indeks.
+    """
+    with engine.begin() as conn:
+        for index_name, schema in deferred_index_names():
+            conn.execute(text(f"DROP INDEX IF EXISTS {schema}.{index_name}"))
+
+def create_deferred_indexes(schema=DWH_SCHEMA):
+    """
+    Membuat indeks pendukung query dashboard setelah bulk load, lalu ANALYZE
+    agar planner langsung memakai statistik terbaru.
+    """
+    _, index_sql = read_schema_sql()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for statement in split_sql_statements(in_schema(index_sql, schema)):
+            conn.execute(text(statement))
+        for table in ['factsales', 'dimdate', 'dimproduct']:
+            conn.execute(text(f"ANALYZE {schema}.{table}"))
+    logging.info(f"Indeks {schema} dibuat dalam {time.perf_counter() - start:.2f}s.")
+
+def init_database(full_refresh=False):
+    """
+    Menyiapkan schema staging, datalake, meta dan tabel DWH dari scheme.sql.
+    Tabel DWH hanya di-drop saat full refresh, agar mode incremental
+    bisa melanjutkan dari isi DWH sebelumnya.
+    """
+    try:
+        with engine.connect() as conn:
+            # Reset schema staging agar bersih dari tabel mentah sisa eksekusi lama
+            conn.execute(text("DROP SCHEMA IF EXISTS staging CASCADE;"))
+            conn.execute(text("CREATE SCHEMA staging;"))
+            
+            conn.execute(text("CREATE SCHEMA IF NOT EXISTS datalake;")) # <-- Tambahan Data Lake
+            conn.commit() 
+        logging.info("Koneksi ke database Postgres berhasil!")
+        logging.info("Schema 'staging' (bersih) dan 'datalake' dipastikan ada.")
+        
+        # Buat schema dan tabel DWH dari scheme.sql (indeks menyusul setelah load)
+        schema_sql, _ = read_schema_sql()
+        
+        with engine.connect() as conn:
+            # DWH lama: factsales masih tabel biasa, disisihkan dulu lalu
+            # dipindah ke tabel berpartisi setelah scheme.sql dijalankan
+            legacy_fact = not full_refresh and rename_legacy_factsales(conn)
+            if full_refresh and PUBLISH_MODE == 'swap':
+                # DWH live tetap dibaca dashboard; versi baru dibangun di schema
+                # bayangan dari scheme.sql dan ditukar di akhir FASE 4
+                logging.info("Full refresh mode swap: tabel DWH live tidak di-drop.")
+            elif full_refresh:
+                try:
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.factsales CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimweather CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimproduct CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimcustomer CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimemployee CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimlocation CASCADE;"))
+                    conn.execute(text("DROP TABLE IF EXISTS dwh.dimdate CASCADE;"))
+                    for agg_table, _, _, _ in AGGREGATE_TABLES:
+                        conn.execute(text(f"DROP TABLE IF EXISTS {agg_table} CASCADE;"))
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logging.warning(f"No tables to drop: {e}")
+            
+            # Split SQL statements dan jalankan satu per satu
+            for statement in split_sql_statements(schema_sql):
+                try:
+                    conn.execute(text(statement))
+                except Exception as e:
+                    logging.warning(f"Skipped statement: {e}")
             conn.commit()
-        except Exception as e:
-            logging.warning(f"No tables to drop: {e}")
+
+            if legacy_fact:
+                migrate_legacy_factsales(conn)
+                conn.commit()
+
+            if full_refresh:
+                # Watermark lama tidak berlaku lagi setelah DWH dibangun ulang
+                conn.execute(text("DELETE FROM meta.etl_watermark;"))
+                conn.commit()
+        logging.info("Schema 'dwh' dan 'meta' beserta tabel-tabelnya dipastikan ada.")
         
-        # Split SQL statements dan jalankan satu per satu
-        statements = [s.strip() for s in schema_sql.split(';') if s.strip()]
-        for statement in statements:
+    except Exception as e:
+        logging.error(f"Koneksi database GAGAL: {e}")
+        exit(1)
+
+# --- INSTRUMENTASI RUN ---
+# Setiap fase & sub-langkah mencatat durasi, baris, byte, rows/sec dan peak RSS.
+# Baris ditulis langsung ke JSON lines (tetap ada walau run gagal) dan di akhir
+# run disimpan ke meta.etl_run_stats untuk membandingkan antar run mingguan.
+RUN_ID = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+RUN_STATS_LOG = os.environ.get('ETL_RUN_STATS_LOG', 'logs/etl_run_stats.jsonl')
+_run_stats = []
+_run_stats_lock = threading.Lock()
+
+def peak_rss_mb():
+    """Peak resident memory proses ini (MB), None jika platform tidak mendukung."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KiB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def record_step(phase, step, seconds, rows=None, bytes_processed=None, status='ok', started_at=None):
+    stat = {
+        'run_id': RUN_ID,
+        'phase': phase,
+        'step': step,
+        'status': status,
+        'started_at': started_at or time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() - seconds)),
+        'seconds': round(seconds, 4),
+        'rows': rows,
+        'bytes': bytes_processed,
+        'rows_per_sec': round(rows / seconds, 1) if rows and seconds > 0 else None,
+        'peak_rss_mb': None,
+    }
+    peak = peak_rss_mb()
+    if peak is not None:
+        stat['peak_rss_mb'] = round(peak, 1)
+    with _run_stats_lock:
+        _run_stats.append(stat)
+        with open(RUN_STATS_LOG, 'a') as f:
+            f.write(json.dumps(stat) + '\n')
+    return stat
+
+@contextmanager
+def instrument(phase, step):
+    """
+    Mengukur satu langkah. Pemanggil boleh mengisi metrics['rows'] dan
+    metrics['bytes'] di dalam blok with.
+    """
+    metrics = {'rows': None, 'bytes': None}
+    started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield metrics
+    except Exception:
+        status = 'failed'
+        raise
+    finally:
+        record_step(
+            phase, step, time.perf_counter() - start,
+            rows=metrics['rows'], bytes_processed=metrics['bytes'],
+            status=status, started_at=started_at
+        )
+
+def save_run_stats():
+    """Menyimpan statistik run ini ke meta.etl_run_stats (best effort)."""
+    with _run_stats_lock:
+        stats = list(_run_stats)
+    if not stats:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO meta.etl_run_stats
+                    (runid, phase, step, status, startedat, seconds, rowsprocessed, bytesprocessed, rowspersec, peakrssmb)
+                VALUES
+                    (:run_id, :phase, :step, :status, :started_at, :seconds, :rows, :bytes, :rows_per_sec, :peak_rss_mb)
+            """), stats)
+        logging.info(f"{len(stats)} statistik langkah run {RUN_ID} disimpan ke meta.etl_run_stats.")
+    except Exception as e:
+        logging.warning(f"Gagal menyimpan meta.etl_run_stats (JSON lines tetap ada di {RUN_STATS_LOG}): {e}")
+
+# --- CACHE API HARI LIBUR ---
+def get_cached_holidays(year, country_code):
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT responsebody, etag, lastmodified,
+                       EXTRACT(EPOCH FROM NOW() - fetchedat) / 3600 AS age_hours
+                FROM meta.holiday_api_cache
+                WHERE year = :year AND countrycode = :country_code
+            """),
+            {'year': year, 'country_code': country_code}
+        ).mappings().first()
+    return dict(row) if row else None
+
+def save_cached_holidays(year, country_code, body=None, etag=None, last_modified=None):
+    """
+    Menyimpan respons API ke cache. body None berarti respons 304 (Not
+    Modified): hanya waktu fetch yang diperbarui.
+    """
+    with engine.begin() as conn:
+        if body is None:
+            conn.execute(text("""
+                UPDATE meta.holiday_api_cache SET fetchedat = NOW()
+                WHERE year = :year AND countrycode = :country_code
+            """), {'year': year, 'country_code': country_code})
+            return
+        conn.execute(text("""
+            INSERT INTO meta.holiday_api_cache (year, countrycode, responsebody, etag, lastmodified, fetchedat)
+            VALUES (:year, :country_code, :body, :etag, :last_modified, NOW())
+            ON CONFLICT (year, countrycode) DO UPDATE SET
+                responsebody = EXCLUDED.responsebody,
+                etag = EXCLUDED.etag,
+                lastmodified = EXCLUDED.lastmodified,
+                fetchedat = EXCLUDED.fetchedat
+        """), {
+            'year': year, 'country_code': country_code, 'body': body,
+            'etag': etag, 'last_modified': last_modified,
+        })
+
+def request_holidays(url, cached=None):
+    """
+    GET ke API libur dengan timeout dan retry (backoff eksponensial) untuk
+    error jaringan, 429 dan 5xx. Jika ada cache, dikirim sebagai request
+    kondisional (If-None-Match / If-Modified-Since).
+    """
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('lastmodified'):
+        headers['If-Modified-Since'] = cached['lastmodified']
+
+    for attempt in range(1, HOLIDAY_API_RETRIES + 1):
+        try:
+            response = requests.get(url, headers=headers, timeout=HOLIDAY_API_TIMEOUT)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            response.raise_for_status()
+            return response
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            retryable = not isinstance(e, requests.HTTPError) or (
+                e.response is not None and (e.response.status_code == 429 or e.response.status_code >= 500)
+            )
+            if not retryable or attempt == HOLIDAY_API_RETRIES:
+                raise
+            delay = HOLIDAY_API_BACKOFF * 2 ** (attempt - 1)
+            logging.warning(f"API libur gagal (percobaan {attempt}/{HOLIDAY_API_RETRIES}): {e}. Coba lagi dalam {delay:.0f}s...")
+            time.sleep(delay)
+
+def fetch_holidays(year, country_code, offline=False):
+    """
+    Mengambil JSON hari libur (year, country_code) dengan urutan:
+    1. offline       : hanya cache, gagal jika cache kosong.
+    2. cache segar   : umur < HOLIDAY_CACHE_TTL_HOURS, tanpa request.
+    3. request API   : kondisional jika ada cache (304 = pakai cache).
+    4. API gagal     : cache kedaluwarsa dipakai jika ada.
+    Mengembalikan (body JSON teks, asal data).
+    """
+    cached = get_cached_holidays(year, country_code)
+    if offline:
+        if cached is None:
+            raise RuntimeError(f"Mode offline: cache libur {year}/{country_code} belum ada.")
+        return cached['responsebody'], 'cache (offline)'
+    if cached and cached['age_hours'] < HOLIDAY_CACHE_TTL_HOURS:
+        return cached['responsebody'], 'cache'
+
+    url = HOLIDAY_API_URL.format(year=year, country_code=country_code)
+    try:
+        response = request_holidays(url, cached)
+    except requests.RequestException as e:
+        if cached is None:
+            raise
+        logging.warning(f"API libur tidak tersedia ({e}), memakai cache kedaluwarsa.")
+        return cached['responsebody'], 'cache (stale)'
+
+    if response.status_code == 304:
+        save_cached_holidays(year, country_code)
+        return cached['responsebody'], 'api (304)'
+    save_cached_holidays(
+        year, country_code, response.text,
+        etag=response.headers.get('ETag'),
+        last_modified=response.headers.get('Last-Modified'),
+    )
+    return response.text, 'api'
+
+def sales_year_range():
+    """
+    Rentang tahun (min, max) SalesDate di data lake. Tier Parquet cukup
+    membaca nama partisi sales_month=YYYY-MM tanpa memindai data.
+    """
+    years = []
+    if LAKE_TIER == 'parquet':
+        sales_dir = os.path.join(LAKE_DIR, 'sales_mentah')
+        if os.path.isdir(sales_dir):
+            years = [
+                int(name[len('sales_month='):][:4]) for name in os.listdir(sales_dir)
+                if name.startswith('sales_month=') and name[len('sales_month='):][:4].isdigit()
+            ]
+    else:
+        with engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT EXTRACT(YEAR FROM MIN("SalesDate"::DATE))::INT,
+                       EXTRACT(YEAR FROM MAX("SalesDate"::DATE))::INT
+                FROM datalake.sales_mentah
+            """)).one()
+        years = [year for year in row if year is not None]
+    if not years:
+        logging.warning(f"Tahun sales tidak ditemukan, kalender memakai tahun {CALENDAR_DEFAULT_YEAR}.")
+        return CALENDAR_DEFAULT_YEAR, CALENDAR_DEFAULT_YEAR
+    return min(years), max(years)
+
+def fetch_all_holidays(years, country_codes, offline=False):
+    """
+    Mengambil data libur semua (tahun, negara) secara paralel lewat cache.
+    Mengembalikan list (year, country_code, body JSON, asal data), urut.
+    Pada mode offline, pasangan yang belum ada di cache dilewati.
+    """
+    pairs = [(year, country_code) for year in years for country_code in country_codes]
+    if not pairs:
+        # ETL_HOLIDAY_COUNTRIES kosong: kalender tanpa hari libur
+        return []
+    results = []
+    with ThreadPoolExecutor(max_workers=min(ETL_MAX_WORKERS, len(pairs)), thread_name_prefix='holiday') as executor:
+        futures = {
+            executor.submit(fetch_holidays, year, country_code, offline): (year, country_code)
+            for year, country_code in pairs
+        }
+        for future in as_completed(futures):
+            year, country_code = futures[future]
             try:
-                conn.execute(text(statement))
-            except Exception as e:
-                logging.warning(f"Skipped statement: {e}")
-        conn.commit()
-    logging.info("Schema 'dwh' dan tabel-tabel DWH dipastikan ada.")
-    
-except Exception as e:
-    logging.error(f"Koneksi database GAGAL: {e}")
-    exit(1)
+                body, origin = future.result()
+            except RuntimeError as e:
+                if not offline:
+                    raise
+                logging.warning(f"{e} Kalender {year} dibuat tanpa hari libur {country_code}.")
+                continue
+            results.append((year, country_code, body, origin))
+    return sorted(results)
+
+def build_calendar(start_year, end_year):
+    """Kalender harian [start_year, end_year] dalam satu pass vektor."""
+    dates = pd.date_range(start=f'{start_year}-01-01', end=f'{end_year}-12-31')
+    return pd.DataFrame({
+        'DateID': dates.year * 10000 + dates.month * 100 + dates.day,
+        'Day': dates.day,
+        'Month': dates.month,
+        'MonthName': dates.month_name(),
+        'Quarter': dates.quarter,
+        'Year': dates.year,
+        'DayOfWeek': dates.day_name(),
+        'FullDate': dates.date,
+    })
+
+# Tipe kolom holidays_mentah dipaksa: tanpa hari libur (negara kosong, mode
+# offline tanpa cache) frame kosong bertipe object akan dibuat sebagai TEXT,
+# dan join ke calendar_mentah."FullDate" (DATE) di model dimdate gagal
+HOLIDAYS_SQL_DTYPES = {'FullDate': Date(), 'HolidayName': Text()}
+
+def build_holidays(holiday_responses, multi_country):
+    """
+    Satu baris per tanggal libur, nama libur digabung. Jika lebih dari satu
+    negara, kode negara ditambahkan ke nama libur.
+    """
+    frames = []
+    for _, country_code, body, _ in holiday_responses:
+        df = pd.DataFrame(json.loads(body))
+        if df.empty:
+            continue
+        if multi_country:
+            df['name'] = df['name'] + f' ({country_code})'
+        frames.append(df[['date', 'name']])
+    if not frames:
+        return pd.DataFrame({'FullDate': pd.Series(dtype='object'), 'HolidayName': pd.Series(dtype='object')})
+    df_holidays = pd.concat(frames, ignore_index=True).drop_duplicates()
+    df_holidays['FullDate'] = pd.to_datetime(df_holidays['date']).dt.date
+    return (
+        df_holidays.groupby('FullDate')['name']
+        .agg(', '.join)
+        .reset_index()
+        .rename(columns={'name': 'HolidayName'})
+    )
 
 # Ambil data libur
-def load_calendar_and_holidays_to_staging(year=2018, country_code='US'):
+def load_calendar_and_holidays_to_staging(years=None, country_codes=None, force=False, offline=False):
+    """
+    Membangun datalake.calendar_mentah & holidays_mentah untuk seluruh rentang
+    tahun sales (+ CALENDAR_FORECAST_YEARS ke depan) dan semua negara di
+    CALENDAR_COUNTRIES. Dilewati jika rentang tahun dan isi respons libur sama
+    dengan run sukses terakhir.
+    """
     try:
-        logging.info(f"Membuat kalender untuk tahun {year}...")
-        # 1. Buat kalender dasar (unik)
-        df_calendar = pd.DataFrame({"FullDate": pd.date_range(start=f'{year}-01-01', end=f'{year}-12-31')})
-        df_calendar['DateID'] = df_calendar['FullDate'].dt.strftime('%Y%m%d').astype(int)
-        df_calendar['Day'] = df_calendar['FullDate'].dt.day
-        df_calendar['Month'] = df_calendar['FullDate'].dt.month
-        df_calendar['MonthName'] = df_calendar['FullDate'].dt.month_name()
-        df_calendar['Quarter'] = df_calendar['FullDate'].dt.quarter
-        df_calendar['Year'] = df_calendar['FullDate'].dt.year
-        df_calendar['DayOfWeek'] = df_calendar['FullDate'].dt.day_name()
-        
-        # 2. Ambil API Liburan
-        logging.info(f"Mengambil data libur untuk {country_code}...")
-        
-        # Load Calendar ke Data Lake (Tanpa Merge)
-        df_calendar['FullDate'] = df_calendar['FullDate'].dt.date
-        df_calendar.to_sql('calendar_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        logging.info("Berhasil memuat datalake.calendar_mentah.")
+        start = time.perf_counter()
+        if years is None:
+            first_year, last_year = sales_year_range()
+            years = range(first_year, last_year + CALENDAR_FORECAST_YEARS + 1)
+        years = sorted(years)
+        country_codes = sorted(country_codes or CALENDAR_COUNTRIES)
+        source_name = "api.holidays"
+
+        # 1. Ambil API Liburan (lewat cache, paralel per tahun x negara)
+        logging.info(f"Mengambil data libur {years[0]}-{years[-1]} untuk {', '.join(country_codes)}...")
+        with instrument('FASE 1', 'api.holidays.request') as metrics:
+            holiday_responses = fetch_all_holidays(years, country_codes, offline=offline)
+            metrics['bytes'] = sum(len(body.encode('utf-8')) for _, _, body, _ in holiday_responses)
+        origins = sorted({origin for _, _, _, origin in holiday_responses})
+        logging.info(f"Data libur diambil dari: {', '.join(origins) or '-'}.")
+
+        # Fingerprint rentang kalender + semua respons API: jika sama dengan run
+        # sebelumnya dan tabel datalake masih ada, tidak perlu dimuat ulang
+        digest = hashlib.sha256(f"{years[0]}-{years[-1]}".encode('utf-8'))
+        for year, country_code, body, _ in holiday_responses:
+            digest.update(f"{year}/{country_code}".encode('utf-8'))
+            digest.update(body.encode('utf-8'))
+        fingerprint = {
+            'source': source_name,
+            'path': f"{HOLIDAY_API_URL} {years[0]}-{years[-1]} {','.join(country_codes)}",
+            'size': metrics['bytes'],
+            'mtime': None,
+            'hash': digest.hexdigest(),
+        }
+        changed = force or is_source_changed(
+            fingerprint, ['datalake.calendar_mentah', 'datalake.holidays_mentah']
+        )
+        stats = {
+            'table': 'calendar_mentah+holidays_mentah',
+            'rows': 0,
+            'bytes': fingerprint['size'],
+            'seconds': 0.0,
+            'rows_per_sec': 0.0,
+            'method': '+'.join(origins) or 'none',
+            'source': source_name,
+            'fingerprint': fingerprint,
+            'changed': changed,
+        }
+        if not changed:
+            logging.info(f"Sumber {source_name} tidak berubah, load kalender & libur dilewati.")
+            stats['method'] = 'skip (unchanged)'
+            stats['seconds'] = time.perf_counter() - start
+            return stats
 
-        response = requests.get(f"https://date.nager.at/api/v3/PublicHolidays/{year}/{country_code}")
-        response.raise_for_status() 
-        holidays_data = response.json()
-        df_holidays = pd.DataFrame(holidays_data)
+        # 2. Buat kalender dasar (unik) untuk seluruh rentang tahun
+        logging.info(f"Membuat kalender {years[0]}-{years[-1]}...")
+        df_calendar = build_calendar(years[0], years[-1])
+        df_calendar.to_sql('calendar_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
+        logging.info(f"Berhasil memuat datalake.calendar_mentah ({len(df_calendar)} hari).")
 
         # 3. Proses dan Deduplikasi Hari Libur
-        df_holidays['FullDate'] = pd.to_datetime(df_holidays['date']).dt.date
-        df_holidays_grouped = df_holidays.groupby('FullDate')['name'].apply(
-            lambda x: ', '.join(x)
-        ).reset_index()
-        df_holidays_grouped = df_holidays_grouped.rename(columns={'name': 'HolidayName'})
-        
-        # Load Holidays ke Data Lake (Tabel Terpisah)
-        df_holidays_grouped.to_sql('holidays_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
+        df_holidays_grouped = build_holidays(holiday_responses, multi_country=len(country_codes) > 1)
+        df_holidays_grouped.to_sql(
+            'holidays_mentah', con=engine, schema='datalake', if_exists='replace', index=False,
+            dtype=HOLIDAYS_SQL_DTYPES,
+        )
         logging.info("Berhasil memuat datalake.holidays_mentah.")
+
+        stats['rows'] = len(df_calendar) + len(df_holidays_grouped)
+        stats['seconds'] = time.perf_counter() - start
+        return stats
         
     except Exception as e:
         logging.error(f"Error memuat DimDate: {e}")
         raise e
 
+# --- FINGERPRINT SUMBER (SKIP JIKA TIDAK BERUBAH) ---
+def get_recorded_fingerprint(source_name):
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                SELECT sizebytes, mtime, contenthash
+                FROM meta.source_fingerprint
+                WHERE sourcename = :source_name
+            """),
+            {'source_name': source_name}
+        ).mappings().first()
+    return dict(row) if row else None
+
+def tables_exist(table_names):
+    with engine.connect() as conn:
+        return all(
+            conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': name}).scalar()
+            for name in table_names
+        )
+
+def file_fingerprint(path, recorded=None):
+    """
+    Fingerprint file sumber: ukuran, mtime, dan SHA-256 isi. Jika ukuran dan
+    mtime sama persis dengan yang tercatat, hash lama dipakai ulang agar file
+    besar tidak perlu dibaca penuh setiap run.
+    """
+    stat = os.stat(path)
+    if recorded and recorded['sizebytes'] == stat.st_size and recorded['mtime'] == stat.st_mtime:
+        content_hash = recorded['contenthash']
+    else:
+        content_hash = file_checksum(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': content_hash}
+
+def is_source_changed(fingerprint, target_tables):
+    """
+    Sumber dianggap berubah jika hash isinya berbeda dari run sukses terakhir,
+    belum pernah tercatat, atau tabel tujuannya sudah tidak ada.
+    """
+    recorded = get_recorded_fingerprint(fingerprint['source'])
+    if recorded is None or recorded['contenthash'] != fingerprint['hash']:
+        return True
+    return not tables_exist(target_tables)
+
+def save_fingerprints(load_stats):
+    """
+    Mencatat fingerprint sumber ke meta.source_fingerprint. Dipanggil hanya di
+    akhir run yang sukses, agar sumber yang gagal ditransformasi tidak ikut
+    dianggap 'sudah diproses' pada run berikutnya.
+    """
+    with engine.begin() as conn:
+        for stat in load_stats:
+            fingerprint = stat.get('fingerprint')
+            if not fingerprint:
+                continue
+            conn.execute(text("""
+                INSERT INTO meta.source_fingerprint (sourcename, sourcepath, sizebytes, mtime, contenthash, recordedat)
+                VALUES (:source, :path, :size, :mtime, :hash, NOW())
+                ON CONFLICT (sourcename) DO UPDATE SET
+                    sourcepath = EXCLUDED.sourcepath,
+                    sizebytes = EXCLUDED.sizebytes,
+                    mtime = EXCLUDED.mtime,
+                    contenthash = EXCLUDED.contenthash,
+                    recordedat = EXCLUDED.recordedat
+            """), fingerprint)
+
+def extract_load_source(csv_path, table_name, force=False):
+    """
+    Fase 1 untuk satu CSV: lewati jika fingerprint tidak berubah, selain itu
+    muat ke datalake (atau konversi ke lake Parquet).
+    """
+    source_name = f"csv.{table_name}"
+    fingerprint = file_fingerprint(csv_path, get_recorded_fingerprint(source_name))
+    fingerprint.update({'source': source_name, 'path': csv_path})
+    target = os.path.join(LAKE_DIR, table_name) if LAKE_TIER == 'parquet' else None
+    changed = (
+        force
+        or is_source_changed(fingerprint, [f'datalake.{table_name}'])
+        or (target is not None and not os.path.isdir(target))
+    )
+
+    if not changed:
+        logging.info(f"Sumber {csv_path} tidak berubah sejak run terakhir, load dilewati.")
+        stats = {
+            'table': table_name,
+            'rows': 0,
+            'bytes': fingerprint['size'],
+            'seconds': 0.0,
+            'rows_per_sec': 0.0,
+            'method': 'skip (unchanged)',
+        }
+    elif LAKE_TIER == 'parquet':
+        stats = convert_csv_to_parquet(csv_path, table_name)
+    else:
+        stats = load_csv_to_datalake(csv_path, table_name)
+
+    stats.update({'source': source_name, 'fingerprint': fingerprint, 'changed': changed})
+    return stats
+
+def read_csv_typed(csv_path, table_name, **kwargs):
+    """
+    pd.read_csv dengan skema eksplisit jika tabel ada di TYPED_SOURCES
+    (selain itu tipe ditebak pandas seperti biasa).
+    """
+    if table_name in TYPED_SOURCES:
+        dtypes, date_columns = TYPED_SOURCES[table_name]
+        kwargs.update(dtype=dtypes, parse_dates=date_columns)
+    return pd.read_csv(csv_path, **kwargs)
+
+def chunk_rows_for_budget(csv_path, table_name, budget_mb=SALES_MEMORY_BUDGET_MB):
+    """
+    Jumlah baris per chunk agar satu chunk (termasuk overhead to_sql) muat
+    dalam budget_mb, dari ukuran rata-rata baris sampel bertipe.
+    """
+    if SALES_CHUNK_SIZE > 0:
+        return SALES_CHUNK_SIZE
+    sample = read_csv_typed(csv_path, table_name, nrows=COPY_SAMPLE_ROWS)
+    if sample.empty:
+        return COPY_SAMPLE_ROWS
+    bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample)
+    rows = int(budget_mb * 1024 * 1024 / (bytes_per_row * CHUNK_MEMORY_OVERHEAD))
+    return max(rows, 1000)
+
+def copy_csv_to_datalake(csv_path, table_name):
+    """
+    Bulk load satu file CSV ke datalake via COPY ... FROM STDIN.
+    Tipe kolom dari skema eksplisit (TYPED_SOURCES) atau ditebak pandas dari
+    sampel baris, selebihnya byte CSV dialirkan langsung dari disk ke Postgres
+    tanpa lewat DataFrame.
+    """
+    df_sample = read_csv_typed(csv_path, table_name, nrows=COPY_SAMPLE_ROWS)
+    # Buat tabel kosong dengan tipe hasil tebakan pandas (sama seperti to_sql)
+    df_sample.head(0).to_sql(table_name, con=engine, schema='datalake', if_exists='replace', index=False)
+    columns = ', '.join(f'"{col}"' for col in df_sample.columns)
+    del df_sample
+
+    copy_sql = f'COPY datalake."{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)'
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur, open(csv_path, 'rb') as f:
+            cur.copy_expert(copy_sql, f)
+            rows = cur.rowcount
+            if rows < 0:
+                # Driver lama tidak mengisi rowcount untuk COPY
+                cur.execute(f'SELECT COUNT(*) FROM datalake."{table_name}"')
+                rows = cur.fetchone()[0]
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+    return rows
+
+def to_sql_csv_to_datalake(csv_path, table_name, chunk_size=None):
+    """
+    Loader lama: baca CSV dengan pandas (chunking) lalu DataFrame.to_sql.
+    Ukuran chunk mengikuti anggaran memori, tipe kolom tetap antar chunk
+    untuk tabel di TYPED_SOURCES.
+    """
+    chunk_size = chunk_size or chunk_rows_for_budget(csv_path, table_name)
+    logging.info(f"Memuat {table_name} via to_sql dengan chunk {chunk_size} baris.")
+    rows = 0
+    for i, chunk in enumerate(read_csv_typed(csv_path, table_name, chunksize=chunk_size)):
+        if i > 0:
+            logging.info(f"Memuat {table_name} chunk {i+1}...")
+        # Chunk pertama mengganti tabel lama, sisanya append
+        with instrument('FASE 1', f"{table_name}.chunk{i+1}") as metrics:
+            chunk.to_sql(
+                table_name,
+                con=engine,
+                schema='datalake',
+                if_exists='replace' if i == 0 else 'append',
+                index=False
+            )
+            metrics['rows'] = len(chunk)
+            metrics['bytes'] = int(chunk.memory_usage(deep=True).sum())
+        rows += len(chunk)
+        del chunk
+    return rows
+
+def _pipeline_put(q, item, stop):
+    """put() yang berhenti menunggu jika pipeline dibatalkan. False = batal."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _pipeline_get(q, stop):
+    """get() yang mengembalikan None saat sentinel diterima atau pipeline batal."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return None
+
+def write_chunk_with_retry(chunk, table_name, index, retries=PIPELINE_CHUNK_RETRIES):
+    """
+    Append satu chunk ke datalake.<table_name> dalam satu transaksi, sehingga
+    chunk yang gagal di tengah jalan tidak meninggalkan baris dan aman diulang.
+    Hanya error koneksi/transien (OperationalError) yang dicoba ulang.
+    """
+    for attempt in range(1, retries + 1):
+        try:
+            with instrument('FASE 1', f"{table_name}.chunk{index+1}") as metrics:
+                with engine.begin() as conn:
+                    chunk.to_sql(table_name, con=conn, schema='datalake', if_exists='append', index=False)
+                metrics['rows'] = len(chunk)
+                metrics['bytes'] = int(chunk.memory_usage(deep=True).sum())
+            return len(chunk)
+        except OperationalError as e:
+            if attempt == retries:
+                raise
+            wait_seconds = PIPELINE_RETRY_BACKOFF * 2 ** (attempt - 1)
+            logging.warning(
+                f"Chunk {index+1} datalake.{table_name} gagal ({e.orig}), "
+                f"ulang {attempt}/{retries - 1} dalam {wait_seconds:.0f}s..."
+            )
+            time.sleep(wait_seconds)
+
+def pipelined_csv_to_datalake(csv_path, table_name, chunk_size=None, parsers=PIPELINE_PARSERS,
+                              writers=PIPELINE_WRITERS, queue_chunks=PIPELINE_QUEUE_CHUNKS):
+    """
+    Loader to_sql dengan pipeline producer/consumer, sehingga parsing CSV
+    (CPU) dan INSERT ke Postgres (I/O) berjalan bersamaan:
+
+        pembaca --[antrean blok]--> parser x N --[antrean DataFrame]--> writer x M
+
+    Antrean dibatasi queue_chunks, jadi pembaca menunggu jika writer
+    tertinggal. Ukuran chunk = anggaran memori dibagi jumlah chunk yang bisa
+    beredar sekaligus. Urutan chunk di tabel tidak dijaga. Blok dipotong per
+    baris, jadi CSV sumber tidak boleh punya newline di dalam field.
+    """
+    if not chunk_size and SALES_CHUNK_SIZE > 0:
+        chunk_size = SALES_CHUNK_SIZE
+    elif not chunk_size:
+        in_flight = parsers + writers + 2 * queue_chunks
+        chunk_size = max(chunk_rows_for_budget(csv_path, table_name) // in_flight, 1000)
+    logging.info(
+        f"Memuat {table_name} via pipeline to_sql: chunk {chunk_size} baris, "
+        f"{parsers} parser, {writers} writer, antrean {queue_chunks} chunk."
+    )
+    # Tabel dibuat sekali, semua chunk lalu di-append. Tipe diambil dari chunk
+    # pertama loop to_sql lama (bukan sampel COPY_SAMPLE_ROWS): pipeline juga
+    # menjadi fallback saat COPY gagal karena tebakan sampel meleset, jadi
+    # tebakan yang sama tidak boleh dipakai lagi. Skema eksplisit cukup sampel.
+    if table_name in TYPED_SOURCES:
+        schema_rows = COPY_SAMPLE_ROWS
+    else:
+        schema_rows = chunk_rows_for_budget(csv_path, table_name)
+    read_csv_typed(csv_path, table_name, nrows=schema_rows).head(0).to_sql(
+        table_name, con=engine, schema='datalake', if_exists='replace', index=False
+    )
+
+    stop = threading.Event()
+    blocks = queue.Queue(maxsize=queue_chunks)
+    chunks = queue.Queue(maxsize=queue_chunks)
+
+    def read_blocks():
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            for index in itertools.count():
+                lines = list(itertools.islice(f, chunk_size))
+                if not lines or not _pipeline_put(blocks, (index, header + b''.join(lines)), stop):
+                    return
+
+    def parse_blocks():
+        while True:
+            item = _pipeline_get(blocks, stop)
+            if item is None:
+                return
+            index, block = item
+            chunk = read_csv_typed(io.BytesIO(block), table_name)
+            if not _pipeline_put(chunks, (index, chunk), stop):
+                return
+
+    def write_chunks():
+        rows = 0
+        while True:
+            item = _pipeline_get(chunks, stop)
+            if item is None:
+                return rows
+            index, chunk = item
+            rows += write_chunk_with_retry(chunk, table_name, index)
+
+    def stage(func):
+        # Kegagalan satu tahap membatalkan tahap lain yang sedang menunggu antrean
+        try:
+            return func()
+        except BaseException:
+            stop.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=1 + parsers + writers, thread_name_prefix=f'pipeline-{table_name}') as executor:
+        reader = executor.submit(stage, read_blocks)
+        parse_futures = [executor.submit(stage, parse_blocks) for _ in range(parsers)]
+        write_futures = [executor.submit(stage, write_chunks) for _ in range(writers)]
+        try:
+            reader.result()
+            for _ in parse_futures:
+                _pipeline_put(blocks, None, stop)
+            for future in parse_futures:
+                future.result()
+            for _ in write_futures:
+                _pipeline_put(chunks, None, stop)
+            rows = sum(future.result() for future in write_futures)
+        except BaseException:
+            stop.set()
+            raise
+    return rows
+
+def load_csv_to_datalake(csv_path, table_name):
+    """
+    Memuat satu CSV mentah ke datalake.<table_name> dengan loader BULK_LOADER.
+    Jika COPY gagal (mis. tebakan tipe dari sampel meleset), otomatis
+    fallback ke to_sql (pipeline jika PIPELINE_WRITERS > 0). Mengembalikan
+    statistik throughput.
+    """
+    start = time.perf_counter()
+    method = BULK_LOADER
+    if method == 'copy':
+        try:
+            rows = copy_csv_to_datalake(csv_path, table_name)
+        except Exception as e:
+            logging.warning(f"COPY gagal untuk datalake.{table_name} ({e}). Fallback ke to_sql...")
+            method = 'to_sql'
+    if method != 'copy' and PIPELINE_WRITERS > 0:
+        method = 'to_sql (pipeline)'
+        rows = pipelined_csv_to_datalake(csv_path, table_name)
+    elif method != 'copy':
+        method = 'to_sql'
+        rows = to_sql_csv_to_datalake(csv_path, table_name)
+
+    elapsed = time.perf_counter() - start
+    rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+    peak_rss = peak_rss_mb()
+    rss_text = f"{peak_rss:.0f} MB" if peak_rss is not None else "n/a"
+    logging.info(
+        f"Berhasil memuat datalake.{table_name}: {rows} baris dalam {elapsed:.2f}s "
+        f"({rows_per_sec:,.0f} rows/sec, loader={method}, peak RSS proses {rss_text})."
+    )
+    return {
+        'table': table_name,
+        'rows': rows,
+        'bytes': os.path.getsize(csv_path),
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'method': method,
+        'peak_rss_mb': peak_rss,
+    }
+
+def log_load_summary(load_stats, wall_seconds=None):
+    """
+    Ringkasan throughput Fase 1 per tabel, untuk membandingkan loader.
+    """
+    logging.info("Ringkasan load Data Lake (tabel | baris | detik | rows/sec | loader):")
+    for stat in load_stats:
+        logging.info(
+            f"  {stat['table']:<20} | {stat['rows']:>10} | {stat['seconds']:>8.2f} | "
+            f"{stat['rows_per_sec']:>12,.0f} | {stat['method']}"
+        )
+    total_rows = sum(stat['rows'] for stat in load_stats)
+    total_seconds = sum(stat['seconds'] for stat in load_stats)
+    if total_seconds > 0:
+        logging.info(f"  TOTAL: {total_rows} baris dalam {total_seconds:.2f}s ({total_rows / total_seconds:,.0f} rows/sec).")
+    if wall_seconds:
+        logging.info(f"  WALL-CLOCK (paralel): {wall_seconds:.2f}s ({total_rows / wall_seconds:,.0f} rows/sec efektif).")
+    peak_rss = peak_rss_mb()
+    if peak_rss is not None:
+        logging.info(f"  PEAK RSS proses: {peak_rss:.0f} MB.")
+
+def _timed_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def run_phase1_parallel(force=False, max_workers=ETL_MAX_WORKERS):
+    """
+    FASE 1: Extract & Load seluruh CSV sumber secara paralel dalam pool
+    worker terbatas. Kegagalan satu sumber tidak
+    menghentikan sumber lain; setelah semua selesai, pipeline baru
+    dihentikan jika ada sumber yang gagal.
+    """
+    tasks = []
+    # File terbesar (sales) dijadwalkan lebih dulu agar tidak jadi ekor antrean
+    sources = sorted(
+        RAW_CSV_SOURCES,
+        key=lambda source: os.path.getsize(source[0]) if os.path.exists(source[0]) else 0,
+        reverse=True
+    )
+    # Tier Parquet: Fase 1 hanya konversi CSV -> Parquet, tabel datalake
+    # diisi dari Parquet di awal Fase 2 (load_lake_to_datalake)
+    for csv_path, table_name in sources:
+        tasks.append((f"source.{table_name}", extract_load_source, (csv_path, table_name, force)))
+    return run_tasks_parallel(tasks, "FASE 1", max_workers)
+
+def run_tasks_parallel(tasks, phase_name, max_workers=ETL_MAX_WORKERS):
+    """
+    Menjalankan daftar (nama, fungsi, argumen) secara paralel dengan isolasi
+    kegagalan per task. Mengembalikan statistik load dari task yang sukses.
+    """
+    logging.info(f"Menjalankan {len(tasks)} task {phase_name} dengan {max_workers} worker paralel...")
+    start = time.perf_counter()
+    load_stats = []
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='etl') as executor:
+        futures = {executor.submit(_timed_call, func, *args): name for name, func, args in tasks}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                failures[name] = e
+                logging.error(f"Task {name} GAGAL: {e}")
+                record_step(phase_name, name, 0.0, status='failed')
+                continue
+            logging.info(f"Task {name} selesai dalam {elapsed:.2f}s.")
+            if isinstance(result, dict):
+                load_stats.append(result)
+                record_step(phase_name, name, elapsed, rows=result.get('rows'), bytes_processed=result.get('bytes'))
+            else:
+                record_step(phase_name, name, elapsed)
+
+    log_load_summary(load_stats, wall_seconds=time.perf_counter() - start)
+    if failures:
+        raise RuntimeError(
+            f"{phase_name} gagal untuk {len(failures)} task: {', '.join(sorted(failures))}"
+        )
+    return load_stats
+
+# --- DATA LAKE PARQUET (OPSIONAL) ---
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("ETL_LAKE_TIER=parquet membutuhkan paket 'pyarrow' (pip install pyarrow).") from e
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 isi file, dibaca bertahap agar file besar tidak dimuat ke memori.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _arrow_column_types(table_name):
+    """Skema TYPED_SOURCES dalam tipe pyarrow (None jika tabel tidak bertipe)."""
+    import pyarrow as pa
+
+    if table_name not in TYPED_SOURCES:
+        return None
+    arrow_types = {'Int32': pa.int32(), 'float32': pa.float32(), 'string': pa.string()}
+    dtypes, date_columns = TYPED_SOURCES[table_name]
+    column_types = {name: arrow_types[dtype] for name, dtype in dtypes.items()}
+    column_types.update({name: pa.timestamp('ms') for name in date_columns})
+    return column_types
+
+def _open_csv_stream(csv_path, all_strings=False, table_name=None):
+    """
+    Membuka CSV sebagai stream RecordBatch pyarrow. Tipe kolom dari
+    TYPED_SOURCES atau ditebak dari blok pertama; all_strings=True memaksa
+    semua kolom bertipe string.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    read_options = pacsv.ReadOptions(block_size=64 * 1024 * 1024)
+    convert_options = None
+    column_types = _arrow_column_types(table_name)
+    if column_types and not all_strings:
+        convert_options = pacsv.ConvertOptions(column_types=column_types)
+    if all_strings:
+        with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
+            header = next(csv.reader(f))
+        convert_options = pacsv.ConvertOptions(column_types={name: pa.string() for name in header})
+    return pacsv.open_csv(csv_path, read_options=read_options, convert_options=convert_options)
+
+def _with_sales_month(batch):
+    """
+    Menambah kolom partisi sales_month (YYYY-MM) dari SalesDate.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    sales_date = batch.column('SalesDate')
+    if pa.types.is_timestamp(sales_date.type) or pa.types.is_date(sales_date.type):
+        month = pc.strftime(sales_date, format='%Y-%m')
+    else:
+        month = pc.utf8_slice_codeunits(pc.cast(sales_date, pa.string()), 0, 7)
+    month = pc.fill_null(month, 'unknown')
+    return pa.RecordBatch.from_arrays(
+        batch.columns + [month], names=batch.schema.names + ['sales_month']
+    )
+
+def _write_lake_table(csv_path, out_dir, partitioned, all_strings=False, table_name=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    reader = _open_csv_stream(csv_path, all_strings=all_strings, table_name=table_name)
+    schema = reader.schema
+    if partitioned:
+        schema = schema.append(pa.field('sales_month', pa.string()))
+    rows = 0
+
+    def counted(source):
+        nonlocal rows
+        for batch in source:
+            rows += batch.num_rows
+            yield _with_sales_month(batch) if partitioned else batch
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    ds.write_dataset(
+        counted(reader),
+        out_dir,
+        schema=schema,
+        format='parquet',
+        partitioning=['sales_month'] if partitioned else None,
+        partitioning_flavor='hive' if partitioned else None,
+        max_rows_per_group=LAKE_BATCH_ROWS,
+    )
+    return rows
+
+def convert_csv_to_parquet(csv_path, table_name):
+    """
+    Mengonversi satu CSV mentah ke Parquet di LAKE_DIR/<table_name>/.
+    sales_mentah dipartisi per bulan (sales_month=YYYY-MM). Apakah CSV berubah
+    sudah diputuskan extract_load_source lewat meta.source_fingerprint.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+
+    start = time.perf_counter()
+    os.makedirs(LAKE_DIR, exist_ok=True)
+    table_dir = os.path.join(LAKE_DIR, table_name)
+    partitioned = table_name == 'sales_mentah'
+    # Tulis ke folder sementara lalu ganti folder lama, agar lake tidak
+    # pernah setengah jadi jika konversi gagal di tengah jalan
+    tmp_dir = table_dir + '.tmp'
+    try:
+        rows = _write_lake_table(csv_path, tmp_dir, partitioned, table_name=table_name)
+    except pa.ArrowInvalid as e:
+        # Tipe dari blok pertama tidak cocok dengan blok berikutnya
+        logging.warning(f"Tipe kolom {csv_path} tidak konsisten ({e}), konversi ulang sebagai string.")
+        rows = _write_lake_table(csv_path, tmp_dir, partitioned, all_strings=True)
+    shutil.rmtree(table_dir, ignore_errors=True)
+    os.replace(tmp_dir, table_dir)
+
+    elapsed = time.perf_counter() - start
+    rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Lake {table_name}: {rows} baris dikonversi ke Parquet dalam {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    return {
+        'table': table_name,
+        'rows': rows,
+        'bytes': os.path.getsize(csv_path),
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'method': 'parquet',
+    }
+
+def read_lake_table(table_name, columns=None, since=None):
+    """
+    Membaca tabel dari lake Parquet sebagai (skema, iterator RecordBatch).
+    Kolom partisi sales_month tidak ikut dibaca kecuali diminta. Dengan since,
+    sales_mentah hanya dibaca dari partisi bulan since ke atas plus partisi
+    'unknown' (SalesDate kosong); partisi lain tidak disentuh sama sekali.
+    """
+    _require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    table_dir = os.path.join(LAKE_DIR, table_name)
+    partitioned = table_name == 'sales_mentah'
+    dataset = ds.dataset(table_dir, format='parquet', partitioning='hive' if partitioned else None)
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'sales_month']
+    row_filter = None
+    if partitioned and since is not None:
+        month = ds.field('sales_month')
+        row_filter = (month >= since.strftime('%Y-%m')) | (month == 'unknown')
+    schema = pa.schema([dataset.schema.field(name) for name in columns])
+    return schema, dataset.to_batches(columns=columns, filter=row_filter, batch_size=LAKE_BATCH_ROWS)
+
+def lake_scope(table_name, since=None):
+    """
+    Cakupan isi datalake.<table_name> hasil load dari lake: 'all', atau bulan
+    partisi pertama ('YYYY-MM') untuk sales_mentah yang dibatasi since.
+    """
+    if since is None or table_name != 'sales_mentah':
+        return 'all'
+    return since.strftime('%Y-%m')
+
+def lake_scope_covers(loaded, needed):
+    """True jika isi tabel dengan cakupan loaded sudah memuat cakupan needed."""
+    if loaded is None:
+        return False
+    if loaded == 'all':
+        return True
+    return needed != 'all' and loaded <= needed
+
+def loaded_lake_scope(table_name):
+    """
+    Cakupan yang dicatat load_lake_to_datalake di komentar tabel (None jika
+    tabel tidak ada atau tidak diisi dari lake).
+    """
+    with engine.connect() as conn:
+        comment = conn.execute(
+            text("SELECT obj_description(to_regclass(:name), 'pg_class')"),
+            {'name': f'datalake."{table_name}"'}
+        ).scalar()
+    if not comment or not comment.startswith('lake:'):
+        return None
+    return comment[len('lake:'):]
+
+def load_lake_to_datalake(table_name, since=None):
+    """
+    Mengisi datalake.<table_name> dari lake Parquet via COPY per batch.
+    Tipe kolom diambil dari skema Parquet (bukan tebakan sampel CSV). Untuk
+    load incremental fakta, since membatasi sales_mentah ke bulan-bulan dalam
+    jendela watermark, jadi hanya data yang dibutuhkan staging yang masuk DB.
+    Cakupannya dicatat di komentar tabel (lihat loaded_lake_scope), dalam
+    transaksi yang sama dengan datanya.
+    """
+    import pyarrow.csv as pacsv
+
+    start = time.perf_counter()
+    schema, batches = read_lake_table(table_name, since=since)
+    # Tabel selalu diganti (juga saat filter tidak menyisakan baris), dengan
+    # tipe kolom dari skema Arrow
+    schema.empty_table().to_pandas().to_sql(
+        table_name, con=engine, schema='datalake', if_exists='replace', index=False
+    )
+    columns = ', '.join(f'"{col}"' for col in schema.names)
+    copy_sql = f'COPY datalake."{table_name}" ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)'
+    rows = 0
+    raw_conn = engine.raw_connection()
+    try:
+        for batch in batches:
+            with instrument('FASE 2.0', f"{table_name}.batch") as metrics:
+                buffer = io.BytesIO()
+                pacsv.write_csv(batch, buffer)
+                metrics['bytes'] = buffer.tell()
+                buffer.seek(0)
+                with raw_conn.cursor() as cur:
+                    cur.copy_expert(copy_sql, buffer)
+                metrics['rows'] = batch.num_rows
+            rows += batch.num_rows
+        with raw_conn.cursor() as cur:
+            cur.execute(f"COMMENT ON TABLE datalake.\"{table_name}\" IS 'lake:{lake_scope(table_name, since)}'")
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    elapsed = time.perf_counter() - start
+    rows_per_sec = rows / elapsed if elapsed > 0 else 0.0
+    scope = f" (partisi sejak {since:%Y-%m})" if since is not None and table_name == 'sales_mentah' else ""
+    logging.info(
+        f"Berhasil memuat datalake.{table_name} dari lake Parquet{scope}: {rows} baris "
+        f"dalam {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec)."
+    )
+    return {
+        'table': table_name,
+        'rows': rows,
+        'bytes': 0,
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'method': 'parquet->copy',
+    }
+
 def validate_dwh_counts():
     """
     Memvalidasi apakah data berhasil masuk ke tabel DWH.
@@ -129,294 +1397,1733 @@ def validate_dwh_counts():
             except Exception as e:
                 logging.error(f"Could not validate table {table}: {e}")
 
+# --- LOAD INCREMENTAL (WATERMARK) ---
+def get_watermark(table_name):
+    """
+    Mengambil high-water mark (MAX SalesDate yang sudah dimuat) dari meta.etl_watermark.
+    """
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT watermarkvalue FROM meta.etl_watermark WHERE tablename = :table_name"),
+            {'table_name': table_name}
+        ).scalar()
+
+def build_sales_delta(watermark):
+    """
+    Membuat staging.sales_delta berisi baris sales yang perlu dimuat ke DWH,
+    satu baris per SALES_NATURAL_KEY.
+    - watermark None : semua baris (full refresh).
+    - incremental    : hanya kandidat, yaitu SalesDate > watermark dikurangi
+                       SALES_LOOKBACK_DAYS (atau SalesDate kosong). Kandidat yang
+                       hash-nya sudah ada di dwh.factsales dibuang, jadi hanya
+                       baris baru & koreksi dalam jendela lookback yang dimuat.
+    Koreksi yang lebih lama dari jendela lookback dan baris yang dihapus di
+    sumber tidak terdeteksi; gunakan --full-refresh.
+    """
+    params = {}
+    if watermark is None:
+        candidate_filter = "TRUE"
+        changed_filter = "TRUE"
+    else:
+        params['since'] = watermark - timedelta(days=SALES_LOOKBACK_DAYS)
+        candidate_filter = 's."SalesDate"::TIMESTAMP > :since OR s."SalesDate" IS NULL'
+        changed_filter = """NOT EXISTS (
+            SELECT 1 FROM dwh.factsales f
+            WHERE f.salesid_oltp = src."SalesID" AND f.rowhash = src.row_hash
+        )"""
+
+    # Filter watermark dulu, baru hash kandidatnya saja. Dedup pada natural key
+    # (bukan DISTINCT * atas semua kolom): satu baris per SalesID, hash
+    # terbesar dipilih agar hasilnya deterministik
+    delta_sql = f"""
+    DROP TABLE IF EXISTS staging.sales_delta;
+    CREATE TABLE staging.sales_delta AS
+    WITH candidates AS (
+        SELECT s.*, {SALES_ROW_HASH} AS row_hash
+        FROM datalake.sales_mentah s
+        WHERE {candidate_filter}
+    ),
+    src AS (
+        SELECT DISTINCT ON ({SALES_NATURAL_KEY}) *
+        FROM candidates
+        ORDER BY {SALES_NATURAL_KEY}, row_hash DESC
+    )
+    SELECT * FROM src
+    WHERE {changed_filter};
+    """
+    with engine.begin() as conn:
+        conn.execute(text(delta_sql), params)
+        conn.execute(text("ANALYZE staging.sales_delta"))
+        rows = conn.execute(text("SELECT COUNT(*) FROM staging.sales_delta")).scalar()
+    logging.info(f"staging.sales_delta berisi {rows} baris untuk dimuat.")
+    return rows
+
+# --- PARTISI FAKTA (RANGE BULANAN PADA DATEID) ---
+def month_bounds(month_id):
+    """
+    Batas partisi untuk bulan YYYYMM dalam satuan DateID (YYYYMMDD):
+    [YYYYMM00, bulan berikutnya * 100).
+    """
+    year, month = divmod(month_id, 100)
+    next_month = (year + 1) * 100 + 1 if month == 12 else month_id + 1
+    return month_id * 100, next_month * 100
+
+def fact_partition_name(month_id):
+    return f"factsales_p{month_id}"
+
+def fact_partition_exists(conn, month_id, schema=DWH_SCHEMA):
+    return conn.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"),
+        {'name': f"{schema}.{fact_partition_name(month_id)}"}
+    ).scalar()
+
+def ensure_fact_partition(conn, month_id):
+    """Membuat partisi bulanan kosong jika belum ada (on demand)."""
+    lower, upper = month_bounds(month_id)
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS dwh.{fact_partition_name(month_id)}
+        PARTITION OF dwh.factsales FOR VALUES FROM ({lower}) TO ({upper})
+    """))
+
+def affected_fact_months(conn, load_mode):
+    """
+    Bulan (YYYYMM) yang partisinya harus dibangun ulang: bulan baris di
+    staging.factsales, ditambah (incremental) bulan versi lama baris yang
+    berubah, karena tanggalnya bisa pindah bulan.
+    """
+    months_sql = "SELECT dateid / 100 FROM staging.factsales WHERE dateid IS NOT NULL"
+    if load_mode != 'full':
+        months_sql += """
+        UNION
+        SELECT f.dateid / 100
+        FROM dwh.factsales f
+        JOIN staging.factsales s ON f.salesid_oltp = s.salesid_oltp
+        WHERE f.dateid IS NOT NULL
+        """
+    return sorted(row[0] for row in conn.execute(text(months_sql)))
+
+def fact_partition_ddl(conn, schema, load_name):
+    """
+    DDL indeks dan FOREIGN KEY induk <schema>.factsales, diterapkan ke tabel
+    load. Saat ATTACH, Postgres memakai indeks & FK yang sudah cocok ini
+    alih-alih membangun indeks / memvalidasi FK di bawah lock.
+    """
+    parent = {'parent': f"{schema}.factsales"}
+    statements = [
+        re.sub(r'INDEX \S+ ON ONLY \S+', f'INDEX ON {schema}.{load_name}', indexdef)
+        for indexdef in conn.execute(text(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = CAST(:parent AS regclass)"
+        ), parent).scalars()
+    ]
+    statements += [
+        f"ALTER TABLE {schema}.{load_name} ADD CONSTRAINT {name} {definition}"
+        for name, definition in conn.execute(text("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = CAST(:parent AS regclass) AND contype = 'f'
+        """), parent)
+    ]
+    return statements
+
+def ensure_default_partition_check(conn, schema=DWH_SCHEMA):
+    """
+    CHECK (dateid IS NULL) pada partisi DEFAULT membuktikan bulan yang di-ATTACH
+    tidak ada di sana, jadi ATTACH tidak perlu memindai partisi DEFAULT.
+    DWH lama dimigrasi dengan NOT VALID + VALIDATE (tidak memblokir pembaca).
+    """
+    name = f"{schema}.factsales_default"
+    exists = conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conrelid = CAST(:name AS regclass) AND conname = 'factsales_default_nodate'
+        )
+    """), {'name': name}).scalar()
+    if not exists:
+        conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT factsales_default_nodate CHECK (dateid IS NULL) NOT VALID"))
+        conn.execute(text(f"ALTER TABLE {name} VALIDATE CONSTRAINT factsales_default_nodate"))
+
+def prepare_fact_partition(conn, month_id, incremental, schema=DWH_SCHEMA):
+    """
+    Attach-after-load, tahap 1: isi tabel load terpisah untuk satu bulan, lalu
+    pasang CHECK sesuai rentang, indeks, dan FK yang sama dengan induk. Hanya
+    butuh lock baca pada dwh.factsales, jadi dashboard tidak terblokir.
+    Mengembalikan jumlah baris partisi baru.
+    """
+    name = fact_partition_name(month_id)
+    load_name = f"{name}_load"
+    lower, upper = month_bounds(month_id)
+
+    conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{load_name}"))
+    conn.execute(text(f"CREATE TABLE {schema}.{load_name} (LIKE {schema}.factsales INCLUDING DEFAULTS)"))
+    if incremental and fact_partition_exists(conn, month_id, schema):
+        # Baris bulan ini yang tidak ikut berubah dibawa ke partisi baru
+        conn.execute(text(f"""
+            INSERT INTO {schema}.{load_name}
+            SELECT * FROM {schema}.{name} f
+            WHERE NOT EXISTS (
+                SELECT 1 FROM staging.factsales s WHERE s.salesid_oltp = f.salesid_oltp
+            )
+        """))
+    conn.execute(text(f"""
+        INSERT INTO {schema}.{load_name} ({FACT_COLUMNS})
+        SELECT {FACT_COLUMNS} FROM staging.factsales
+        WHERE dateid >= {lower} AND dateid < {upper}
+    """))
+    conn.execute(text(f"""
+        ALTER TABLE {schema}.{load_name} ADD CONSTRAINT {name}_range
+        CHECK (dateid IS NOT NULL AND dateid >= {lower} AND dateid < {upper})
+    """))
+    for statement in fact_partition_ddl(conn, schema, load_name):
+        conn.execute(text(statement))
+    return conn.execute(text(f"SELECT COUNT(*) FROM {schema}.{load_name}")).scalar()
+
+def swap_fact_partition(conn, month_id, schema=DWH_SCHEMA):
+    """
+    Attach-after-load, tahap 2: tukar partisi lama dengan tabel load yang
+    sudah siap. Hanya operasi katalog (tanpa scan, tanpa build indeks), jadi
+    lock ACCESS EXCLUSIVE dari DETACH cukup singkat.
+    """
+    name = fact_partition_name(month_id)
+    lower, upper = month_bounds(month_id)
+    if fact_partition_exists(conn, month_id, schema):
+        conn.execute(text(f"ALTER TABLE {schema}.factsales DETACH PARTITION {schema}.{name}"))
+        conn.execute(text(f"DROP TABLE {schema}.{name}"))
+    conn.execute(text(f"ALTER TABLE {schema}.{name}_load RENAME TO {name}"))
+    conn.execute(text(
+        f"ALTER TABLE {schema}.factsales ATTACH PARTITION {schema}.{name} FOR VALUES FROM ({lower}) TO ({upper})"
+    ))
+
+def prepare_fact_partitions(conn, load_mode, schema=DWH_SCHEMA):
+    """Menyiapkan tabel load untuk setiap bulan terdampak. Mengembalikan daftar bulan."""
+    incremental = load_mode != 'full'
+    months = affected_fact_months(conn, load_mode)
+    logging.info(f"Menyiapkan {len(months)} partisi fakta bulanan ({load_mode}).")
+    ensure_default_partition_check(conn, schema)
+    for month_id in months:
+        with instrument('FASE 3', f"partition {schema}.{fact_partition_name(month_id)}") as metrics:
+            metrics['rows'] = prepare_fact_partition(conn, month_id, incremental, schema)
+    return months
+
+def swap_fact_partitions(conn, months, load_mode, schema=DWH_SCHEMA):
+    """
+    Menukar partisi bulanan yang sudah disiapkan, lalu memuat baris tanpa
+    DateID ke partisi DEFAULT.
+    """
+    with instrument('FASE 3', f'swap {schema}.factsales ({len(months)} partisi)'):
+        for month_id in months:
+            swap_fact_partition(conn, month_id, schema)
+
+    with instrument('FASE 3', f'partition {schema}.factsales_default') as metrics:
+        if load_mode != 'full':
+            conn.execute(text(f"""
+                DELETE FROM {schema}.factsales_default f
+                USING staging.factsales s
+                WHERE f.salesid_oltp = s.salesid_oltp
+            """))
+        result = conn.execute(text(f"""
+            INSERT INTO {schema}.factsales ({FACT_COLUMNS})
+            SELECT {FACT_COLUMNS} FROM staging.factsales
+            WHERE dateid IS NULL
+        """))
+        metrics['rows'] = result.rowcount
+
+def rename_legacy_factsales(conn):
+    """
+    Jika dwh.factsales masih tabel biasa (DWH sebelum partisi), ganti namanya
+    menjadi dwh.factsales_legacy agar scheme.sql membuat tabel berpartisi.
+    """
+    relkind = conn.execute(text("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'dwh' AND c.relname = 'factsales'
+    """)).scalar()
+    if relkind != 'r':
+        return False
+    logging.info("dwh.factsales belum berpartisi, dimigrasi ke tabel berpartisi bulanan...")
+    conn.execute(text("ALTER TABLE dwh.factsales ADD COLUMN IF NOT EXISTS salesid_oltp INT"))
+    conn.execute(text("ALTER TABLE dwh.factsales ADD COLUMN IF NOT EXISTS rowhash CHAR(32)"))
+    conn.execute(text("DROP TABLE IF EXISTS dwh.factsales_legacy"))
+    conn.execute(text("ALTER TABLE dwh.factsales RENAME TO factsales_legacy"))
+    conn.commit()
+    return True
+
+def migrate_legacy_factsales(conn):
+    """Memindahkan isi dwh.factsales_legacy ke tabel berpartisi lalu menghapusnya."""
+    months = conn.execute(text(
+        "SELECT DISTINCT dateid / 100 FROM dwh.factsales_legacy WHERE dateid IS NOT NULL"
+    )).scalars().all()
+    for month_id in months:
+        ensure_fact_partition(conn, month_id)
+    result = conn.execute(text(f"""
+        INSERT INTO dwh.factsales (salesid, {FACT_COLUMNS})
+        SELECT salesid, {FACT_COLUMNS} FROM dwh.factsales_legacy
+    """))
+    conn.execute(text("""
+        SELECT setval('dwh.seq_factsales_salesid', COALESCE((SELECT MAX(salesid) FROM dwh.factsales), 0) + 1, false)
+    """))
+    # Indeks lama (idx_factsales_*) ikut terhapus, dibuat ulang setelah FASE 3
+    conn.execute(text("DROP TABLE dwh.factsales_legacy CASCADE"))
+    logging.info(f"Migrasi dwh.factsales selesai: {result.rowcount} baris, {len(months)} partisi bulanan.")
+
+def update_watermark(conn, load_mode):
+    """Watermark fakta dari staging.sales_delta (incremental tidak pernah mundur)."""
+    watermark_value = (
+        "EXCLUDED.watermarkvalue" if load_mode == 'full'
+        else "GREATEST(meta.etl_watermark.watermarkvalue, EXCLUDED.watermarkvalue)"
+    )
+    conn.execute(text(f"""
+        INSERT INTO meta.etl_watermark (tablename, watermarkvalue, rowsloaded, updatedat)
+        SELECT 'dwh.factsales', MAX("SalesDate"::TIMESTAMP), COUNT(*), NOW() FROM staging.sales_delta
+        ON CONFLICT (tablename) DO UPDATE SET
+            watermarkvalue = {watermark_value},
+            rowsloaded = EXCLUDED.rowsloaded,
+            updatedat = EXCLUDED.updatedat
+    """))
+
+# Merge SCD Type 2 DimProduct & DimCustomer (dipakai full maupun incremental).
+# staging.dim* sudah membawa changetype (new/changed/unchanged dari hash diff
+# terhadap versi current di DWH) dan key final, jadi merge hanya menyentuh
+# baris yang berubah: versi lama ditutup (validto, iscurrent), versi baru
+# disisipkan. Fakta lama tetap menunjuk versi lamanya.
+SCD2_MERGE_SQL = """
+        UPDATE dwh.dimproduct d SET validto = s.validfrom, iscurrent = FALSE
+        FROM staging.dimproduct s
+        WHERE s.changetype = 'changed' AND d.productid_oltp = s.productid_oltp AND d.iscurrent;
+        INSERT INTO dwh.dimproduct (productid, productid_oltp, productname, price, categoryname, class, isallergic, rowhash, validfrom, validto, iscurrent)
+        SELECT productid, productid_oltp, productname, price, categoryname, class, isallergic, rowhash, validfrom, TIMESTAMP '9999-12-31', TRUE
+        FROM staging.dimproduct WHERE changetype IN ('new', 'changed');
+        -- Baris sebelum SCD2 belum punya hash (sekali saja per baris)
+        UPDATE dwh.dimproduct d SET rowhash = s.rowhash
+        FROM staging.dimproduct s
+        WHERE s.changetype = 'unchanged' AND d.productid = s.productid AND d.rowhash IS NULL;
+
+        UPDATE dwh.dimcustomer d SET validto = s.validfrom, iscurrent = FALSE
+        FROM staging.dimcustomer s
+        WHERE s.changetype = 'changed' AND d.customerid_oltp = s.customerid_oltp AND d.iscurrent;
+        INSERT INTO dwh.dimcustomer (customerid, customerid_oltp, customername, address, customercityname, customercountryname, rowhash, validfrom, validto, iscurrent)
+        SELECT customerid, customerid_oltp, customername, address, customercityname, customercountryname, rowhash, validfrom, TIMESTAMP '9999-12-31', TRUE
+        FROM staging.dimcustomer WHERE changetype IN ('new', 'changed');
+        UPDATE dwh.dimcustomer d SET rowhash = s.rowhash
+        FROM staging.dimcustomer s
+        WHERE s.changetype = 'unchanged' AND d.customerid = s.customerid AND d.rowhash IS NULL;
+"""
+
+def load_to_dwh(load_mode, schema=DWH_SCHEMA):
+    """
+    FASE 3: Memuat staging ke DWH.
+    - full        : TRUNCATE seluruh tabel DWH (kecuali DimDate dan dimensi
+                    SCD2 yang di-merge) lalu insert ulang.
+    - incremental : upsert dimensi (key stabil) / merge SCD2, lalu hanya partisi bulan
+                    yang terdampak staging.sales_delta yang ditukar.
+    Fakta dimuat per partisi bulanan (lihat prepare_fact_partitions dan
+    swap_fact_partitions). Watermark diperbarui dalam transaksi yang sama
+    dengan swap partisi, kecuali saat memuat schema bayangan (diperbarui saat
+    swap schema, lihat publish_shadow_dwh).
+    """
+    if load_mode == 'full':
+        load_sql = """
+        TRUNCATE TABLE dwh.factsales RESTART IDENTITY CASCADE;
+        TRUNCATE TABLE dwh.dimemployee RESTART IDENTITY CASCADE;
+        TRUNCATE TABLE dwh.dimlocation RESTART IDENTITY CASCADE;
+        TRUNCATE TABLE dwh.dimweather RESTART IDENTITY CASCADE;
+
+        -- DimDate tidak di-truncate: DateID = YYYYMMDD selalu stabil, jadi
+        -- kalender cukup di-merge (hanya tanggal baru / libur yang berubah)
+        INSERT INTO dwh.dimdate (dateid, fulldate, day, month, monthname, quarter, year, dayofweek, isholiday, holidayname)
+        SELECT dateid, fulldate, day, month, monthname, quarter, year, dayofweek, isholiday, holidayname FROM staging.dimdate
+        ON CONFLICT (dateid) DO UPDATE SET
+            fulldate = EXCLUDED.fulldate, day = EXCLUDED.day, month = EXCLUDED.month,
+            monthname = EXCLUDED.monthname, quarter = EXCLUDED.quarter, year = EXCLUDED.year,
+            dayofweek = EXCLUDED.dayofweek, isholiday = EXCLUDED.isholiday, holidayname = EXCLUDED.holidayname
+        WHERE (dwh.dimdate.isholiday, dwh.dimdate.holidayname, dwh.dimdate.fulldate)
+            IS DISTINCT FROM (EXCLUDED.isholiday, EXCLUDED.holidayname, EXCLUDED.fulldate);
+        INSERT INTO dwh.dimlocation (locationid, cityid_oltp, cityname, countryname) SELECT locationid, cityid_oltp, cityname, countryname FROM staging.dimlocation;
+        INSERT INTO dwh.dimemployee (employeeid, employeeid_oltp, employeename, gender, hiredate) SELECT employeeid, employeeid_oltp, employeename, gender, hiredate FROM staging.dimemployee;
+        INSERT INTO dwh.dimweather (weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid) SELECT weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid FROM staging.dimweather;
+        """
+    else:
+        load_sql = """
+        -- Dimensi: upsert (surrogate key sudah stabil dari FASE 2)
+        INSERT INTO dwh.dimdate (dateid, fulldate, day, month, monthname, quarter, year, dayofweek, isholiday, holidayname)
+        SELECT dateid, fulldate, day, month, monthname, quarter, year, dayofweek, isholiday, holidayname FROM staging.dimdate
+        ON CONFLICT (dateid) DO UPDATE SET
+            fulldate = EXCLUDED.fulldate, day = EXCLUDED.day, month = EXCLUDED.month,
+            monthname = EXCLUDED.monthname, quarter = EXCLUDED.quarter, year = EXCLUDED.year,
+            dayofweek = EXCLUDED.dayofweek, isholiday = EXCLUDED.isholiday, holidayname = EXCLUDED.holidayname
+        WHERE (dwh.dimdate.isholiday, dwh.dimdate.holidayname, dwh.dimdate.fulldate)
+            IS DISTINCT FROM (EXCLUDED.isholiday, EXCLUDED.holidayname, EXCLUDED.fulldate);
+
+        INSERT INTO dwh.dimlocation (locationid, cityid_oltp, cityname, countryname)
+        SELECT locationid, cityid_oltp, cityname, countryname FROM staging.dimlocation
+        ON CONFLICT (locationid) DO UPDATE SET
+            cityid_oltp = EXCLUDED.cityid_oltp, cityname = EXCLUDED.cityname, countryname = EXCLUDED.countryname;
+
+        INSERT INTO dwh.dimemployee (employeeid, employeeid_oltp, employeename, gender, hiredate)
+        SELECT employeeid, employeeid_oltp, employeename, gender, hiredate FROM staging.dimemployee
+        ON CONFLICT (employeeid) DO UPDATE SET
+            employeeid_oltp = EXCLUDED.employeeid_oltp, employeename = EXCLUDED.employeename,
+            gender = EXCLUDED.gender, hiredate = EXCLUDED.hiredate;
+
+        -- Cuaca tanpa tanggal/lokasi tidak pernah direferensikan fakta, dan tidak
+        -- punya key stabil, jadi dibuang dulu agar tidak menumpuk tiap run
+        DELETE FROM dwh.dimweather WHERE dateid IS NULL OR locationid IS NULL;
+        INSERT INTO dwh.dimweather (weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid)
+        SELECT weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid FROM staging.dimweather
+        ON CONFLICT (weatherid) DO UPDATE SET
+            condition = EXCLUDED.condition, temperature_c = EXCLUDED.temperature_c, feelslike_c = EXCLUDED.feelslike_c,
+            wind_kph = EXCLUDED.wind_kph, precip_mm = EXCLUDED.precip_mm, isday = EXCLUDED.isday,
+            dateid = EXCLUDED.dateid, locationid = EXCLUDED.locationid;
+        """
+
+    statements = split_sql_statements(in_schema(load_sql + SCD2_MERGE_SQL, schema))
+    if schema != DWH_SCHEMA:
+        # Schema bayangan baru dibuat kosong: tanpa TRUNCATE, dan dimensi yang
+        # di-merge (DimDate, histori SCD2) dibawa dulu dari versi live
+        statements = [statement for statement in statements if not statement.startswith('TRUNCATE')]
+        statements[:0] = [
+            f"INSERT INTO {schema}.dimdate SELECT * FROM dwh.dimdate",
+            f"""INSERT INTO {schema}.dimproduct ({DIMPRODUCT_COLUMNS})
+            SELECT {DIMPRODUCT_COLUMNS} FROM dwh.dimproduct""",
+            f"""INSERT INTO {schema}.dimcustomer ({DIMCUSTOMER_COLUMNS})
+            SELECT {DIMCUSTOMER_COLUMNS} FROM dwh.dimcustomer""",
+        ]
+
+    # Dijalankan per statement agar tiap insert terukur. Dimensi dan tabel load
+    # partisi fakta disiapkan di transaksi pertama (hanya lock baris / lock
+    # baca pada fakta), lalu partisi ditukar di transaksi kedua yang singkat
+    # bersama watermark, sehingga ACCESS EXCLUSIVE dari DETACH tidak menahan
+    # dashboard selama load.
+    with engine.begin() as conn:
+        for statement in statements:
+            target = re.search(r'(INSERT INTO|DELETE FROM|TRUNCATE TABLE|UPDATE)\s+([\w.]+)', statement)
+            step = f"{target.group(1).split()[0].lower()} {target.group(2)}" if target else statement[:40]
+            with instrument('FASE 3', step) as metrics:
+                result = conn.execute(text(statement))
+                metrics['rows'] = result.rowcount if result.rowcount >= 0 else None
+        if load_mode == 'full':
+            # Full load in-place sudah men-TRUNCATE fakta (dan schema bayangan
+            # belum terlihat pembaca), jadi tidak ada yang perlu dipisah
+            months = prepare_fact_partitions(conn, load_mode, schema)
+            swap_fact_partitions(conn, months, load_mode, schema)
+            if schema == DWH_SCHEMA:
+                update_watermark(conn, load_mode)
+            return
+        months = prepare_fact_partitions(conn, load_mode, schema)
+
+    def swap(conn):
+        swap_fact_partitions(conn, months, load_mode, schema)
+        if schema == DWH_SCHEMA:
+            update_watermark(conn, load_mode)
+
+    run_publish_transaction(swap, "Swap partisi fakta")
+
+# --- AGREGAT DASHBOARD ---
+def capture_aggregate_scope():
+    """
+    Dipanggil sebelum FASE 3 incremental. Mencatat tanggal yang agregatnya
+    harus dihitung ulang ke staging.agg_dates (tanggal baris baru, tanggal
+    versi lama baris yang berubah, dan tanggal yang atribut libur-nya berubah).
+    Mengembalikan True jika atribut dimensi SCD1 yang dipakai agregat berubah
+    (kota, karyawan), sehingga agregat harus full rebuild. Perubahan produk
+    (SCD2) tidak perlu: fakta lama tetap menunjuk versi lamanya, dan fakta yang
+    dimuat ulang sudah tercakup tanggalnya di staging.agg_dates.
+    """
+    scope_sql = """
+    DROP TABLE IF EXISTS staging.agg_dates;
+    CREATE TABLE staging.agg_dates AS
+    SELECT dateid FROM staging.factsales WHERE dateid IS NOT NULL
+    UNION
+    SELECT f.dateid
+    FROM dwh.factsales f
+    JOIN staging.factsales s ON f.salesid_oltp = s.salesid_oltp
+    WHERE f.dateid IS NOT NULL
+    UNION
+    SELECT s.dateid
+    FROM staging.dimdate s
+    JOIN dwh.dimdate d ON s.dateid = d.dateid
+    WHERE (s.fulldate, s.isholiday) IS DISTINCT FROM (d.fulldate, d.isholiday);
+    """
+    dims_changed_sql = """
+    SELECT
+        EXISTS (
+            SELECT 1 FROM staging.dimlocation s JOIN dwh.dimlocation d ON s.locationid = d.locationid
+            WHERE s.cityname IS DISTINCT FROM d.cityname
+        )
+        OR EXISTS (
+            SELECT 1 FROM staging.dimemployee s JOIN dwh.dimemployee d ON s.employeeid = d.employeeid
+            WHERE s.employeename IS DISTINCT FROM d.employeename
+        )
+    """
+    with engine.begin() as conn:
+        conn.execute(text(scope_sql))
+        return bool(conn.execute(text(dims_changed_sql)).scalar())
+
+def refresh_aggregates(incremental=False, schema=DWH_SCHEMA):
+    """
+    Membangun ulang tabel agregat harian dashboard dari dwh.factsales.
+    incremental=True hanya menghitung ulang tanggal di staging.agg_dates.
+    """
+    date_filter = "WHERE f.dateid IN (SELECT dateid FROM staging.agg_dates)" if incremental else ""
+    aggregate_tables = [
+        (in_schema(agg_table, schema), attr_col, attr_expr, in_schema(extra_join, schema))
+        for agg_table, attr_col, attr_expr, extra_join in AGGREGATE_TABLES
+    ]
+    with engine.begin() as conn:
+        for agg_table, attr_col, attr_expr, extra_join in aggregate_tables:
+            if incremental:
+                conn.execute(text(f"DELETE FROM {agg_table} WHERE dateid IN (SELECT dateid FROM staging.agg_dates)"))
+            else:
+                conn.execute(text(f"TRUNCATE TABLE {agg_table}"))
+            with instrument('FASE 4', agg_table) as metrics:
+                result = conn.execute(text(f"""
+                INSERT INTO {agg_table} (dateid, fulldate, categoryname, {attr_col}, revenue, units, transactions)
+                SELECT d.dateid, d.fulldate, p.categoryname, {attr_expr},
+                       SUM(f.totalprice), SUM(f.quantity), COUNT(*)
+                FROM {schema}.factsales f
+                JOIN {schema}.dimdate d ON f.dateid = d.dateid
+                JOIN {schema}.dimproduct p ON f.productid = p.productid
+                {extra_join}
+                {date_filter}
+                GROUP BY d.dateid, d.fulldate, p.categoryname, {attr_expr}
+            """))
+                metrics['rows'] = result.rowcount
+            logging.info(f"Agregat {agg_table} diperbarui ({result.rowcount} baris).")
+        for agg_table, _, _, _ in aggregate_tables:
+            conn.execute(text(f"ANALYZE {agg_table}"))
+
+def bump_load_version():
+    """
+    Menaikkan meta.etl_loadversion agar cache query dashboard diinvalidasi.
+    """
+    with engine.begin() as conn:
+        version = conn.execute(text("""
+            INSERT INTO meta.etl_loadversion (id, version, loadedat) VALUES (1, 1, NOW())
+            ON CONFLICT (id) DO UPDATE SET
+                version = meta.etl_loadversion.version + 1,
+                loadedat = NOW()
+            RETURNING version
+        """)).scalar()
+    logging.info(f"Load version DWH sekarang {version}.")
+
+# --- FORECAST PENJUALAN (HALAMAN PREDICTION) ---
+# Model linear per seri (total, per kategori, per kota) dengan fitur tren, hari
+# dalam minggu, bulan, dan hari libur (dimdate). Semua seri memakai grid tanggal
+# yang sama, jadi X'X sama dan seluruh seri diselesaikan dengan satu lstsq
+# (Y = matriks hari x seri). X'X, X'y, y'y per seri disimpan di
+# dwh.forecast_model: hari baru cukup ditambahkan ke statistik tersebut tanpa
+# membaca ulang histori; refit penuh hanya jika tanggal lama ikut berubah.
+FORECAST_HORIZON_DAYS = int(os.environ.get('ETL_FORECAST_DAYS', '30'))
+FORECAST_SERIES = [
+    # (jenis seri, tabel agregat sumber, kolom nama seri)
+    ('total', 'dwh.aggdailycategory', None),
+    ('category', 'dwh.aggdailycategory', 'categoryname'),
+    ('city', 'dwh.aggdailycity', 'cityname'),
+]
+FORECAST_FEATURES = (
+    ['intercept', 'trend']
+    + [f'dow_{day}' for day in range(1, 7)]
+    + [f'month_{month}' for month in range(2, 13)]
+    + ['holiday']
+)
+
+def forecast_design_matrix(dates, holidays, origin):
+    """Matriks fitur (hari x FORECAST_FEATURES), dibangun vektor tanpa loop."""
+    dates = pd.DatetimeIndex(dates)
+    day_of_week = dates.dayofweek.to_numpy()
+    month = dates.month.to_numpy()
+    return np.column_stack([
+        np.ones(len(dates)),
+        (dates - pd.Timestamp(origin)).days.to_numpy(dtype=float),
+        (day_of_week[:, None] == np.arange(1, 7)).astype(float),
+        (month[:, None] == np.arange(2, 13)).astype(float),
+        np.asarray(holidays, dtype=float),
+    ])
+
+def read_forecast_holidays(conn, schema, dates):
+    """Flag libur dimdate untuk setiap tanggal (False jika tanggal belum ada)."""
+    df = pd.read_sql(
+        text(f"SELECT fulldate, isholiday FROM {schema}.dimdate WHERE fulldate BETWEEN :start AND :end"),
+        conn, params={'start': dates[0].date(), 'end': dates[-1].date()}
+    )
+    flags = df.set_index(pd.to_datetime(df['fulldate']))['isholiday'].astype(bool)
+    return flags.reindex(dates, fill_value=False).to_numpy()
+
+def read_forecast_history(conn, schema, since=None):
+    """
+    Pendapatan harian setiap seri dari tabel agregat: DataFrame index tanggal
+    (grid harian lengkap, hari tanpa penjualan = 0) x kolom (jenis, nama).
+    since: hanya tanggal setelahnya (update incremental), grid mulai since + 1 hari.
+    """
+    frames = []
+    for series_type, agg_table, name_col in FORECAST_SERIES:
+        name_expr = f"a.{name_col}" if name_col else "'All'"
+        date_filter = "WHERE a.fulldate > :since" if since else ""
+        df = pd.read_sql(text(f"""
+            SELECT a.fulldate, {name_expr} AS series_name, SUM(a.revenue) AS revenue
+            FROM {in_schema(agg_table, schema)} a
+            {date_filter}
+            GROUP BY 1, 2
+        """), conn, params={'since': since} if since else None)
+        df['series_type'] = series_type
+        frames.append(df[df['series_name'].notna()])
+    history = pd.concat(frames, ignore_index=True)
+    if history.empty:
+        return pd.DataFrame()
+    history['fulldate'] = pd.to_datetime(history['fulldate'])
+    history['revenue'] = history['revenue'].astype(float)
+    revenue = history.pivot_table(
+        index='fulldate', columns=['series_type', 'series_name'], values='revenue', aggfunc='sum', fill_value=0.0
+    )
+    # Incremental: grid mulai tepat sesudah since, agar hari tanpa penjualan
+    # sebelum penjualan baru pertama tetap masuk statistik (sama dengan refit penuh)
+    start = pd.Timestamp(since) + pd.Timedelta(days=1) if since else revenue.index.min()
+    grid = pd.date_range(start, revenue.index.max(), freq='D')
+    return revenue.reindex(grid, fill_value=0.0)
+
+def load_forecast_model(conn, schema):
+    """Statistik model tersimpan, None jika belum ada / tidak konsisten."""
+    rows = conn.execute(text(f"""
+        SELECT seriestype, seriesname, origindate, trainedthrough, trainingdays, xtx, xty, yty
+        FROM {schema}.forecast_model ORDER BY seriestype, seriesname
+    """)).mappings().all()
+    if not rows or len({(row['origindate'], row['trainedthrough']) for row in rows}) != 1:
+        return None
+    return {
+        'series': [(row['seriestype'], row['seriesname']) for row in rows],
+        'origin': rows[0]['origindate'],
+        'trained_through': rows[0]['trainedthrough'],
+        'days': rows[0]['trainingdays'],
+        'xtx': np.array(json.loads(rows[0]['xtx'])),
+        'xty': np.column_stack([json.loads(row['xty']) for row in rows]),
+        'yty': np.array([row['yty'] for row in rows]),
+    }
+
+def refresh_forecast(schema=DWH_SCHEMA, incremental=False):
+    """
+    Memperbarui dwh.forecast_model & dwh.forecast. incremental=True memakai
+    statistik tersimpan jika tidak ada tanggal lama (<= trainedthrough) yang
+    berubah di staging.agg_dates, selain itu refit penuh dari agregat.
+    """
+    with engine.begin() as conn:
+        model = load_forecast_model(conn, schema) if incremental else None
+        if model is not None:
+            changed_from = conn.execute(text(f"""
+                SELECT MIN(d.fulldate) FROM staging.agg_dates a
+                JOIN {schema}.dimdate d ON a.dateid = d.dateid
+            """)).scalar()
+            if changed_from is not None and changed_from <= model['trained_through']:
+                logging.info(f"Histori sejak {changed_from} berubah, model forecast di-refit penuh.")
+                model = None
+
+        revenue = read_forecast_history(conn, schema, since=model['trained_through'] if model else None)
+        if model is not None and not set(revenue.columns) <= set(model['series']):
+            logging.info("Seri forecast baru ditemukan, model forecast di-refit penuh.")
+            model = None
+            revenue = read_forecast_history(conn, schema)
+        if revenue.empty:
+            logging.info("Tidak ada hari baru untuk forecast, dwh.forecast tidak diubah.")
+            return 0
+
+        if model is not None:
+            revenue = revenue.reindex(columns=pd.MultiIndex.from_tuples(model['series']), fill_value=0.0)
+            origin = model['origin']
+        else:
+            origin = revenue.index[0].date()
+        series = list(revenue.columns)
+        x = forecast_design_matrix(revenue.index, read_forecast_holidays(conn, schema, revenue.index), origin)
+        y = revenue.to_numpy(dtype=float)
+        xtx, xty, yty, days = x.T @ x, x.T @ y, (y ** 2).sum(axis=0), len(revenue)
+        if model is not None:
+            xtx, xty, yty, days = xtx + model['xtx'], xty + model['xty'], yty + model['yty'], days + model['days']
+
+        # Satu solve untuk seluruh seri (lstsq aman untuk X'X singular)
+        beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+        sse = yty - 2 * (beta * xty).sum(axis=0) + np.einsum('is,ij,js->s', beta, xtx, beta)
+        rmse = np.sqrt(np.maximum(sse, 0) / days)
+
+        trained_through = revenue.index[-1]
+        future = pd.date_range(trained_through + pd.Timedelta(days=1), periods=FORECAST_HORIZON_DAYS, freq='D')
+        x_future = forecast_design_matrix(future, read_forecast_holidays(conn, schema, future), origin)
+        prediction = np.maximum(x_future @ beta, 0)
+
+        conn.execute(text(f"DELETE FROM {schema}.forecast_model"))
+        conn.execute(text(f"""
+            INSERT INTO {schema}.forecast_model
+                (seriestype, seriesname, origindate, trainedthrough, trainingdays, xtx, xty, yty, coefficients, rmse, fittedat)
+            VALUES
+                (:series_type, :series_name, :origin, :trained_through, :days, :xtx, :xty, :yty, :coefficients, :rmse, NOW())
+        """), [
+            {
+                'series_type': series_type,
+                'series_name': series_name,
+                'origin': origin,
+                'trained_through': trained_through.date(),
+                'days': days,
+                'xtx': json.dumps(xtx.tolist()),
+                'xty': json.dumps(xty[:, i].tolist()),
+                'yty': float(yty[i]),
+                'coefficients': json.dumps(dict(zip(FORECAST_FEATURES, beta[:, i].round(6).tolist()))),
+                'rmse': float(rmse[i]),
+            }
+            for i, (series_type, series_name) in enumerate(series)
+        ])
+        conn.execute(text(f"DELETE FROM {schema}.forecast"))
+        conn.execute(text(f"""
+            INSERT INTO {schema}.forecast (seriestype, seriesname, dateid, fulldate, revenue, generatedat)
+            VALUES (:series_type, :series_name, :dateid, :fulldate, :revenue, NOW())
+        """), [
+            {
+                'series_type': series_type,
+                'series_name': series_name,
+                'dateid': int(day.strftime('%Y%m%d')),
+                'fulldate': day.date(),
+                'revenue': round(float(prediction[d, i]), 2),
+            }
+            for i, (series_type, series_name) in enumerate(series)
+            for d, day in enumerate(future)
+        ])
+    logging.info(
+        f"Forecast {len(series)} seri x {FORECAST_HORIZON_DAYS} hari diperbarui "
+        f"({'incremental' if model is not None else 'refit penuh'}, data s.d. {trained_through.date()})."
+    )
+    return len(series) * FORECAST_HORIZON_DAYS
+
+# --- PUBLISH DWH (SWAP SCHEMA BAYANGAN) ---
+# Full load mode 'swap': seluruh DWH (tabel, partisi, indeks, agregat) dibangun
+# di dwh_shadow tanpa menyentuh dwh live. Publish = dua ALTER SCHEMA RENAME
+# dalam satu transaksi: tidak menunggu query dashboard yang sedang berjalan
+# (query tersebut selesai di versi lama), dan pembaca tidak pernah melihat
+# tabel kosong. Versi lama disimpan sebagai dwh_previous untuk rollback.
+def schema_exists(conn, schema):
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_namespace WHERE nspname = :schema)"),
+        {'schema': schema}
+    ).scalar()
+
+def build_shadow_dwh(load_mode):
+    """FASE 3-5 ke schema bayangan: DDL dari scheme.sql, load, indeks, agregat, forecast."""
+    table_sql, _ = read_schema_sql()
+    dwh_sql = table_sql.partition(DWH_DDL_END_MARKER)[0]
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {DWH_SHADOW_SCHEMA} CASCADE"))
+        for statement in split_sql_statements(in_schema(dwh_sql, DWH_SHADOW_SCHEMA)):
+            conn.execute(text(statement))
+    logging.info(f"Schema bayangan {DWH_SHADOW_SCHEMA} dibuat, memuat DWH baru...")
+    load_to_dwh(load_mode, schema=DWH_SHADOW_SCHEMA)
+    with instrument('FASE 3', f'create_deferred_indexes {DWH_SHADOW_SCHEMA}'):
+        create_deferred_indexes(DWH_SHADOW_SCHEMA)
+    refresh_aggregates(schema=DWH_SHADOW_SCHEMA)
+    with instrument('FASE 5', f'forecast {DWH_SHADOW_SCHEMA}') as metrics:
+        metrics['rows'] = refresh_forecast(schema=DWH_SHADOW_SCHEMA)
+
+def run_publish_transaction(publish, description):
+    """
+    Menjalankan langkah publish dengan lock_timeout pendek; jika lock tidak
+    didapat, transaksi diulang agar antrean lock tidak memblokir pembaca.
+    """
+    for attempt in range(1, PUBLISH_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{PUBLISH_LOCK_TIMEOUT}'"))
+                publish(conn)
+            return
+        except OperationalError as e:
+            # 55P03 = lock_not_available
+            if getattr(e.orig, 'pgcode', None) != '55P03' or attempt == PUBLISH_RETRIES:
+                raise
+            logging.warning(f"{description}: lock tidak didapat (percobaan {attempt}/{PUBLISH_RETRIES}), diulang...")
+            time.sleep(attempt)
+
+# Watermark versi DWH di dwh_previous, dipulihkan saat rollback
+PREVIOUS_WATERMARK_TABLE = f"{DWH_PREVIOUS_SCHEMA}.factsales"
+
+def read_watermark_rows(conn):
+    """Baris watermark fakta dwh & dwh_previous, {tablename: (nilai, rowsloaded)}."""
+    rows = conn.execute(text("""
+        SELECT tablename, watermarkvalue, rowsloaded FROM meta.etl_watermark
+        WHERE tablename IN ('dwh.factsales', :previous)
+    """), {'previous': PREVIOUS_WATERMARK_TABLE}).all()
+    return {row.tablename: (row.watermarkvalue, row.rowsloaded) for row in rows}
+
+def write_watermark_rows(conn, rows):
+    conn.execute(
+        text("DELETE FROM meta.etl_watermark WHERE tablename IN ('dwh.factsales', :previous)"),
+        {'previous': PREVIOUS_WATERMARK_TABLE}
+    )
+    for table_name, (value, rows_loaded) in rows.items():
+        if value is None:
+            continue
+        conn.execute(text("""
+            INSERT INTO meta.etl_watermark (tablename, watermarkvalue, rowsloaded, updatedat)
+            VALUES (:table_name, :value, :rows_loaded, NOW())
+        """), {'table_name': table_name, 'value': value, 'rows_loaded': rows_loaded})
+
+def publish_shadow_dwh(load_mode):
+    """
+    Menukar dwh_shadow menjadi dwh; watermark ikut dalam transaksi yang sama.
+    Watermark versi lama disimpan sebagai milik dwh_previous.
+    """
+    def swap(conn):
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {DWH_PREVIOUS_SCHEMA} CASCADE"))
+        conn.execute(text(f"ALTER SCHEMA {DWH_SCHEMA} RENAME TO {DWH_PREVIOUS_SCHEMA}"))
+        conn.execute(text(f"ALTER SCHEMA {DWH_SHADOW_SCHEMA} RENAME TO {DWH_SCHEMA}"))
+        current = read_watermark_rows(conn).get('dwh.factsales', (None, None))
+        write_watermark_rows(conn, {PREVIOUS_WATERMARK_TABLE: current})
+        update_watermark(conn, load_mode)
+
+    start = time.perf_counter()
+    run_publish_transaction(swap, "Publish DWH")
+    logging.info(
+        f"DWH baru dipublish dalam {time.perf_counter() - start:.3f}s "
+        f"(versi lama disimpan di {DWH_PREVIOUS_SCHEMA})."
+    )
+
+def rollback_dwh_publish():
+    """
+    Mengembalikan versi DWH sebelum publish terakhir (dwh <-> dwh_previous).
+    Watermark ikut ditukar, jadi run berikutnya melanjutkan incremental dari
+    versi yang dipulihkan. Jika watermark versi itu tidak tersimpan (publish
+    dari versi ETL lama), diambil dari tanggal fakta terakhirnya; awal hari
+    itu aman karena baris yang sudah ada dilewati lewat rowhash.
+    """
+    rollback_schema = f"{DWH_SCHEMA}_rollback"
+
+    def swap_back(conn):
+        if not schema_exists(conn, DWH_PREVIOUS_SCHEMA):
+            raise RuntimeError(f"Schema {DWH_PREVIOUS_SCHEMA} tidak ada, tidak ada versi untuk rollback.")
+        conn.execute(text(f"ALTER SCHEMA {DWH_SCHEMA} RENAME TO {rollback_schema}"))
+        conn.execute(text(f"ALTER SCHEMA {DWH_PREVIOUS_SCHEMA} RENAME TO {DWH_SCHEMA}"))
+        conn.execute(text(f"ALTER SCHEMA {rollback_schema} RENAME TO {DWH_PREVIOUS_SCHEMA}"))
+        watermarks = read_watermark_rows(conn)
+        restored = watermarks.get(PREVIOUS_WATERMARK_TABLE)
+        if restored is None:
+            restored = (conn.execute(text(
+                f"SELECT TO_DATE(MAX(dateid)::TEXT, 'YYYYMMDD')::TIMESTAMP FROM {DWH_SCHEMA}.factsales"
+            )).scalar(), None)
+        write_watermark_rows(conn, {
+            'dwh.factsales': restored,
+            PREVIOUS_WATERMARK_TABLE: watermarks.get('dwh.factsales', (None, None)),
+        })
+
+    run_publish_transaction(swap_back, "Rollback DWH")
+    bump_load_version()
+    logging.info(f"DWH dikembalikan ke versi sebelumnya (versi yang dibatalkan ada di {DWH_PREVIOUS_SCHEMA}).")
+
+# --- MODEL TRANSFORMASI STAGING (DAG) ---
+# Setiap model staging adalah satu unit terpisah dengan dependensi eksplisit.
+# Model yang dependensinya sudah selesai dijalankan paralel, masing-masing di
+# koneksi & transaksinya sendiri, sehingga kegagalan satu model tidak
+# me-rollback model lain yang sudah jadi.
+#
+# Surrogate key stabil: pakai key yang sudah ada di DWH untuk ID OLTP yang
+# sama, baris baru diberi key lanjutan MAX(key) + ROW_NUMBER().
+# (Saat full refresh DWH kosong, hasilnya sama dengan ROW_NUMBER biasa.)
+# SELECT fakta: setiap dimensi di-lookup lewat key map ber-PRIMARY KEY
+# (equi-join pada satu kolom integer/teks unik, ramah hash join)
+FACT_SELECT = """
+            SELECT
+                d.dateid,
+                w.weatherid,
+                p.productid,
+                c.customerid,
+                e.employeeid,
+                c.locationid,
+                s."Quantity"::INT as quantity,
+                -- Hitung TotalPrice karena di CSV nilainya 0
+                (s."Quantity"::INT * p.price * (1 - COALESCE(s."Discount"::DECIMAL(10, 2), 0)))::DECIMAL(10, 2) as totalprice,
+                s."Discount"::DECIMAL(10, 2) as discount,
+                s."SalesID" as salesid_oltp,
+                s.row_hash as rowhash
+            FROM staging.sales_delta s
+            LEFT JOIN staging.keymap_date d
+                ON d.fulldate = s."SalesDate"::DATE
+            -- Versi SCD2 yang berlaku pada SalesDate (tanpa tanggal: versi terbaru)
+            LEFT JOIN staging.keymap_product p
+                ON p.productid_oltp = s."ProductID"
+                AND (s."SalesDate"::TIMESTAMP >= p.validfrom AND s."SalesDate"::TIMESTAMP < p.validto
+                     OR s."SalesDate" IS NULL AND p.validto = TIMESTAMP '9999-12-31')
+            LEFT JOIN staging.keymap_customer c
+                ON c.customerid_oltp = s."CustomerID"
+                AND (s."SalesDate"::TIMESTAMP >= c.validfrom AND s."SalesDate"::TIMESTAMP < c.validto
+                     OR s."SalesDate" IS NULL AND c.validto = TIMESTAMP '9999-12-31')
+            LEFT JOIN staging.keymap_employee e
+                ON e.employeeid_oltp = s."SalesPersonID"
+            LEFT JOIN staging.keymap_weather w
+                ON w.dateid = d.dateid AND w.locationid = c.locationid
+"""
+
+# SELECT fakta lama (join langsung ke tabel staging dimensi, termasuk join teks
+# pada cityname). Hanya dipakai explain_fact_build() sebagai pembanding.
+FACT_SELECT_DIM_JOINS = """
+            SELECT
+                d.dateid,
+                w.weatherid,
+                p.productid,
+                c.customerid,
+                e.employeeid,
+                l.locationid,
+                s."Quantity"::INT as quantity,
+                -- Hitung TotalPrice karena di CSV nilainya 0
+                (s."Quantity"::INT * p.price * (1 - COALESCE(s."Discount"::DECIMAL(10, 2), 0)))::DECIMAL(10, 2) as totalprice,
+                s."Discount"::DECIMAL(10, 2) as discount,
+                s."SalesID" as salesid_oltp,
+                s.row_hash as rowhash
+            FROM staging.sales_delta s
+            LEFT JOIN staging.dimdate d
+                ON s."SalesDate"::DATE = d.fulldate
+            LEFT JOIN staging.dimproduct p
+                ON s."ProductID" = p.productid_oltp
+            LEFT JOIN staging.dimcustomer c
+                ON s."CustomerID" = c.customerid_oltp
+            LEFT JOIN staging.dimemployee e
+                ON s."SalesPersonID" = e.employeeid_oltp
+            LEFT JOIN staging.dimlocation l
+                ON c.customercityname = l.cityname
+            LEFT JOIN staging.dimweather w
+                ON d.dateid = w.dateid AND l.locationid = w.locationid
+"""
+
+STAGING_MODELS = [
+    # Kalender + hari libur
+    {
+        'name': 'dimdate',
+        'depends_on': [],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimdate CASCADE;
+            CREATE TABLE staging.dimdate AS
+            SELECT
+                c."DateID" as dateid,
+                c."FullDate" as fulldate,
+                c."Day" as day,
+                c."Month" as month,
+                c."MonthName" as monthname,
+                c."Quarter" as quarter,
+                c."Year" as year,
+                c."DayOfWeek" as dayofweek,
+                CASE WHEN h."HolidayName" IS NOT NULL THEN TRUE ELSE FALSE END as isholiday,
+                COALESCE(h."HolidayName", '') as holidayname
+            FROM datalake.calendar_mentah c
+            LEFT JOIN datalake.holidays_mentah h ON c."FullDate" = h."FullDate";
+        """,
+    },
+    # Kota
+    {
+        'name': 'dimlocation',
+        'depends_on': [],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimlocation CASCADE;
+            CREATE TABLE staging.dimlocation AS
+            SELECT
+                COALESCE(k.locationid, m.maxid + ROW_NUMBER() OVER (
+                    PARTITION BY k.locationid IS NULL ORDER BY c."CityID"
+                )) as locationid,
+                c."CityID" as cityid_oltp,
+                TRIM(c."CityName") as cityname,
+                'United States' as countryname
+            FROM (SELECT DISTINCT * FROM datalake.cities_mentah) c
+            LEFT JOIN dwh.dimlocation k ON k.cityid_oltp = c."CityID"
+            CROSS JOIN (SELECT COALESCE(MAX(locationid), 0) AS maxid FROM dwh.dimlocation) m;
+        """,
+    },
+    # Produk + kategori
+    {
+        'name': 'dimproduct',
+        'depends_on': ['sales_delta'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimproduct CASCADE;
+            CREATE TABLE staging.dimproduct AS
+            WITH src AS (
+                SELECT DISTINCT ON (p."ProductID")
+                    p."ProductID" as productid_oltp,
+                    TRIM(p."ProductName") as productname,
+                    p."Price" as price,
+                    TRIM(c."CategoryName") as categoryname,
+                    TRIM(p."Class") as class,
+                    TRIM(p."IsAllergic") as isallergic
+                FROM datalake.products_mentah p
+                LEFT JOIN (SELECT DISTINCT * FROM datalake.categories_mentah) c ON p."CategoryID" = c."CategoryID"
+                WHERE p."ProductID" IS NOT NULL
+                ORDER BY p."ProductID", md5(p::TEXT) DESC
+            ),
+            diff AS (
+                SELECT
+                    src.*,
+                    md5(ROW(productname, price::DECIMAL(10, 2), categoryname, class, isallergic)::TEXT) as rowhash,
+                    k.productid as current_productid,
+                    k.validfrom as current_validfrom,
+                    -- Baris DWH sebelum SCD2 belum punya hash: dihitung dari atributnya
+                    COALESCE(k.rowhash, md5(ROW(k.productname, k.price, k.categoryname, k.class, k.isallergic)::TEXT)) as current_rowhash
+                FROM src
+                LEFT JOIN (
+                    SELECT DISTINCT ON (productid_oltp) * FROM dwh.dimproduct
+                    WHERE iscurrent ORDER BY productid_oltp, productid DESC
+                ) k ON k.productid_oltp = src.productid_oltp
+            ),
+            typed AS (
+                SELECT
+                    diff.*,
+                    CASE
+                        WHEN current_productid IS NULL THEN 'new'
+                        WHEN current_rowhash = rowhash THEN 'unchanged'
+                        ELSE 'changed'
+                    END as changetype
+                FROM diff
+            )
+            SELECT
+                -- Versi yang tidak berubah memakai key lama, versi baru dapat key baru
+                CASE WHEN changetype = 'unchanged' THEN current_productid
+                     ELSE m.maxid + ROW_NUMBER() OVER (PARTITION BY changetype = 'unchanged' ORDER BY productid_oltp)
+                END as productid,
+                productid_oltp, productname, price, categoryname, class, isallergic,
+                rowhash,
+                -- Versi baru berlaku tepat SESUDAH watermark fakta (SalesDate terakhir
+                -- yang sudah dimuat): penjualan sampai watermark, termasuk yang
+                -- diproses ulang lewat jendela lookback, tetap pada versi lama
+                -- ([validfrom, validto) di FACT_SELECT). Tanpa watermark (rollback,
+                -- full refresh) dipakai SalesDate terakhir sales_delta, lalu jam run.
+                -- GREATEST menjaga versi baru selalu sesudah versi yang ditutup.
+                CASE changetype
+                    WHEN 'new' THEN TIMESTAMP '1900-01-01'
+                    WHEN 'changed' THEN GREATEST(current_validfrom, wm.watermark) + INTERVAL '1 microsecond'
+                    ELSE current_validfrom
+                END as validfrom,
+                changetype
+            FROM typed
+            CROSS JOIN (SELECT COALESCE(MAX(productid), 0) AS maxid FROM dwh.dimproduct) m
+            CROSS JOIN (
+                SELECT COALESCE(
+                    (SELECT MAX(watermarkvalue) FROM meta.etl_watermark WHERE tablename = 'dwh.factsales'),
+                    (SELECT MAX("SalesDate"::TIMESTAMP) FROM staging.sales_delta),
+                    LOCALTIMESTAMP
+                ) AS watermark
+            ) wm;
+        """,
+    },
+    # Pelanggan + kota + negara
+    {
+        'name': 'dimcustomer',
+        'depends_on': ['sales_delta'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimcustomer CASCADE;
+            CREATE TABLE staging.dimcustomer AS
+            WITH src AS (
+                SELECT DISTINCT ON (c."CustomerID")
+                    c."CustomerID" as customerid_oltp,
+                    TRIM(c."FirstName") as customername,
+                    TRIM(c."Address") as address,
+                    TRIM(ci."CityName") as customercityname,
+                    TRIM(co."CountryName") as customercountryname
+                FROM datalake.customers_mentah c
+                LEFT JOIN (SELECT DISTINCT * FROM datalake.cities_mentah) ci ON c."CityID" = ci."CityID"
+                LEFT JOIN (SELECT DISTINCT * FROM datalake.countries_mentah) co ON ci."CountryID" = co."CountryID"
+                WHERE c."CustomerID" IS NOT NULL
+                ORDER BY c."CustomerID", md5(c::TEXT) DESC
+            ),
+            diff AS (
+                SELECT
+                    src.*,
+                    md5(ROW(customername, address, customercityname, customercountryname)::TEXT) as rowhash,
+                    k.customerid as current_customerid,
+                    k.validfrom as current_validfrom,
+                    COALESCE(k.rowhash, md5(ROW(k.customername, k.address, k.customercityname, k.customercountryname)::TEXT)) as current_rowhash
+                FROM src
+                LEFT JOIN (
+                    SELECT DISTINCT ON (customerid_oltp) * FROM dwh.dimcustomer
+                    WHERE iscurrent ORDER BY customerid_oltp, customerid DESC
+                ) k ON k.customerid_oltp = src.customerid_oltp
+            ),
+            typed AS (
+                SELECT
+                    diff.*,
+                    CASE
+                        WHEN current_customerid IS NULL THEN 'new'
+                        WHEN current_rowhash = rowhash THEN 'unchanged'
+                        ELSE 'changed'
+                    END as changetype
+                FROM diff
+            )
+            SELECT
+                CASE WHEN changetype = 'unchanged' THEN current_customerid
+                     ELSE m.maxid + ROW_NUMBER() OVER (PARTITION BY changetype = 'unchanged' ORDER BY customerid_oltp)
+                END as customerid,
+                customerid_oltp, customername, address, customercityname, customercountryname,
+                rowhash,
+                CASE changetype
+                    WHEN 'new' THEN TIMESTAMP '1900-01-01'
+                    WHEN 'changed' THEN GREATEST(current_validfrom, wm.watermark) + INTERVAL '1 microsecond'
+                    ELSE current_validfrom
+                END as validfrom,
+                changetype
+            FROM typed
+            CROSS JOIN (SELECT COALESCE(MAX(customerid), 0) AS maxid FROM dwh.dimcustomer) m
+            CROSS JOIN (
+                SELECT COALESCE(
+                    (SELECT MAX(watermarkvalue) FROM meta.etl_watermark WHERE tablename = 'dwh.factsales'),
+                    (SELECT MAX("SalesDate"::TIMESTAMP) FROM staging.sales_delta),
+                    LOCALTIMESTAMP
+                ) AS watermark
+            ) wm;
+        """,
+    },
+    # Karyawan
+    {
+        'name': 'dimemployee',
+        'depends_on': [],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimemployee CASCADE;
+            CREATE TABLE staging.dimemployee AS
+            SELECT
+                COALESCE(k.employeeid, m.maxid + ROW_NUMBER() OVER (
+                    PARTITION BY k.employeeid IS NULL ORDER BY e."EmployeeID"
+                )) as employeeid,
+                e."EmployeeID" as employeeid_oltp,
+                TRIM(e."FirstName") as employeename,
+                TRIM(e."Gender") as gender,
+                e."HireDate"::DATE as hiredate
+            FROM (SELECT DISTINCT * FROM datalake.employees_mentah) e
+            LEFT JOIN dwh.dimemployee k ON k.employeeid_oltp = e."EmployeeID"
+            CROSS JOIN (SELECT COALESCE(MAX(employeeid), 0) AS maxid FROM dwh.dimemployee) m;
+        """,
+    },
+    # Cuaca harian per kota (butuh key tanggal & lokasi dari staging)
+    {
+        'name': 'dimweather',
+        'depends_on': ['keymap_date', 'keymap_location'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.dimweather CASCADE;
+            CREATE TABLE staging.dimweather AS
+            SELECT
+                COALESCE(k.weatherid, m.maxid + ROW_NUMBER() OVER (
+                    PARTITION BY k.weatherid IS NULL ORDER BY w."time", w."CityName"
+                )) as weatherid,
+                NULL::text AS condition,
+                w."temperature_2m_max"        AS temperature_c,
+                NULL::float                   AS feelslike_c,
+                w."windspeed_10m_max"        AS wind_kph,
+                w."precipitation_sum"        AS precip_mm,
+                NULL::int                    AS isday,
+                d.dateid,
+                l.locationid
+            FROM (SELECT DISTINCT * FROM datalake.weather_mentah) w
+            LEFT JOIN staging.keymap_date d
+                ON d.fulldate = w."time"::DATE
+            LEFT JOIN staging.keymap_location l
+                ON l.cityname = TRIM(w."CityName")
+            LEFT JOIN dwh.dimweather k
+                ON k.dateid = d.dateid AND k.locationid = l.locationid
+            CROSS JOIN (SELECT COALESCE(MAX(weatherid), 0) AS maxid FROM dwh.dimweather) m;
+        """,
+    },
+    # ---- Key map: tabel sempit ber-PRIMARY KEY + ANALYZE untuk lookup fakta ----
+    # tanggal -> dateid
+    {
+        'name': 'keymap_date',
+        'depends_on': ['dimdate'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_date;
+            CREATE TABLE staging.keymap_date AS
+            SELECT DISTINCT ON (fulldate) fulldate, dateid
+            FROM staging.dimdate
+            WHERE fulldate IS NOT NULL
+            ORDER BY fulldate, dateid;
+            ALTER TABLE staging.keymap_date ADD PRIMARY KEY (fulldate);
+            ANALYZE staging.keymap_date;
+        """,
+    },
+    # nama kota -> locationid
+    {
+        'name': 'keymap_location',
+        'depends_on': ['dimlocation'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_location;
+            CREATE TABLE staging.keymap_location AS
+            SELECT DISTINCT ON (cityname) cityname, locationid
+            FROM staging.dimlocation
+            WHERE cityname IS NOT NULL
+            ORDER BY cityname, locationid;
+            ALTER TABLE staging.keymap_location ADD PRIMARY KEY (cityname);
+            ANALYZE staging.keymap_location;
+        """,
+    },
+    # ProductID OLTP -> productid (+ harga untuk TotalPrice), satu baris per
+    # versi SCD2 beserta rentang berlakunya: versi historis & versi current yang
+    # ditutup load ini dari DWH, versi current dari staging. Rentang kosong
+    # (versi yang tidak pernah berlaku) dibuang.
+    {
+        'name': 'keymap_product',
+        'depends_on': ['dimproduct'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_product;
+            CREATE TABLE staging.keymap_product AS
+            SELECT productid_oltp, productid, price, validfrom, validto
+            FROM (
+                SELECT d.productid_oltp, d.productid, d.price, d.validfrom,
+                       CASE WHEN d.iscurrent THEN s.validfrom ELSE d.validto END as validto
+                FROM dwh.dimproduct d
+                LEFT JOIN staging.dimproduct s
+                    ON s.productid_oltp = d.productid_oltp AND s.changetype = 'changed'
+                WHERE NOT d.iscurrent OR s.productid IS NOT NULL
+                UNION ALL
+                SELECT productid_oltp, productid, price, validfrom, TIMESTAMP '9999-12-31'
+                FROM staging.dimproduct
+            ) v
+            WHERE productid_oltp IS NOT NULL AND validfrom < validto;
+            ALTER TABLE staging.keymap_product ADD PRIMARY KEY (productid);
+            CREATE INDEX ON staging.keymap_product (productid_oltp, validfrom);
+            ANALYZE staging.keymap_product;
+        """,
+    },
+    # CustomerID OLTP -> customerid (+ locationid kota pelanggan), per versi SCD2
+    {
+        'name': 'keymap_customer',
+        'depends_on': ['dimcustomer', 'keymap_location'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_customer;
+            CREATE TABLE staging.keymap_customer AS
+            SELECT v.customerid_oltp, v.customerid, l.locationid, v.validfrom, v.validto
+            FROM (
+                SELECT d.customerid_oltp, d.customerid, d.customercityname, d.validfrom,
+                       CASE WHEN d.iscurrent THEN s.validfrom ELSE d.validto END as validto
+                FROM dwh.dimcustomer d
+                LEFT JOIN staging.dimcustomer s
+                    ON s.customerid_oltp = d.customerid_oltp AND s.changetype = 'changed'
+                WHERE NOT d.iscurrent OR s.customerid IS NOT NULL
+                UNION ALL
+                SELECT customerid_oltp, customerid, customercityname, validfrom, TIMESTAMP '9999-12-31'
+                FROM staging.dimcustomer
+            ) v
+            LEFT JOIN staging.keymap_location l ON l.cityname = v.customercityname
+            WHERE v.customerid_oltp IS NOT NULL AND v.validfrom < v.validto;
+            ALTER TABLE staging.keymap_customer ADD PRIMARY KEY (customerid);
+            CREATE INDEX ON staging.keymap_customer (customerid_oltp, validfrom);
+            ANALYZE staging.keymap_customer;
+        """,
+    },
+    # EmployeeID OLTP -> employeeid
+    {
+        'name': 'keymap_employee',
+        'depends_on': ['dimemployee'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_employee;
+            CREATE TABLE staging.keymap_employee AS
+            SELECT DISTINCT ON (employeeid_oltp) employeeid_oltp, employeeid
+            FROM staging.dimemployee
+            WHERE employeeid_oltp IS NOT NULL
+            ORDER BY employeeid_oltp, employeeid;
+            ALTER TABLE staging.keymap_employee ADD PRIMARY KEY (employeeid_oltp);
+            ANALYZE staging.keymap_employee;
+        """,
+    },
+    # (dateid, locationid) -> weatherid
+    {
+        'name': 'keymap_weather',
+        'depends_on': ['dimweather'],
+        'sql': """
+            DROP TABLE IF EXISTS staging.keymap_weather;
+            CREATE TABLE staging.keymap_weather AS
+            SELECT DISTINCT ON (dateid, locationid) dateid, locationid, weatherid
+            FROM staging.dimweather
+            WHERE dateid IS NOT NULL AND locationid IS NOT NULL
+            ORDER BY dateid, locationid, weatherid;
+            ALTER TABLE staging.keymap_weather ADD PRIMARY KEY (dateid, locationid);
+            ANALYZE staging.keymap_weather;
+        """,
+    },
+    # Fakta dari staging.sales_delta (semua baris saat full refresh,
+    # hanya baris baru/berubah saat incremental)
+    {
+        'name': 'factsales',
+        'depends_on': [
+            'sales_delta', 'keymap_date', 'keymap_product', 'keymap_customer',
+            'keymap_employee', 'keymap_weather',
+        ],
+        'sql': f"""
+            DROP TABLE IF EXISTS staging.factsales CASCADE;
+            CREATE TABLE staging.factsales AS
+            {FACT_SELECT};
+        """,
+    },
+]
+
+def explain_fact_build():
+    """
+    EXPLAIN ANALYZE SELECT fakta versi join dimensi langsung vs versi key map,
+    untuk membandingkan waktu eksekusi sebelum/sesudah. Query dijalankan penuh
+    (tanpa menulis tabel), jadi hanya aktif jika ETL_EXPLAIN=1.
+    """
+    plans = [('dim_joins', FACT_SELECT_DIM_JOINS), ('keymaps', FACT_SELECT)]
+    with engine.connect() as conn:
+        for label, select_sql in plans:
+            plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {select_sql}")).scalar()[0]
+            execution_ms = plan['Execution Time']
+            root = plan['Plan']
+            logging.info(
+                f"EXPLAIN factsales ({label}): planning {plan['Planning Time']:.1f} ms, "
+                f"eksekusi {execution_ms:.1f} ms, {root['Actual Rows']} baris, node teratas {root['Node Type']}."
+            )
+            record_step('explain', f"factsales.{label}", execution_ms / 1000, rows=root['Actual Rows'])
+
+def run_model(model, params=None):
+    """Menjalankan satu model staging dalam transaksinya sendiri."""
+    if 'func' in model:
+        return model['func']()
+    rows = None
+    with engine.begin() as conn:
+        for statement in split_sql_statements(model['sql']):
+            result = conn.execute(text(statement), params or {})
+            # rowcount CREATE TABLE AS = jumlah baris model (DDL lain -1)
+            if result.rowcount >= 0:
+                rows = result.rowcount
+    return rows
+
+def run_model_dag(models, phase_name, max_workers=ETL_MAX_WORKERS):
+    """
+    Scheduler DAG sederhana: model dijalankan begitu semua dependensinya
+    selesai. Jika ada model gagal, model baru tidak dijadwalkan lagi, model yang
+    sedang jalan ditunggu, lalu pipeline dihentikan. Mengembalikan durasi
+    (detik) per model.
+    """
+    by_name = {model['name']: model for model in models}
+    for model in models:
+        missing = [dep for dep in model['depends_on'] if dep not in by_name]
+        if missing:
+            raise ValueError(f"Model {model['name']} bergantung pada model tak dikenal: {missing}")
+
+    logging.info(f"Menjalankan {len(models)} model {phase_name} dengan {max_workers} worker paralel...")
+    start = time.perf_counter()
+    pending = dict(by_name)
+    done = set()
+    durations = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model') as executor:
+        running = {}
+        while pending or running:
+            if not failures:
+                ready = [
+                    name for name, model in pending.items()
+                    if all(dep in done for dep in model['depends_on'])
+                ]
+                for name in ready:
+                    running[executor.submit(_timed_call, run_model, pending.pop(name))] = name
+            if not running:
+                if pending and not failures:
+                    raise ValueError(f"Dependensi siklik pada model: {sorted(pending)}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    rows, elapsed = future.result()
+                except Exception as e:
+                    failures[name] = e
+                    logging.error(f"Model {name} GAGAL: {e}")
+                    record_step(phase_name, f"model.{name}", 0.0, status='failed')
+                    continue
+                record_step(phase_name, f"model.{name}", elapsed, rows=rows)
+                done.add(name)
+                durations[name] = elapsed
+                logging.info(f"Model {name} selesai dalam {elapsed:.2f}s.")
+
+    logging.info(f"=== Durasi model {phase_name} ===")
+    for name, elapsed in sorted(durations.items(), key=lambda item: -item[1]):
+        logging.info(f"{name:<15} {elapsed:>8.2f}s")
+    logging.info(f"Wall-clock {phase_name}: {time.perf_counter() - start:.2f}s")
+
+    if failures:
+        skipped = sorted(pending)
+        raise RuntimeError(
+            f"{phase_name} gagal untuk model: {', '.join(sorted(failures))}"
+            + (f" (tidak dijalankan: {', '.join(skipped)})" if skipped else "")
+        )
+    return durations
+
+# --- DATA QUALITY (DQ) ---
+# Check dideklarasikan per tabel lalu dikompilasi menjadi SATU scan per tabel
+# (agregat bersyarat COUNT(*) FILTER), jadi menambah check tidak menambah scan.
+# Jenis check:
+#   null        : kolom tidak boleh NULL
+#   range       : kolom di luar [min, max] (NULL tidak dihitung)
+#   referential : nilai kolom harus ada di ref_table.ref_column
+#   unique      : kolom tidak boleh duplikat
+#   row_drift   : jumlah baris tidak boleh berubah > max_change (rasio) dibanding
+#                 run terakhir dengan load mode yang sama
+# Severity 'error' menghentikan pipeline sebelum FASE 3, 'warn' hanya dicatat.
+# Semua hasil (durasi scan, contoh key baris buruk) disimpan ke meta.dq_results.
+DQ_SAMPLE_KEYS = 5
+
+DQ_CHECKS = [
+    {'name': 'Negative Quantity Check', 'table': 'staging.factsales', 'type': 'range',
+     'column': 'quantity', 'min': 0, 'severity': 'error'},
+    {'name': 'Negative Price Check', 'table': 'staging.factsales', 'type': 'range',
+     'column': 'totalprice', 'min': 0, 'severity': 'error'},
+    {'name': 'Discount Range Check', 'table': 'staging.factsales', 'type': 'range',
+     'column': 'discount', 'min': 0, 'max': 1, 'severity': 'warn'},
+    {'name': 'Null Product ID in Fact', 'table': 'staging.factsales', 'type': 'null',
+     'column': 'productid', 'severity': 'error'},
+    {'name': 'Null Customer ID in Fact', 'table': 'staging.factsales', 'type': 'null',
+     'column': 'customerid', 'severity': 'error'},
+    # Sales tanpa SalesDate memang ada di sumber (masuk partisi default)
+    {'name': 'Null Date ID in Fact', 'table': 'staging.factsales', 'type': 'null',
+     'column': 'dateid', 'severity': 'warn'},
+    # Fakta bisa menunjuk versi SCD2 historis, jadi dicek ke key map (semua versi)
+    {'name': 'Fact Product Exists', 'table': 'staging.factsales', 'type': 'referential',
+     'column': 'productid', 'ref_table': 'staging.keymap_product', 'ref_column': 'productid', 'severity': 'error'},
+    {'name': 'Fact Customer Exists', 'table': 'staging.factsales', 'type': 'referential',
+     'column': 'customerid', 'ref_table': 'staging.keymap_customer', 'ref_column': 'customerid', 'severity': 'error'},
+    {'name': 'Fact Employee Exists', 'table': 'staging.factsales', 'type': 'referential',
+     'column': 'employeeid', 'ref_table': 'staging.dimemployee', 'ref_column': 'employeeid', 'severity': 'warn'},
+    {'name': 'Unique Sales ID in Fact', 'table': 'staging.factsales', 'type': 'unique',
+     'column': 'salesid_oltp', 'severity': 'error'},
+    {'name': 'Fact Row Count Drift', 'table': 'staging.factsales', 'type': 'row_drift',
+     'max_change': 0.5, 'severity': 'warn'},
+    {'name': 'Unique Product Key', 'table': 'staging.dimproduct', 'type': 'unique',
+     'column': 'productid', 'severity': 'error'},
+    {'name': 'Negative Product Price', 'table': 'staging.dimproduct', 'type': 'range',
+     'column': 'price', 'min': 0, 'severity': 'warn'},
+    {'name': 'Unique Customer Key', 'table': 'staging.dimcustomer', 'type': 'unique',
+     'column': 'customerid', 'severity': 'error'},
+]
+
+# Kolom key yang diambil sebagai contoh baris buruk per tabel
+DQ_SAMPLE_KEY_COLUMNS = {
+    'staging.factsales': 'salesid_oltp',
+    'staging.dimproduct': 'productid_oltp',
+    'staging.dimcustomer': 'customerid_oltp',
+}
+
+# Kunci wajib per jenis check (selain name, table, severity)
+DQ_REQUIRED_KEYS = {
+    'null': ('column',),
+    'range': ('column',),
+    'referential': ('column', 'ref_table', 'ref_column'),
+    'unique': ('column',),
+    'row_drift': ('max_change',),
+}
+
+def validate_dq_checks(checks):
+    """
+    Menolak deklarasi check yang tidak bisa dikompilasi, sebelum scan apa pun
+    (satu check rusak akan menggagalkan scan gabungan seluruh tabelnya).
+    """
+    for check in checks:
+        name = check.get('name', '<tanpa nama>')
+        required = DQ_REQUIRED_KEYS.get(check.get('type'))
+        if required is None:
+            raise ValueError(f"DQ check {name}: jenis {check.get('type')!r} tidak dikenal.")
+        missing = [key for key in ('name', 'table', 'severity') + required if check.get(key) is None]
+        if missing:
+            raise ValueError(f"DQ check {name}: kunci wajib tidak ada: {', '.join(missing)}.")
+        if check['severity'] not in ('error', 'warn'):
+            raise ValueError(f"DQ check {name}: severity {check['severity']!r} tidak dikenal.")
+        if check['type'] == 'range' and check.get('min') is None and check.get('max') is None:
+            raise ValueError(f"DQ check {name}: check range butuh min dan/atau max.")
+
+def dq_bad_row_condition(check, index):
+    """Kondisi SQL untuk baris yang melanggar check (None jika bukan per baris)."""
+    column = f"t.{check.get('column')}"
+    if check['type'] == 'null':
+        return f"{column} IS NULL"
+    if check['type'] == 'range':
+        bounds = []
+        if check.get('min') is not None:
+            bounds.append(f"{column} < {check['min']}")
+        if check.get('max') is not None:
+            bounds.append(f"{column} > {check['max']}")
+        return ' OR '.join(bounds)
+    if check['type'] == 'referential':
+        return f"{column} IS NOT NULL AND r{index}.ref_key IS NULL"
+    return None
+
+def dq_join(check, index):
+    """
+    LEFT JOIN ke tabel referensi untuk check referential (None untuk jenis lain).
+    Berbeda dengan NOT IN (hashed SubPlan yang jatuh ke scan per baris bila hash
+    tidak muat di work_mem), hash join bisa dipecah ke batch di disk. DISTINCT
+    menjaga satu baris per key agar baris yang dicek tidak terduplikasi.
+    """
+    if check['type'] != 'referential':
+        return None
+    return (
+        f"LEFT JOIN (SELECT DISTINCT {check['ref_column']} AS ref_key FROM {check['ref_table']}) r{index} "
+        f"ON r{index}.ref_key = t.{check['column']}"
+    )
+
+def compile_dq_scan(table_name, checks):
+    """
+    Satu SELECT untuk seluruh check sebuah tabel. Kondisi tiap check dihitung
+    sekali per baris sebagai flag b<i> di subquery, lalu diagregasi menjadi
+    c<i> (jumlah baris buruk) dan s<i> (contoh key). Check referential
+    menambah LEFT JOIN r<i> ke subquery tersebut (anti-join).
+    """
+    sample_key = DQ_SAMPLE_KEY_COLUMNS.get(table_name)
+    inner_items = [f"t.{sample_key} AS sample_key"] if sample_key else []
+    joins = []
+    select_items = ['COUNT(*) AS row_count']
+    for i, check in enumerate(checks):
+        if check['type'] == 'unique':
+            inner_items.append(f"t.{check['column']} AS u{i}")
+            select_items.append(f"COUNT(u{i}) - COUNT(DISTINCT u{i}) AS c{i}")
+            continue
+        condition = dq_bad_row_condition(check, i)
+        if condition is None:
+            continue
+        join = dq_join(check, i)
+        if join:
+            joins.append(join)
+        inner_items.append(f"COALESCE({condition}, FALSE) AS b{i}")
+        select_items.append(f"COUNT(*) FILTER (WHERE b{i}) AS c{i}")
+        if sample_key:
+            select_items.append(f"(ARRAY_AGG(sample_key) FILTER (WHERE b{i}))[1:{DQ_SAMPLE_KEYS}] AS s{i}")
+    # OFFSET 0 mencegah subquery di-flatten (flag tidak dievaluasi ulang per agregat)
+    from_sql = ' '.join([f"{table_name} t"] + joins)
+    inner_sql = f"SELECT {', '.join(inner_items) or '1'} FROM {from_sql} OFFSET 0"
+    return f"SELECT {', '.join(select_items)} FROM ({inner_sql}) dq"
+
+def previous_dq_value(conn, check_name, load_mode):
+    return conn.execute(text("""
+        SELECT observedvalue FROM meta.dq_results
+        WHERE checkname = :name AND loadmode = :load_mode AND status <> 'failed'
+        ORDER BY checkedat DESC, resultid DESC
+        LIMIT 1
+    """), {'name': check_name, 'load_mode': load_mode}).scalar()
+
+def evaluate_dq_check(conn, check, row, index, load_mode):
+    """Hasil satu check dari baris hasil scan tabelnya."""
+    threshold = check.get('threshold', 0)
+    result = {
+        'check_name': check['name'],
+        'table_name': check['table'],
+        'check_type': check['type'],
+        'severity': check['severity'],
+        'bad_rows': None,
+        'observed': None,
+        'threshold': threshold,
+        'sample_keys': None,
+    }
+    if check['type'] == 'row_drift':
+        row_count = row['row_count']
+        previous = previous_dq_value(conn, check['name'], load_mode)
+        result['observed'] = row_count
+        result['threshold'] = check['max_change']
+        change = abs(row_count - float(previous)) / float(previous) if previous else 0.0
+        passed = change <= check['max_change']
+        detail = f"{row_count} baris vs {previous} run sebelumnya ({change:.0%})"
+    else:
+        bad_rows = row[f'c{index}'] or 0
+        samples = row.get(f's{index}')
+        result['bad_rows'] = bad_rows
+        result['observed'] = bad_rows
+        result['sample_keys'] = json.dumps([str(key) for key in samples]) if samples else None
+        passed = bad_rows <= threshold
+        detail = f"{bad_rows} baris buruk" + (f", contoh key: {', '.join(map(str, samples))}" if samples else "")
+
+    if passed:
+        result['status'] = 'passed'
+        logging.info(f"DQ PASSED: {check['name']} ({detail})")
+    elif check['severity'] == 'error':
+        result['status'] = 'failed'
+        logging.error(f"DQ FAILED: {check['name']}: {detail}.")
+    else:
+        result['status'] = 'warn'
+        logging.warning(f"DQ WARN: {check['name']}: {detail}.")
+    return result
+
+def save_dq_results(results):
+    """Menyimpan hasil DQ run ini ke meta.dq_results (best effort)."""
+    if not results:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO meta.dq_results
+                    (runid, loadmode, checkname, tablename, checktype, severity, status,
+                     badrows, observedvalue, threshold, samplekeys, scanseconds)
+                VALUES
+                    (:run_id, :load_mode, :check_name, :table_name, :check_type, :severity, :status,
+                     :bad_rows, :observed, :threshold, :sample_keys, :scan_seconds)
+            """), results)
+    except Exception as e:
+        logging.warning(f"Gagal menyimpan meta.dq_results: {e}")
+
+def run_dq_checks(load_mode, checks=DQ_CHECKS):
+    """
+    FASE 2.5: menjalankan seluruh check (satu scan per tabel), menyimpan
+    hasilnya, lalu menghentikan pipeline jika ada check severity 'error' gagal.
+    """
+    validate_dq_checks(checks)
+    by_table = {}
+    for check in checks:
+        by_table.setdefault(check['table'], []).append(check)
+
+    results = []
+    with engine.connect() as conn:
+        for table_name, table_checks in by_table.items():
+            with instrument('FASE 2.5', f"dq.{table_name}") as metrics:
+                scan_start = time.perf_counter()
+                row = conn.execute(text(compile_dq_scan(table_name, table_checks))).mappings().one()
+                scan_seconds = time.perf_counter() - scan_start
+                metrics['rows'] = row['row_count']
+            logging.info(
+                f"DQ scan {table_name}: {len(table_checks)} check, {row['row_count']} baris, {scan_seconds:.2f}s."
+            )
+            for i, check in enumerate(table_checks):
+                result = evaluate_dq_check(conn, check, row, i, load_mode)
+                result.update({'run_id': RUN_ID, 'load_mode': load_mode, 'scan_seconds': round(scan_seconds, 4)})
+                results.append(result)
+
+    save_dq_results(results)
+    failed = [result['check_name'] for result in results if result['status'] == 'failed']
+    if failed:
+        raise ValueError(
+            f"Data Quality Checks Failed ({', '.join(failed)})! Pipeline dihentikan sebelum Load ke DWH."
+        )
+    return results
+
 # --- FUNGSI UTAMA ---
-def run_elt():
+def run_elt(full_refresh=False, force=False, offline=False):
+    run_start = time.perf_counter()
+    run_status = 'ok'
     try:
+        # Full refresh membangun ulang DWH, jadi transformasi wajib jalan
+        force = force or full_refresh
+
+        phase_start = time.perf_counter()
+
         # FASE 1: "Load ke Data Lake" (Ini adalah proses E-L)
         logging.info("Memulai Extract & Load CSV ke Data Lake...")
 
-        # Baca CSV, Load ke Data Lake
-        df_products = pd.read_csv('./data/raw/products.csv')
-        df_products.to_sql('products_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_products
-        logging.info("Berhasil memuat datalake.products_mentah.") 
-        
-        df_categories = pd.read_csv('./data/raw/categories.csv')
-        df_categories.to_sql('categories_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_categories
-        logging.info("Berhasil memuat datalake.categories_mentah.")
-        
-        df_employees = pd.read_csv('./data/raw/employees.csv')
-        df_employees.to_sql('employees_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_employees
-        logging.info("Berhasil memuat datalake.employees_mentah.")
-
-        df_customers = pd.read_csv('./data/raw/customers.csv')
-        df_customers.to_sql('customers_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_customers
-        logging.info("Berhasil memuat datalake.customers_mentah.")
-
-        df_cities = pd.read_csv('./data/raw/cities_MODIFIED_with_coords.csv')
-        df_cities.to_sql(
-            'cities_mentah', 
-            con=engine,         
-            schema='datalake', 
-            if_exists='replace', 
-            index=False
+        # Baca CSV, Load ke Data Lake secara paralel
+        # (COPY bulk load, fallback ke to_sql; sumber tak berubah dilewati)
+        source_stats = run_phase1_parallel(force=force)
+        # Kalender & libur butuh rentang tahun sales, jadi dijalankan setelah
+        # CSV termuat (libur semua tahun diambil paralel)
+        with instrument('FASE 1', 'calendar'):
+            source_stats.append(load_calendar_and_holidays_to_staging(force=force, offline=offline))
+        changed_tables = {stat['table'] for stat in source_stats if stat.get('changed')}
+        record_step(
+            'run', 'FASE 1', time.perf_counter() - phase_start,
+            rows=sum(stat['rows'] for stat in source_stats),
+            bytes_processed=sum(stat['bytes'] for stat in source_stats)
         )
-        del df_cities
-        logging.info("Berhasil memuat datalake.cities_mentah.")
-
-        df_countries = pd.read_csv('./data/raw/countries.csv')
-        df_countries.to_sql('countries_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_countries
-        logging.info("Berhasil memuat datalake.countries_mentah.")
         
-        df_weather = pd.read_csv('./data/raw/weather_mentah.csv')
-        df_weather.to_sql('weather_mentah', con=engine, schema='datalake', if_exists='replace', index=False)
-        del df_weather
-        logging.info("Berhasil memuat datalake.weather_mentah.")
-
-        # --- Load Sales (Gunakan chunking jika file besar) ---
-        logging.info("Memproses file sales (chunking)...")
-        chunk_size = 100000 
-        sales_iterator = pd.read_csv('./data/raw/sales.csv', chunksize=chunk_size)
-        
-        # Hapus tabel lama (jika ada) HANYA SEKALI
-        with engine.connect() as conn:
-            conn.execute(text("DROP TABLE IF EXISTS datalake.sales_mentah;"))
-            conn.commit()
+        logging.info("FASE 1 (CSV + API) SELESAI: Data Lake terisi.")
 
-        for i, chunk in enumerate(sales_iterator):
-            logging.info(f"Memuat sales chunk {i+1}...")
-            chunk.to_sql(
-                'sales_mentah',
-                con=engine,
-                schema='datalake',
-                if_exists='append', 
-                index=False
+        if not changed_tables:
+            logging.info(
+                "Semua sumber tidak berubah sejak run sukses terakhir. "
+                "Fase 2-4 dilewati (gunakan --force untuk memaksa)."
             )
-            del chunk
-        logging.info("Berhasil memuat datalake.sales_mentah.")
-        
-        logging.info("FASE 1 (CSV) SELESAI: Data Lake terisi.")
-
-        # --- FASE 1 (API) ---
-        logging.info("Memulai Fase 1 (API)...")
-        load_calendar_and_holidays_to_staging(year=2018, country_code='US')
-        
-        logging.info("FASE 1 (API) SELESAI.")
+            return
         
         # ==========================================================
         # FASE 2: TRANSFORMASI (T)
         # (TAMBAHKAN SEMUA KODE DI BAWAH INI)
         # ==========================================================
         logging.info("Memulai Fase 2: Transformasi (Data Lake ke Staging)...")
-        
-        # Ini adalah satu string SQL besar yang berisi semua logika transformasi
-        transform_sql = """
-        -- ========= FASE 2.1: BERSIHKAN STAGING (Agar Idempotent) =========
-        DROP TABLE IF EXISTS staging.factsales CASCADE;
-        DROP TABLE IF EXISTS staging.dimproduct CASCADE;
-        DROP TABLE IF EXISTS staging.dimcustomer CASCADE;
-        DROP TABLE IF EXISTS staging.dimemployee CASCADE;
-        DROP TABLE IF EXISTS staging.dimlocation CASCADE;
-        DROP TABLE IF EXISTS staging.dimdate CASCADE;
-        DROP TABLE IF EXISTS staging.dimweather CASCADE;
-
-        -- ========= FASE 2.2: TRANSFORMASI KE STAGING (dari Data Lake) =========
-
-        -- 2.2.1. Transform ke staging.dimdate
-        CREATE TABLE staging.dimdate AS
-        SELECT
-            c."DateID" as dateid,
-            c."FullDate" as fulldate,
-            c."Day" as day,
-            c."Month" as month,
-            c."MonthName" as monthname,
-            c."Quarter" as quarter,
-            c."Year" as year,
-            c."DayOfWeek" as dayofweek,
-            CASE WHEN h."HolidayName" IS NOT NULL THEN TRUE ELSE FALSE END as isholiday,
-            COALESCE(h."HolidayName", '') as holidayname
-        FROM datalake.calendar_mentah c
-        LEFT JOIN datalake.holidays_mentah h ON c."FullDate" = h."FullDate";
-
-        -- 2.2.2. Transform ke staging.dimlocation
-        CREATE TABLE staging.dimlocation AS
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY "CityID") as locationid,
-            "CityID" as cityid_oltp,
-            TRIM("CityName") as cityname,
-            'United States' as countryname
-        FROM (SELECT DISTINCT * FROM datalake.cities_mentah) c;
-
-        -- 2.2.3. Transform ke staging.dimproduct
-        CREATE TABLE staging.dimproduct AS
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY p."ProductID") as productid,
-            p."ProductID" as productid_oltp,
-            TRIM(p."ProductName") as productname,
-            p."Price" as price,
-            TRIM(c."CategoryName") as categoryname,
-            TRIM(p."Class") as class,
-            TRIM(p."IsAllergic") as isallergic
-        FROM (SELECT DISTINCT * FROM datalake.products_mentah) p
-        LEFT JOIN (SELECT DISTINCT * FROM datalake.categories_mentah) c ON p."CategoryID" = c."CategoryID";
-
-        -- 2.2.4. Transform ke staging.dimcustomer
-        CREATE TABLE staging.dimcustomer AS
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY c."CustomerID") as customerid,
-            c."CustomerID" as customerid_oltp,
-            TRIM(c."FirstName") as customername,
-            TRIM(c."Address") as address,
-            TRIM(ci."CityName") as customercityname,
-            TRIM(co."CountryName") as customercountryname
-        FROM (SELECT DISTINCT * FROM datalake.customers_mentah) c
-        LEFT JOIN (SELECT DISTINCT * FROM datalake.cities_mentah) ci ON c."CityID" = ci."CityID"
-        LEFT JOIN (SELECT DISTINCT * FROM datalake.countries_mentah) co ON ci."CountryID" = co."CountryID";
-
-        -- 2.2.5. Transform ke staging.dimemployee
-        CREATE TABLE staging.dimemployee AS
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY "EmployeeID") as employeeid,
-            "EmployeeID" as employeeid_oltp,
-            TRIM("FirstName") as employeename,
-            TRIM("Gender") as gender,
-            "HireDate"::DATE as hiredate
-        FROM (SELECT DISTINCT * FROM datalake.employees_mentah) e;
-
-        -- 2.2.6. Transform ke staging.dimweather
-        CREATE TABLE staging.dimweather AS
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY w."time", w."CityName") as weatherid,
-            NULL::text AS condition,
-            w."temperature_2m_max"        AS temperature_c,
-            NULL::float                   AS feelslike_c,
-            w."windspeed_10m_max"        AS wind_kph,
-            w."precipitation_sum"        AS precip_mm,
-            NULL::int                    AS isday,
-            d.dateid,
-            l.locationid
-        FROM (SELECT DISTINCT * FROM datalake.weather_mentah) w
-        LEFT JOIN staging.dimdate d
-            ON w."time"::DATE = d.fulldate
-        LEFT JOIN staging.dimlocation l
-            ON TRIM(w."CityName") = l.cityname;
-
-        -- ========= FASE 2.3: TRANSFORMASI FAKTA KE STAGING =========
-        CREATE TABLE staging.factsales AS
-        SELECT
-            d.dateid,
-            w.weatherid,
-            p.productid,
-            c.customerid,
-            e.employeeid,
-            l.locationid,
-            s."Quantity"::INT as quantity,
-            -- Hitung TotalPrice karena di CSV nilainya 0
-            (s."Quantity"::INT * p.price * (1 - COALESCE(s."Discount"::DECIMAL(10, 2), 0)))::DECIMAL(10, 2) as totalprice,
-            s."Discount"::DECIMAL(10, 2) as discount
-        FROM (SELECT DISTINCT * FROM datalake.sales_mentah) s
-        LEFT JOIN staging.dimdate d
-            ON s."SalesDate"::DATE = d.fulldate
-        LEFT JOIN staging.dimproduct p
-            ON s."ProductID" = p.productid_oltp
-        LEFT JOIN staging.dimcustomer c
-            ON s."CustomerID" = c.customerid_oltp
-        LEFT JOIN staging.dimemployee e
-            ON s."SalesPersonID" = e.employeeid_oltp
-        LEFT JOIN staging.dimlocation l
-            ON c.customercityname = l.cityname
-        LEFT JOIN staging.dimweather w
-            ON d.dateid = w.dateid AND l.locationid = w.locationid;
-        """
-        
-        # Jalankan satu kueri besar ini di database
-        with engine.begin() as conn:  
-            conn.execute(text(transform_sql))
+        phase_start = time.perf_counter()
+
+        # Tentukan mode load fakta: tanpa watermark (run pertama) selalu full
+        watermark = None if full_refresh else get_watermark('dwh.factsales')
+        load_mode = 'incremental' if watermark is not None else 'full'
+        logging.info(f"Mode load fakta: {load_mode} (watermark={watermark}).")
+
+        if LAKE_TIER == 'parquet':
+            # FASE 2.0: tabel datalake diisi dari lake Parquet. Load incremental
+            # hanya membawa partisi sales dalam jendela watermark ke DB. Tabel
+            # yang sumbernya tidak berubah tetap dimuat ulang jika isinya tidak
+            # mencakup yang dibutuhkan run ini (mis. sales_mentah hanya berisi
+            # jendela incremental, tapi run ini full load)
+            since = watermark - timedelta(days=SALES_LOOKBACK_DAYS) if watermark is not None else None
+            tasks = [
+                (f"datalake.{table_name}", load_lake_to_datalake, (table_name, since))
+                for _, table_name in RAW_CSV_SOURCES
+                if table_name in changed_tables
+                or not lake_scope_covers(loaded_lake_scope(table_name), lake_scope(table_name, since))
+            ]
+            run_tasks_parallel(tasks, "FASE 2.0 (lake Parquet)")
+
+        # Model staging dijalankan sebagai DAG: dimensi independen paralel,
+        # key map dibangun begitu dimensinya jadi, dimweather setelah key map
+        # tanggal & lokasi, fakta setelah semua key map dan staging.sales_delta siap
+        models = STAGING_MODELS + [{
+            'name': 'sales_delta',
+            'depends_on': [],
+            'func': lambda: build_sales_delta(watermark),
+        }]
+        run_model_dag(models, "FASE 2")
+        if env_flag('ETL_EXPLAIN'):
+            explain_fact_build()
+        record_step('run', 'FASE 2', time.perf_counter() - phase_start)
             
         logging.info("FASE 2: Transformasi SELESAI.")
 
         # ========= FASE 2.5: DATA QUALITY CHECKS (GOVERNANCE) =========
         logging.info("=== Memulai Data Quality Checks (Governance) ===")
-        dq_checks = [
-            {
-                "name": "Negative Quantity Check",
-                "query": "SELECT COUNT(*) FROM staging.factsales WHERE quantity < 0",
-                "threshold": 0
-            },
-            {
-                "name": "Negative Price Check",
-                "query": "SELECT COUNT(*) FROM staging.factsales WHERE totalprice < 0",
-                "threshold": 0
-            },
-            {
-                "name": "Null Product ID in Fact",
-                "query": "SELECT COUNT(*) FROM staging.factsales WHERE productid IS NULL",
-                "threshold": 0
-            },
-             {
-                "name": "Null Customer ID in Fact",
-                "query": "SELECT COUNT(*) FROM staging.factsales WHERE customerid IS NULL",
-                "threshold": 0
-            }
-        ]
-        
-        with engine.connect() as conn:
-            dq_failed = False
-            for check in dq_checks:
-                result = conn.execute(text(check['query'])).scalar()
-                if result > check['threshold']:
-                    logging.error(f"DQ FAILED: {check['name']} found {result} bad rows.")
-                    dq_failed = True
-                else:
-                    logging.info(f"DQ PASSED: {check['name']}")
-            
-            if dq_failed:
-                raise ValueError("Data Quality Checks Failed! Pipeline dihentikan sebelum Load ke DWH.")
+        phase_start = time.perf_counter()
+        dq_results = run_dq_checks(load_mode)
+        dq_warnings = sum(1 for result in dq_results if result['status'] == 'warn')
 
-        logging.info("=== Data Quality Checks Selesai (PASSED) ===")
+        record_step('run', 'FASE 2.5', time.perf_counter() - phase_start)
+        logging.info(f"=== Data Quality Checks Selesai (PASSED, {dq_warnings} warning) ===")
 
         # ========= FASE 3: LOAD KE DWH (Final) =========
-        load_sql = """
-        TRUNCATE TABLE dwh.factsales RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimproduct RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimcustomer RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimemployee RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimlocation RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimdate RESTART IDENTITY CASCADE;
-        TRUNCATE TABLE dwh.dimweather RESTART IDENTITY CASCADE;
+        phase_start = time.perf_counter()
+        if load_mode == 'full' and PUBLISH_MODE == 'swap':
+            # FASE 3-5 dibangun di schema bayangan, dashboard tetap membaca
+            # versi lama sampai swap
+            build_shadow_dwh(load_mode)
+            with instrument('FASE 3', 'publish.swap'):
+                publish_shadow_dwh(load_mode)
+            record_step('run', 'FASE 3', time.perf_counter() - phase_start)
+            logging.info("FASE 3-5: DWH, agregat & forecast baru dipublish (swap schema).")
+        else:
+            # Catat cakupan tanggal agregat sebelum versi lama fakta dihapus
+            full_aggregates = load_mode == 'full' or capture_aggregate_scope()
+            if load_mode == 'full':
+                drop_deferred_indexes()
+            load_to_dwh(load_mode)
+            with instrument('FASE 3', 'create_deferred_indexes'):
+                create_deferred_indexes()
+            record_step('run', 'FASE 3', time.perf_counter() - phase_start)
 
-        INSERT INTO dwh.dimdate SELECT * FROM staging.dimdate;
-        INSERT INTO dwh.dimlocation (locationid, cityid_oltp, cityname, countryname) SELECT locationid, cityid_oltp, cityname, countryname FROM staging.dimlocation;
-        INSERT INTO dwh.dimproduct (productid, productid_oltp, productname, price, categoryname, class, isallergic) SELECT productid, productid_oltp, productname, price, categoryname, class, isallergic FROM staging.dimproduct;
-        INSERT INTO dwh.dimcustomer (customerid, customerid_oltp, customername, address, customercityname, customercountryname) SELECT customerid, customerid_oltp, customername, address, customercityname, customercountryname FROM staging.dimcustomer;
-        INSERT INTO dwh.dimemployee (employeeid, employeeid_oltp, employeename, gender, hiredate) SELECT employeeid, employeeid_oltp, employeename, gender, hiredate FROM staging.dimemployee;
-        INSERT INTO dwh.dimweather (weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid) SELECT weatherid, condition, temperature_c, feelslike_c, wind_kph, precip_mm, isday, dateid, locationid FROM staging.dimweather;
-        
-        INSERT INTO dwh.factsales (dateid, weatherid, productid, customerid, employeeid, locationid, quantity, totalprice, discount) 
-        SELECT dateid, weatherid, productid, customerid, employeeid, locationid, quantity, totalprice, discount FROM staging.factsales;
-        """
-        
-        with engine.begin() as conn:
-            conn.execute(text(load_sql))
+            logging.info("FASE 3: Load ke DWH SELESAI.")
+
+            # ========= FASE 4: AGREGAT DASHBOARD =========
+            logging.info(f"Memulai Fase 4: Refresh agregat ({'full' if full_aggregates else 'incremental'})...")
+            phase_start = time.perf_counter()
+            refresh_aggregates(incremental=not full_aggregates)
+            record_step('run', 'FASE 4', time.perf_counter() - phase_start)
+            logging.info("FASE 4: Refresh agregat SELESAI.")
 
-        logging.info("FASE 3: Load ke DWH SELESAI.")
+            # ========= FASE 5: FORECAST PENJUALAN =========
+            phase_start = time.perf_counter()
+            with instrument('FASE 5', 'forecast') as metrics:
+                metrics['rows'] = refresh_forecast(incremental=not full_aggregates)
+            record_step('run', 'FASE 5', time.perf_counter() - phase_start)
+        bump_load_version()
+        save_fingerprints(source_stats)
         validate_dwh_counts()
 
     except Exception as e:
         logging.error(f"Error selama proses ELT: {e}")
+        run_status = 'failed'
         raise e
+    finally:
+        record_step('run', 'total', time.perf_counter() - run_start, status=run_status)
+        save_run_stats()
 
 # --- PEMANGGIL FUNGSI ---
 if __name__ == "__main__":
     try:
+        args = parse_args()
+        if args.rollback:
+            rollback_dwh_publish()
+            sys.exit(0)
         logging.info("=== MEMULAI SKRIP ETL ===")
-        run_elt() # Memanggil fungsi yang kamu definisikan di atas
+        init_database(full_refresh=args.full_refresh)
+        run_elt(full_refresh=args.full_refresh, force=args.force, offline=args.offline) # Memanggil fungsi yang kamu definisikan di atas
         logging.info("=== SKRIP ETL SELESAI ===")
     except Exception as e:
         # Menangkap error dari run_elt()
-        logging.error("=== SKRIP ETL GAGAL ===")
+        logging.error(f"=== SKRIP ETL GAGAL: {e} ===")
         exit(1) # Pastikan Docker tahu skrip ini gagal
\ No newline at end of file
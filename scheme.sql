@@ -14,9 +14,21 @@ CREATE TABLE IF NOT EXISTS dwh.DimDate (
     Year INT,
     DayOfWeek VARCHAR(20),
     IsHoliday BOOLEAN,
-    HolidayName VARCHAR(100)
+    HolidayName TEXT
 );
 
+-- Nama libur beberapa negara digabung (dengan kode negara), bisa melebihi
+-- VARCHAR(100) lama. VARCHAR -> TEXT tidak menulis ulang tabel, tapi tetap
+-- mengambil ACCESS EXCLUSIVE: hanya dijalankan kalau kolomnya belum TEXT.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_attribute
+               WHERE attrelid = 'dwh.DimDate'::regclass AND attname = 'holidayname'
+                 AND NOT attisdropped AND atttypid <> 'text'::regtype) THEN
+        ALTER TABLE dwh.DimDate ALTER COLUMN HolidayName TYPE TEXT;
+    END IF;
+END $$;
+
 -- 2. DimProduct
 CREATE TABLE IF NOT EXISTS dwh.DimProduct (
     ProductID INT PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
@@ -25,7 +37,12 @@ CREATE TABLE IF NOT EXISTS dwh.DimProduct (
     Price DECIMAL(10, 2),
     CategoryName VARCHAR(100),
     Class VARCHAR(100),
-    IsAllergic VARCHAR(50)
+    IsAllergic VARCHAR(50),
+    -- SCD Type 2: satu baris per versi atribut produk
+    RowHash CHAR(32),
+    ValidFrom TIMESTAMP NOT NULL DEFAULT '1900-01-01',
+    ValidTo TIMESTAMP NOT NULL DEFAULT '9999-12-31',
+    IsCurrent BOOLEAN NOT NULL DEFAULT TRUE
 );
 
 -- 3. DimCustomer
@@ -35,9 +52,43 @@ CREATE TABLE IF NOT EXISTS dwh.DimCustomer (
     CustomerName VARCHAR(255),
     Address VARCHAR(255),
     CustomerCityName VARCHAR(100),
-    CustomerCountryName VARCHAR(100)
+    CustomerCountryName VARCHAR(100),
+    -- SCD Type 2: satu baris per versi atribut pelanggan
+    RowHash CHAR(32),
+    ValidFrom TIMESTAMP NOT NULL DEFAULT '1900-01-01',
+    ValidTo TIMESTAMP NOT NULL DEFAULT '9999-12-31',
+    IsCurrent BOOLEAN NOT NULL DEFAULT TRUE
 );
 
+-- DWH lama (sebelum SCD2): kolom versi ditambahkan, baris yang ada menjadi
+-- versi pertama yang masih current. ADD COLUMN IF NOT EXISTS tetap mengunci
+-- tabel live (ACCESS EXCLUSIVE), jadi katalog dicek dulu.
+DO $$
+BEGIN
+    IF (SELECT COUNT(*) FROM pg_attribute
+        WHERE attrelid = 'dwh.DimProduct'::regclass AND NOT attisdropped
+          AND attname IN ('rowhash', 'validfrom', 'validto', 'iscurrent')) < 4 THEN
+        ALTER TABLE dwh.DimProduct
+            ADD COLUMN IF NOT EXISTS RowHash CHAR(32),
+            ADD COLUMN IF NOT EXISTS ValidFrom TIMESTAMP NOT NULL DEFAULT '1900-01-01',
+            ADD COLUMN IF NOT EXISTS ValidTo TIMESTAMP NOT NULL DEFAULT '9999-12-31',
+            ADD COLUMN IF NOT EXISTS IsCurrent BOOLEAN NOT NULL DEFAULT TRUE;
+    END IF;
+    IF (SELECT COUNT(*) FROM pg_attribute
+        WHERE attrelid = 'dwh.DimCustomer'::regclass AND NOT attisdropped
+          AND attname IN ('rowhash', 'validfrom', 'validto', 'iscurrent')) < 4 THEN
+        ALTER TABLE dwh.DimCustomer
+            ADD COLUMN IF NOT EXISTS RowHash CHAR(32),
+            ADD COLUMN IF NOT EXISTS ValidFrom TIMESTAMP NOT NULL DEFAULT '1900-01-01',
+            ADD COLUMN IF NOT EXISTS ValidTo TIMESTAMP NOT NULL DEFAULT '9999-12-31',
+            ADD COLUMN IF NOT EXISTS IsCurrent BOOLEAN NOT NULL DEFAULT TRUE;
+    END IF;
+END $$;
+
+-- Lookup versi current per natural key (hash diff & merge SCD2 di ETL)
+CREATE INDEX IF NOT EXISTS idx_dimproduct_current ON dwh.DimProduct (ProductID_OLTP) WHERE IsCurrent;
+CREATE INDEX IF NOT EXISTS idx_dimcustomer_current ON dwh.DimCustomer (CustomerID_OLTP) WHERE IsCurrent;
+
 -- 4. DimEmployee
 CREATE TABLE IF NOT EXISTS dwh.DimEmployee (
     EmployeeID INT PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
@@ -69,8 +120,16 @@ CREATE TABLE IF NOT EXISTS dwh.DimWeather (
 );
 
 -- ========= FACT TABLE (DALAM SKEMA DWH) =========
+-- Dipartisi RANGE per bulan pada DateID (YYYYMMDD), partisi bulanan
+-- dwh.factsales_pYYYYMM dibuat ETL sesuai kebutuhan (lihat etl.py,
+-- prepare_fact_partitions / swap_fact_partitions). Baris tanpa DateID masuk
+-- partisi DEFAULT.
+-- SalesID tidak lagi PRIMARY KEY: unique key partisi wajib memuat DateID,
+-- sedangkan DateID boleh NULL. Nilainya tetap unik dari sequence.
+CREATE SEQUENCE IF NOT EXISTS dwh.Seq_FactSales_SalesID;
+
 CREATE TABLE IF NOT EXISTS dwh.FactSales (
-    SalesID INT PRIMARY KEY GENERATED BY DEFAULT AS IDENTITY,
+    SalesID INT NOT NULL DEFAULT nextval('dwh.Seq_FactSales_SalesID'),
     DateID INT REFERENCES dwh.DimDate(DateID),
     WeatherID INT REFERENCES dwh.DimWeather(WeatherID),
     ProductID INT REFERENCES dwh.DimProduct(ProductID),
@@ -80,5 +139,198 @@ CREATE TABLE IF NOT EXISTS dwh.FactSales (
     
     Quantity INT NOT NULL,
     TotalPrice DECIMAL(10, 2) NOT NULL,
-    Discount DECIMAL(10, 2)
-);
\ No newline at end of file
+    Discount DECIMAL(10, 2),
+
+    -- Natural key & hash baris sumber (untuk load incremental)
+    SalesID_OLTP INT,
+    RowHash CHAR(32)
+) PARTITION BY RANGE (DateID);
+
+-- TRUNCATE ... RESTART IDENTITY ikut me-reset sequence milik kolom ini.
+-- OWNED BY mengunci factsales, jadi hanya kalau sequence belum dimiliki kolomnya.
+DO $$
+BEGIN
+    IF pg_get_serial_sequence('dwh.FactSales', 'salesid') IS NULL THEN
+        ALTER SEQUENCE dwh.Seq_FactSales_SalesID OWNED BY dwh.FactSales.SalesID;
+    END IF;
+END $$;
+
+-- CHECK DateID IS NULL: ATTACH partisi bulanan tidak perlu memindai DEFAULT
+CREATE TABLE IF NOT EXISTS dwh.FactSales_Default PARTITION OF dwh.FactSales (
+    CONSTRAINT FactSales_Default_NoDate CHECK (DateID IS NULL)
+) DEFAULT;
+
+-- ========= AGREGAT HARIAN UNTUK DASHBOARD (DALAM SKEMA DWH) =========
+-- Diisi ulang oleh ETL setelah FASE 3 (incremental per tanggal yang berubah).
+-- Grain: tanggal x kategori produk x atribut widget.
+
+CREATE TABLE IF NOT EXISTS dwh.AggDailyCategory (
+    DateID INT NOT NULL,
+    FullDate DATE NOT NULL,
+    CategoryName VARCHAR(100),
+    IsHoliday BOOLEAN,
+    Revenue DECIMAL(18, 2),
+    Units BIGINT,
+    Transactions BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_aggdailycategory_date_cat ON dwh.AggDailyCategory (FullDate, CategoryName);
+
+CREATE TABLE IF NOT EXISTS dwh.AggDailyProduct (
+    DateID INT NOT NULL,
+    FullDate DATE NOT NULL,
+    CategoryName VARCHAR(100),
+    ProductName VARCHAR(255),
+    Revenue DECIMAL(18, 2),
+    Units BIGINT,
+    Transactions BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_aggdailyproduct_date_cat ON dwh.AggDailyProduct (FullDate, CategoryName);
+
+CREATE TABLE IF NOT EXISTS dwh.AggDailyCity (
+    DateID INT NOT NULL,
+    FullDate DATE NOT NULL,
+    CategoryName VARCHAR(100),
+    CityName VARCHAR(100),
+    Revenue DECIMAL(18, 2),
+    Units BIGINT,
+    Transactions BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_aggdailycity_date_cat ON dwh.AggDailyCity (FullDate, CategoryName);
+
+CREATE TABLE IF NOT EXISTS dwh.AggDailyEmployee (
+    DateID INT NOT NULL,
+    FullDate DATE NOT NULL,
+    CategoryName VARCHAR(100),
+    EmployeeName VARCHAR(255),
+    Revenue DECIMAL(18, 2),
+    Units BIGINT,
+    Transactions BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_aggdailyemployee_date_cat ON dwh.AggDailyEmployee (FullDate, CategoryName);
+
+-- ========= FORECAST PENJUALAN (DALAM SKEMA DWH) =========
+-- Diisi ETL setelah agregat (lihat refresh_forecast di etl.py) dan dibaca
+-- langsung oleh halaman Prediction. Seri: 'total' / 'category' / 'city'.
+CREATE TABLE IF NOT EXISTS dwh.Forecast_Model (
+    SeriesType VARCHAR(20) NOT NULL,
+    SeriesName VARCHAR(255) NOT NULL,
+    OriginDate DATE NOT NULL,
+    TrainedThrough DATE NOT NULL,
+    TrainingDays INT NOT NULL,
+    -- Statistik cukup regresi (JSON) untuk update incremental
+    XtX TEXT NOT NULL,
+    XtY TEXT NOT NULL,
+    YtY DOUBLE PRECISION NOT NULL,
+    Coefficients TEXT NOT NULL,
+    RMSE DOUBLE PRECISION,
+    FittedAt TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (SeriesType, SeriesName)
+);
+
+CREATE TABLE IF NOT EXISTS dwh.Forecast (
+    SeriesType VARCHAR(20) NOT NULL,
+    SeriesName VARCHAR(255) NOT NULL,
+    DateID INT NOT NULL,
+    FullDate DATE NOT NULL,
+    Revenue DECIMAL(18, 2),
+    GeneratedAt TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (SeriesType, SeriesName, FullDate)
+);
+
+-- ========= METADATA ETL (DALAM SKEMA META) =========
+CREATE SCHEMA IF NOT EXISTS meta;
+
+-- High-water mark untuk load incremental per tabel fakta
+CREATE TABLE IF NOT EXISTS meta.ETL_Watermark (
+    TableName VARCHAR(100) PRIMARY KEY,
+    WatermarkValue TIMESTAMP,
+    RowsLoaded BIGINT,
+    UpdatedAt TIMESTAMP DEFAULT NOW()
+);
+
+-- Versi load yang dinaikkan ETL setiap selesai publish ke DWH.
+-- Dashboard memakainya untuk mengosongkan cache hasil query.
+CREATE TABLE IF NOT EXISTS meta.ETL_LoadVersion (
+    ID INT PRIMARY KEY,
+    Version BIGINT NOT NULL,
+    LoadedAt TIMESTAMP DEFAULT NOW()
+);
+
+-- Fingerprint sumber (file CSV & respons API) dari run sukses terakhir.
+-- Sumber yang fingerprint-nya sama tidak dimuat/ditransformasi ulang.
+CREATE TABLE IF NOT EXISTS meta.Source_Fingerprint (
+    SourceName VARCHAR(200) PRIMARY KEY,
+    SourcePath TEXT,
+    SizeBytes BIGINT,
+    MTime DOUBLE PRECISION,
+    ContentHash CHAR(64),
+    RecordedAt TIMESTAMP DEFAULT NOW()
+);
+
+-- Cache respons API hari libur per (tahun, negara). ETag / Last-Modified
+-- dipakai untuk request kondisional saat cache kedaluwarsa.
+CREATE TABLE IF NOT EXISTS meta.Holiday_API_Cache (
+    Year INT NOT NULL,
+    CountryCode VARCHAR(2) NOT NULL,
+    ResponseBody TEXT NOT NULL,
+    ETag TEXT,
+    LastModified TEXT,
+    FetchedAt TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (Year, CountryCode)
+);
+
+-- Statistik instrumentasi per fase/langkah ETL (juga ditulis sebagai JSON lines
+-- di logs/etl_run_stats.jsonl), untuk melihat regresi antar run.
+CREATE TABLE IF NOT EXISTS meta.ETL_Run_Stats (
+    StatID BIGSERIAL PRIMARY KEY,
+    RunID VARCHAR(40) NOT NULL,
+    Phase VARCHAR(50) NOT NULL,
+    Step VARCHAR(200) NOT NULL,
+    Status VARCHAR(10) NOT NULL,
+    StartedAt TIMESTAMP,
+    Seconds DOUBLE PRECISION,
+    RowsProcessed BIGINT,
+    BytesProcessed BIGINT,
+    RowsPerSec DOUBLE PRECISION,
+    PeakRSSMB DOUBLE PRECISION
+);
+CREATE INDEX IF NOT EXISTS idx_etl_run_stats_step ON meta.ETL_Run_Stats (Phase, Step, StartedAt);
+
+-- Hasil data quality check per run (FASE 2.5). ObservedValue = jumlah baris
+-- buruk, atau jumlah baris tabel untuk check row_drift (pembanding run berikutnya).
+CREATE TABLE IF NOT EXISTS meta.DQ_Results (
+    ResultID BIGSERIAL PRIMARY KEY,
+    RunID VARCHAR(40) NOT NULL,
+    LoadMode VARCHAR(20),
+    CheckName VARCHAR(200) NOT NULL,
+    TableName VARCHAR(100) NOT NULL,
+    CheckType VARCHAR(20) NOT NULL,
+    Severity VARCHAR(10) NOT NULL,
+    Status VARCHAR(10) NOT NULL,
+    BadRows BIGINT,
+    ObservedValue DOUBLE PRECISION,
+    Threshold DOUBLE PRECISION,
+    SampleKeys TEXT,
+    ScanSeconds DOUBLE PRECISION,
+    CheckedAt TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_dq_results_check ON meta.DQ_Results (CheckName, LoadMode, CheckedAt);
+
+-- ========= INDEKS (DIBUAT SETELAH BULK LOAD) =========
+-- Bagian di bawah penanda ini TIDAK dijalankan saat inisialisasi skema.
+-- etl.py menjalankannya setelah FASE 3 (full load men-drop indeks ini dulu
+-- agar insert massal tidak perlu memelihara indeks baris per baris).
+
+-- Foreign key fakta. DateID juga menyertakan kolom ukuran agar filter
+-- rentang tanggal dashboard bisa memakai index-only / bitmap scan.
+CREATE INDEX IF NOT EXISTS idx_factsales_dateid ON dwh.FactSales (DateID) INCLUDE (ProductID, CustomerID, Quantity, TotalPrice);
+CREATE INDEX IF NOT EXISTS idx_factsales_productid ON dwh.FactSales (ProductID);
+CREATE INDEX IF NOT EXISTS idx_factsales_customerid ON dwh.FactSales (CustomerID);
+CREATE INDEX IF NOT EXISTS idx_factsales_employeeid ON dwh.FactSales (EmployeeID);
+CREATE INDEX IF NOT EXISTS idx_factsales_locationid ON dwh.FactSales (LocationID);
+CREATE INDEX IF NOT EXISTS idx_factsales_weatherid ON dwh.FactSales (WeatherID);
+CREATE INDEX IF NOT EXISTS idx_factsales_salesid_oltp ON dwh.FactSales (SalesID_OLTP);
+
+-- Kolom filter dashboard di dimensi
+CREATE INDEX IF NOT EXISTS idx_dimdate_fulldate ON dwh.DimDate (FullDate);
+CREATE INDEX IF NOT EXISTS idx_dimproduct_categoryname ON dwh.DimProduct (CategoryName);
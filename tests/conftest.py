@@ -0,0 +1,56 @@
+"""
+Fixture bersama: etl.py diimpor dari folder kerja sementara dengan engine
+SQLite. Schema datalake, staging & dwh disimulasikan sebagai database yang
+di-ATTACH.
+"""
+import os
+import importlib
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def etl(tmp_path, monkeypatch):
+    # etl.py menulis log ke logs/ relatif terhadap folder kerja
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(REPO_DIR)
+    os.makedirs('logs', exist_ok=True)
+    module = importlib.import_module('etl')
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    schema_paths = {schema: str(tmp_path / f'{schema}.db') for schema in ('datalake', 'staging', 'dwh')}
+
+    @event.listens_for(engine, 'connect')
+    def attach_schemas(dbapi_conn, _record):
+        for schema, path in schema_paths.items():
+            dbapi_conn.execute(f"ATTACH DATABASE '{path}' AS {schema}")
+
+    monkeypatch.setattr(module, 'engine', engine)
+    yield module
+    engine.dispose()
+
+
+@pytest.fixture
+def column_types(etl):
+    """Tipe kolom yang dideklarasikan tabel SQLite: column_types(schema, tabel) -> {kolom: TIPE}."""
+    def read(schema, table_name):
+        with etl.engine.connect() as conn:
+            rows = conn.execute(text(f'PRAGMA {schema}.table_info("{table_name}")')).fetchall()
+        return {row[1]: row[2].upper() for row in rows}
+    return read
+
+
+@pytest.fixture
+def viz(monkeypatch):
+    """Modul dashboard (visualization/utils) diimpor seperti oleh app.py."""
+    monkeypatch.syspath_prepend(os.path.join(REPO_DIR, 'visualization'))
+    return importlib.import_module('utils.db'), importlib.import_module('utils.cache')
+
+
+@pytest.fixture
+def dashboard(viz):
+    """utils/dashboard.py: query per widget & pembentuk frame chart."""
+    return importlib.import_module('utils.dashboard')
@@ -0,0 +1,47 @@
+"""Kalender & hari libur (datalake.calendar_mentah / holidays_mentah)."""
+import json
+
+from sqlalchemy import text
+
+
+def holiday_response(year, country_code, holidays):
+    body = json.dumps([{'date': date, 'name': name} for date, name in holidays])
+    return (year, country_code, body, 'api')
+
+
+def test_build_holidays_joins_names_per_date(etl):
+    responses = [
+        holiday_response(2018, 'US', [('2018-01-01', "New Year's Day"), ('2018-07-04', 'Independence Day')]),
+        holiday_response(2018, 'ID', [('2018-01-01', 'Tahun Baru')]),
+    ]
+    df = etl.build_holidays(responses, multi_country=True).set_index('FullDate')['HolidayName']
+    assert len(df) == 2
+    assert sorted(df.iloc[0].split(', ')) == ["New Year's Day (US)", 'Tahun Baru (ID)']
+
+
+def test_fetch_all_holidays_without_countries(etl):
+    assert etl.fetch_all_holidays([2018], []) == []
+
+
+def test_empty_holidays_keep_date_type(etl, column_types):
+    # Tanpa negara / cache offline kosong: tidak ada hari libur sama sekali
+    df_holidays = etl.build_holidays([], multi_country=False)
+    assert df_holidays.empty
+    etl.build_calendar(2018, 2018).to_sql(
+        'calendar_mentah', con=etl.engine, schema='datalake', if_exists='replace', index=False
+    )
+    df_holidays.to_sql(
+        'holidays_mentah', con=etl.engine, schema='datalake', if_exists='replace', index=False,
+        dtype=etl.HOLIDAYS_SQL_DTYPES,
+    )
+
+    # Join model dimdate (c."FullDate" = h."FullDate") butuh tipe yang sama
+    calendar_type = column_types('datalake', 'calendar_mentah')['FullDate']
+    assert calendar_type == 'DATE'
+    assert column_types('datalake', 'holidays_mentah')['FullDate'] == calendar_type
+    with etl.engine.connect() as conn:
+        holidays = conn.execute(text("""
+            SELECT COUNT(*), COUNT(h."HolidayName") FROM datalake.calendar_mentah c
+            LEFT JOIN datalake.holidays_mentah h ON c."FullDate" = h."FullDate"
+        """)).one()
+    assert tuple(holidays) == (365, 0)
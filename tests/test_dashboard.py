@@ -0,0 +1,75 @@
+"""Pembentukan frame per widget dari baris panjang (visualization/utils/dashboard.py)."""
+import pandas as pd
+
+
+def widget_rows(*rows):
+    return pd.DataFrame(rows, columns=['widget', 'label', 'revenue', 'units', 'transactions', 'customers'])
+
+
+def test_kpi_card(dashboard):
+    df = widget_rows(('kpi', None, '1500.50', 30, 12, 7))
+
+    kpi = dashboard.shape_widget('kpi', df)
+
+    assert kpi.to_dict('records') == [{
+        'total_revenue': 1500.5, 'total_units': 30.0, 'total_transactions': 12.0, 'total_customers': 7.0,
+    }]
+
+
+def test_kpi_without_sales_is_empty(dashboard):
+    # SUM tanpa baris menghasilkan NULL: kartu KPI tidak digambar
+    assert dashboard.shape_widget('kpi', widget_rows(('kpi', None, None, None, 0, 0))).empty
+
+
+def test_trend_is_sorted_by_date(dashboard):
+    df = widget_rows(
+        ('trend', '2024-01-03', 30, 3, 3, None),
+        ('trend', '2024-01-01', 10, 1, 1, None),
+        ('trend', None, 99, 9, 9, None),
+    )
+
+    trend = dashboard.shape_widget('trend', df)
+
+    assert list(trend['fulldate']) == [pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-03')]
+    assert list(trend['revenue']) == [10.0, 30.0]
+
+
+def test_holiday_average_per_transaction(dashboard):
+    df = widget_rows(('holiday', 'true', 100, 4, 4, None), ('holiday', 'false', 300, 10, 0, None))
+
+    holiday = dashboard.shape_widget('holiday', df).set_index('day_type')['avg_daily_revenue']
+
+    assert holiday['Holiday'] == 25.0
+    assert pd.isna(holiday['Regular Day'])
+
+
+def test_ranked_widgets_keep_top_n(dashboard):
+    rows = [('product', f'P{i}', i, 1, 1, None) for i in range(dashboard.TOP_N + 5)]
+
+    product = dashboard.shape_widget('product', widget_rows(*rows))
+
+    assert len(product) == dashboard.TOP_N
+    assert product['productname'].iloc[0] == f'P{dashboard.TOP_N + 4}'
+
+
+def test_aggregate_path_reads_daily_aggregates(dashboard):
+    queries = dashboard.widget_queries(['Food'], use_aggregates=True)
+
+    assert set(queries) == set(dashboard.WIDGETS)
+    for widget, query in queries.items():
+        if widget == 'kpi':
+            # Pelanggan distinct tidak bisa dijumlahkan dari agregat harian
+            assert 'FROM dwh.factsales f' in query
+            continue
+        assert 'dwh.aggdaily' in query and 'factsales' not in query
+        assert 'a.fulldate BETWEEN :start_date AND :end_date' in query
+        assert 'a.categoryname = ANY(:categories)' in query
+
+
+def test_fact_path_filters_on_dateid(dashboard):
+    queries = dashboard.widget_queries([], use_aggregates=False)
+
+    for query in queries.values():
+        assert 'FROM dwh.factsales f' in query
+        assert 'f.dateid BETWEEN :start_dateid AND :end_dateid' in query
+        assert 'ANY(:categories)' not in query
@@ -0,0 +1,51 @@
+"""
+Loader CSV -> datalake tanpa Postgres: schema datalake disimulasikan dengan
+database SQLite yang di-ATTACH (lihat conftest.py), cukup untuk jalur
+to_sql/pipeline.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+
+def write_csv_with_late_type_change(path, int_rows=12000, text_rows=3000):
+    # Kolom Code berisi angka sampai setelah sampel COPY_SAMPLE_ROWS, baru teks
+    codes = [str(i) for i in range(int_rows)] + [f"X{i}" for i in range(text_rows)]
+    pd.DataFrame({'ID': range(len(codes)), 'Code': codes}).to_csv(path, index=False)
+    return len(codes)
+
+
+def test_pipeline_types_table_beyond_copy_sample(etl, tmp_path, column_types):
+    csv_path = str(tmp_path / 'codes.csv')
+    total_rows = write_csv_with_late_type_change(csv_path)
+    assert total_rows > etl.COPY_SAMPLE_ROWS
+    # Sampel COPY hanya melihat angka: tebakan inilah yang membuat COPY gagal
+    sample = etl.read_csv_typed(csv_path, 'codes_mentah', nrows=etl.COPY_SAMPLE_ROWS)
+    assert pd.api.types.is_integer_dtype(sample['Code'])
+
+    rows = etl.pipelined_csv_to_datalake(csv_path, 'codes_mentah', chunk_size=5000, parsers=1, writers=2)
+
+    assert rows == total_rows
+    assert column_types('datalake', 'codes_mentah')['Code'] == 'TEXT'
+    with etl.engine.connect() as conn:
+        loaded = conn.execute(text(
+            'SELECT COUNT(*), COUNT(DISTINCT "ID"), SUM("Code" LIKE \'X%\') FROM datalake.codes_mentah'
+        )).one()
+    assert tuple(loaded) == (total_rows, total_rows, 3000)
+
+
+def test_copy_failure_falls_back_to_pipeline(etl, tmp_path, monkeypatch, column_types):
+    csv_path = str(tmp_path / 'codes.csv')
+    total_rows = write_csv_with_late_type_change(csv_path)
+
+    def failing_copy(csv_path, table_name):
+        raise RuntimeError('invalid input syntax for type bigint: "X0"')
+
+    monkeypatch.setattr(etl, 'BULK_LOADER', 'copy')
+    monkeypatch.setattr(etl, 'PIPELINE_WRITERS', 2)
+    monkeypatch.setattr(etl, 'copy_csv_to_datalake', failing_copy)
+
+    stats = etl.load_csv_to_datalake(csv_path, 'codes_mentah')
+
+    assert stats['method'] == 'to_sql (pipeline)'
+    assert stats['rows'] == total_rows
+    assert column_types('datalake', 'codes_mentah')['Code'] == 'TEXT'
@@ -0,0 +1,67 @@
+"""Kompilasi Data Quality check menjadi satu scan per tabel."""
+import pytest
+from sqlalchemy import text
+
+CHECKS = [
+    {'name': 'Negative Quantity', 'table': 'staging.facts', 'type': 'range',
+     'column': 'quantity', 'min': 0, 'severity': 'error'},
+    {'name': 'Discount Range', 'table': 'staging.facts', 'type': 'range',
+     'column': 'discount', 'min': 0, 'max': 1, 'severity': 'warn'},
+    {'name': 'Null Product', 'table': 'staging.facts', 'type': 'null',
+     'column': 'productid', 'severity': 'error'},
+    {'name': 'Product Exists', 'table': 'staging.facts', 'type': 'referential',
+     'column': 'productid', 'ref_table': 'staging.products', 'ref_column': 'productid', 'severity': 'error'},
+    {'name': 'Unique Sales ID', 'table': 'staging.facts', 'type': 'unique',
+     'column': 'salesid', 'severity': 'error'},
+]
+
+
+def sqlite_sql(sql):
+    # SQLite tidak menerima OFFSET tanpa LIMIT; semantik scan-nya sama
+    return sql.replace('OFFSET 0', 'LIMIT -1 OFFSET 0')
+
+
+def test_bad_row_conditions(etl):
+    assert etl.dq_bad_row_condition(CHECKS[0], 0) == 't.quantity < 0'
+    assert etl.dq_bad_row_condition(CHECKS[1], 1) == 't.discount < 0 OR t.discount > 1'
+    assert etl.dq_bad_row_condition(CHECKS[2], 2) == 't.productid IS NULL'
+    assert etl.dq_bad_row_condition(CHECKS[3], 3) == 't.productid IS NOT NULL AND r3.ref_key IS NULL'
+    assert etl.dq_bad_row_condition(CHECKS[4], 4) is None
+
+
+def test_referential_check_is_a_distinct_left_join(etl):
+    sql = etl.compile_dq_scan('staging.facts', CHECKS)
+    assert 'NOT IN' not in sql
+    assert ('LEFT JOIN (SELECT DISTINCT productid AS ref_key FROM staging.products) r3 '
+            'ON r3.ref_key = t.productid') in sql
+    assert sql.count('FROM staging.facts t') == 1
+
+
+def test_single_scan_counts_bad_rows(etl):
+    with etl.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE staging.products (productid INT)"))
+        # Key referensi ganda tidak boleh menggandakan baris fakta
+        conn.execute(text("INSERT INTO staging.products VALUES (1), (1), (2)"))
+        conn.execute(text("CREATE TABLE staging.facts (salesid INT, productid INT, quantity INT, discount REAL)"))
+        conn.execute(text("""
+            INSERT INTO staging.facts VALUES
+                (1, 1, 5, 0.1), (2, 2, -1, 0.0), (3, 9, 1, 1.5), (3, NULL, 2, NULL)
+        """))
+        row = conn.execute(text(sqlite_sql(etl.compile_dq_scan('staging.facts', CHECKS)))).mappings().one()
+    assert row['row_count'] == 4
+    assert [row[f'c{i}'] for i in range(len(CHECKS))] == [1, 1, 1, 1, 1]
+
+
+@pytest.mark.parametrize('check, message', [
+    ({'name': 'No Bounds', 'table': 't', 'type': 'range', 'column': 'x', 'severity': 'warn'}, 'min dan/atau max'),
+    ({'name': 'No Ref', 'table': 't', 'type': 'referential', 'column': 'x', 'severity': 'error'}, 'ref_table'),
+    ({'name': 'Typo', 'table': 't', 'type': 'rnage', 'column': 'x', 'severity': 'warn'}, 'tidak dikenal'),
+    ({'name': 'Bad Severity', 'table': 't', 'type': 'null', 'column': 'x', 'severity': 'fatal'}, 'severity'),
+])
+def test_invalid_checks_are_rejected(etl, check, message):
+    with pytest.raises(ValueError, match=message):
+        etl.validate_dq_checks([check])
+
+
+def test_declared_checks_are_valid(etl):
+    etl.validate_dq_checks(etl.DQ_CHECKS)
@@ -0,0 +1,66 @@
+"""Model forecast: matriks fitur dan update incremental statistik X'X / X'y."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+
+def test_design_matrix_features(etl):
+    dates = pd.date_range('2018-01-01', '2018-03-04', freq='D')
+    holidays = dates == pd.Timestamp('2018-01-01')
+    x = etl.forecast_design_matrix(dates, holidays, date(2018, 1, 1))
+
+    assert x.shape == (len(dates), len(etl.FORECAST_FEATURES))
+    features = pd.DataFrame(x, index=dates, columns=etl.FORECAST_FEATURES)
+    assert (features['intercept'] == 1).all()
+    assert features['trend'].tolist() == list(range(len(dates)))
+    # Senin & Januari adalah baseline (tanpa kolom dummy)
+    monday, tuesday = pd.Timestamp('2018-01-01'), pd.Timestamp('2018-01-02')
+    assert features.loc[monday, [f'dow_{day}' for day in range(1, 7)]].sum() == 0
+    assert features.loc[tuesday, 'dow_1'] == 1
+    assert features.loc[pd.Timestamp('2018-02-10'), 'month_2'] == 1
+    assert features.loc[pd.Timestamp('2018-01-10'), [f'month_{m}' for m in range(2, 13)]].sum() == 0
+    assert features['holiday'].sum() == 1
+
+
+def write_aggregates(etl, days):
+    rows = [
+        {'fulldate': day.strftime('%Y-%m-%d'), 'categoryname': category, 'cityname': city, 'revenue': revenue}
+        for day, revenue in days
+        for category, city in [('Beverages', 'Austin'), ('Produce', 'Boston')]
+    ]
+    df = pd.DataFrame(rows)
+    df[['fulldate', 'categoryname', 'revenue']].to_sql(
+        'aggdailycategory', con=etl.engine, schema='dwh', if_exists='replace', index=False
+    )
+    df[['fulldate', 'cityname', 'revenue']].to_sql(
+        'aggdailycity', con=etl.engine, schema='dwh', if_exists='replace', index=False
+    )
+
+
+def test_incremental_history_matches_full_refit(etl):
+    trained_through = date(2018, 1, 10)
+    # Tidak ada penjualan 11-15 Januari: hari kosong sesudah trained_through
+    sold = list(pd.date_range('2018-01-01', '2018-01-10')) + list(pd.date_range('2018-01-16', '2018-01-20'))
+    write_aggregates(etl, [(day, 100.0 + i) for i, day in enumerate(sold)])
+
+    with etl.engine.connect() as conn:
+        full = etl.read_forecast_history(conn, 'dwh')
+        new_days = etl.read_forecast_history(conn, 'dwh', since=trained_through)
+
+    assert new_days.index[0] == pd.Timestamp('2018-01-11')
+    assert (new_days.loc['2018-01-11':'2018-01-15'] == 0).all().all()
+    old_days = full.loc[:pd.Timestamp(trained_through)]
+    pd.testing.assert_frame_equal(pd.concat([old_days, new_days]), full, check_freq=False)
+
+    def stats(revenue):
+        x = etl.forecast_design_matrix(revenue.index, np.zeros(len(revenue)), date(2018, 1, 1))
+        y = revenue[full.columns].to_numpy(dtype=float)
+        return x.T @ x, x.T @ y
+
+    xtx_full, xty_full = stats(full)
+    xtx_old, xty_old = stats(old_days)
+    xtx_new, xty_new = stats(new_days)
+    np.testing.assert_allclose(xtx_old + xtx_new, xtx_full)
+    np.testing.assert_allclose(xty_old + xty_new, xty_full)
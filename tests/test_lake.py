@@ -0,0 +1,22 @@
+"""Cakupan tabel datalake yang diisi dari lake Parquet."""
+from datetime import datetime
+
+
+def test_lake_scope_only_limits_sales(etl):
+    since = datetime(2018, 3, 15)
+    assert etl.lake_scope('sales_mentah', since) == '2018-03'
+    assert etl.lake_scope('sales_mentah') == 'all'
+    assert etl.lake_scope('products_mentah', since) == 'all'
+
+
+def test_window_only_sales_does_not_cover_full_load(etl):
+    # Run incremental mengisi jendela watermark; full load berikutnya butuh semua
+    assert not etl.lake_scope_covers('2018-03', 'all')
+    assert not etl.lake_scope_covers(None, 'all')
+    assert etl.lake_scope_covers('all', 'all')
+
+
+def test_earlier_window_covers_later_window(etl):
+    assert etl.lake_scope_covers('all', '2018-03')
+    assert etl.lake_scope_covers('2018-02', '2018-03')
+    assert not etl.lake_scope_covers('2018-04', '2018-03')
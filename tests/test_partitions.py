@@ -0,0 +1,18 @@
+"""Batas partisi bulanan dwh.factsales dalam satuan DateID (YYYYMMDD)."""
+import pytest
+
+
+@pytest.mark.parametrize('month_id, bounds', [
+    (202403, (20240300, 20240400)),
+    (202412, (20241200, 20250100)),
+    (202501, (20250100, 20250200)),
+])
+def test_month_bounds(etl, month_id, bounds):
+    assert etl.month_bounds(month_id) == bounds
+
+
+def test_month_bounds_cover_every_day_of_the_month(etl):
+    lower, upper = etl.month_bounds(202412)
+    # Batas atas eksklusif: 31 Desember masuk, 1 Januari ke partisi berikutnya
+    assert lower <= 20241201 and 20241231 < upper
+    assert etl.month_bounds(202501)[0] == upper
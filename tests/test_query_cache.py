@@ -0,0 +1,72 @@
+"""Cache hasil query dashboard (visualization/utils/cache.py & db.py)."""
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+
+def test_entries_expire_after_ttl(viz, monkeypatch):
+    _, cache_module = viz
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = cache_module.QueryCache(ttl_seconds=60, max_entries=10)
+
+    cache.set('q', 'result')
+    now[0] += 59
+    assert cache.get('q') == 'result'
+    now[0] += 2
+    assert cache.get('q') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(viz):
+    _, cache_module = viz
+    cache = cache_module.QueryCache(ttl_seconds=60, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_key_ignores_whitespace_and_param_order(viz):
+    _, cache_module = viz
+    make_key = cache_module.QueryCache.make_key
+    assert make_key("SELECT 1\n  FROM t;", {'a': 1, 'b': 2}) == make_key("SELECT 1 FROM t", {'b': 2, 'a': 1})
+    assert make_key("SELECT 1", {'a': 1}) != make_key("SELECT 1", {'a': 2})
+
+
+def test_new_load_version_clears_cache(viz):
+    _, cache_module = viz
+    cache = cache_module.QueryCache()
+    cache.set_load_version(1)
+    cache.set('q', 'result')
+    assert cache.set_load_version(1) is False
+    assert cache.get('q') == 'result'
+    assert cache.set_load_version(2) is True
+    assert cache.get('q') is None
+
+
+def test_failed_version_poll_keeps_cache(viz, monkeypatch, tmp_path):
+    db, cache_module = viz
+    cache = cache_module.QueryCache()
+    monkeypatch.setattr(db, '_cache', cache)
+    monkeypatch.setattr(db.settings, 'LOAD_VERSION_CHECK_INTERVAL', 0)
+    cache.set_load_version(3)
+    cache.set('q', pd.DataFrame({'x': [1]}))
+
+    meta_path = tmp_path / 'meta.db'
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    with engine.connect() as conn:
+        conn.execute(text(f"ATTACH DATABASE '{meta_path}' AS meta"))
+        # meta.etl_loadversion belum ada: poll gagal, versi & isi cache tetap
+        db._check_load_version(conn)
+        assert cache.stats()['load_version'] == 3
+        assert cache.get('q') is not None
+
+        conn.execute(text("CREATE TABLE meta.etl_loadversion (id INT, version INT)"))
+        conn.execute(text("INSERT INTO meta.etl_loadversion VALUES (1, 4)"))
+        db._check_load_version(conn)
+    assert cache.stats()['load_version'] == 4
+    assert cache.get('q') is None
@@ -0,0 +1,46 @@
+"""Statistik per langkah run (instrument / record_step)."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def run_stats(etl, monkeypatch):
+    stats = []
+    monkeypatch.setattr(etl, '_run_stats', stats)
+    return stats
+
+
+def read_log(etl):
+    with open(etl.RUN_STATS_LOG) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_instrument_records_rows_and_throughput(etl, run_stats):
+    with etl.instrument('FASE 2', 'load sales_mentah') as metrics:
+        metrics['rows'] = 500
+        metrics['bytes'] = 2048
+
+    [stat] = run_stats
+    assert (stat['phase'], stat['step'], stat['status']) == ('FASE 2', 'load sales_mentah', 'ok')
+    assert (stat['rows'], stat['bytes'], stat['run_id']) == (500, 2048, etl.RUN_ID)
+    assert stat['rows_per_sec'] > 0
+    # JSON lines ditulis langsung, tetap ada walau run gagal sebelum disimpan ke meta
+    assert read_log(etl) == run_stats
+
+
+def test_instrument_records_failed_step_and_reraises(etl, run_stats):
+    with pytest.raises(RuntimeError):
+        with etl.instrument('FASE 3', 'load_to_dwh'):
+            raise RuntimeError('boom')
+
+    [stat] = run_stats
+    assert stat['status'] == 'failed'
+    assert stat['rows'] is None and stat['rows_per_sec'] is None
+
+
+def test_record_step_with_zero_duration_has_no_throughput(etl, run_stats):
+    stat = etl.record_step('FASE 4', 'publish', 0.0, rows=100)
+
+    assert stat['rows_per_sec'] is None
+    assert stat['seconds'] == 0.0
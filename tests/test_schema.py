@@ -0,0 +1,29 @@
+"""scheme.sql dipecah per statement tanpa memotong blok DO $$ ... $$."""
+from pathlib import Path
+
+
+def test_split_keeps_dollar_quoted_blocks(etl):
+    sql = "CREATE TABLE t (a INT);\nDO $$\nBEGIN\n    ALTER TABLE t ADD b INT;\nEND $$;\nSELECT 1;"
+
+    assert etl.split_sql_statements(sql) == [
+        'CREATE TABLE t (a INT)',
+        'DO $$\nBEGIN\n    ALTER TABLE t ADD b INT;\nEND $$',
+        'SELECT 1',
+    ]
+
+
+def test_schema_migrations_are_guarded_and_follow_shadow_schema(etl, monkeypatch):
+    monkeypatch.chdir(Path(etl.__file__).parent)
+    table_sql, _ = etl.read_schema_sql()
+    dwh_sql = table_sql.partition(etl.DWH_DDL_END_MARKER)[0]
+    statements = [
+        '\n'.join(line for line in statement.splitlines() if not line.startswith('--')).strip()
+        for statement in etl.split_sql_statements(etl.in_schema(dwh_sql, etl.DWH_SHADOW_SCHEMA))
+    ]
+
+    # ALTER pada tabel live hanya boleh berada di dalam blok DO yang mengecek katalog
+    assert not [s for s in statements if s.startswith('ALTER')]
+    do_blocks = [s for s in statements if s.startswith('DO $$')]
+    assert len(do_blocks) == 3
+    assert all(s.endswith('END $$') for s in do_blocks)
+    assert all(f"'{etl.DWH_SHADOW_SCHEMA}." in s and "'dwh." not in s for s in do_blocks)
@@ -0,0 +1,27 @@
+"""Urutan model staging FASE 2 untuk dimensi SCD2 (run_model_dag)."""
+import threading
+
+
+def run_order(etl, monkeypatch):
+    order, lock = [], threading.Lock()
+
+    def fake_run_model(model, params=None):
+        with lock:
+            order.append(model['name'])
+        return 0
+
+    monkeypatch.setattr(etl, 'run_model', fake_run_model)
+    models = etl.STAGING_MODELS + [{'name': 'sales_delta', 'depends_on': [], 'func': lambda: 0}]
+    etl.run_model_dag(models, 'FASE 2', max_workers=4)
+    return order
+
+
+def test_scd2_dimensions_run_after_sales_delta(etl, monkeypatch):
+    order = run_order(etl, monkeypatch)
+
+    # Fallback watermark versi baru (MAX SalesDate) dibaca dari staging.sales_delta,
+    # dan key map versi dibangun dari dimensi yang sudah di-diff
+    for dim in ('dimproduct', 'dimcustomer'):
+        assert order.index('sales_delta') < order.index(dim)
+        assert order.index(dim) < order.index(f'keymap_{dim[3:]}')
+    assert sorted(order) == sorted(model['name'] for model in etl.STAGING_MODELS + [{'name': 'sales_delta'}])
@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils.db import read_query
+from utils.db import read_query, cache_stats, pool_metrics
+from utils.dashboard import iter_dashboard_widgets
+from utils.forecast import list_series, load_forecast
 import datetime
 import os
-import numpy as np
-from sklearn.linear_model import LinearRegression
 
 st.set_page_config(page_title="Warehouse Executive Dashboard", layout="wide", page_icon="📈")
 
@@ -34,68 +34,65 @@ st.markdown("""
 # --- NAVIGATION ---
 page = st.sidebar.radio("Go to", ["Dashboard", "Prediction"])
 
+def show_cache_stats():
+    stats = cache_stats()
+    with st.sidebar.expander("⚡ Query Cache"):
+        st.write(f"Hits: {stats['hits']} | Misses: {stats['misses']} ({stats['hit_ratio']:.0%} hit ratio)")
+        st.write(f"Entries: {stats['entries']} | Evictions: {stats['evictions']}")
+        st.write(f"ETL load version: {stats['load_version']}")
+    try:
+        pool = pool_metrics()
+        with st.sidebar.expander("🔌 DB Pool"):
+            st.write(f"Checked out: {pool['pool_checked_out']} / {pool['pool_size']} (+{pool['pool_overflow']} overflow)")
+            st.write(f"Connections opened: {pool['pool_connects_total']} | Checkouts: {pool['pool_checkouts_total']}")
+    except Exception:
+        pass
+
 if page == "Prediction":
     st.title("🔮 Sales Prediction (Machine Learning)")
-    st.markdown("Simple Linear Regression to forecast future sales based on historical data.")
-
-    # 1. Get Historical Data
-    hist_query = """
-    SELECT d.fulldate, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    GROUP BY d.fulldate
-    ORDER BY d.fulldate
-    """
+    st.markdown(
+        "Linear model with trend, day-of-week, month and holiday features, "
+        "fitted per series by the ETL after every load."
+    )
+
+    series_labels = {'total': 'All Sales', 'category': 'Category', 'city': 'City'}
     try:
-        df_hist = read_query(hist_query)
-        if not df_hist.empty:
-            df_hist['revenue'] = df_hist['revenue'].astype(float)
-            df_hist['fulldate'] = pd.to_datetime(df_hist['fulldate'])
-            
-            # 2. Prepare Data for ML
-            df_hist['date_ordinal'] = df_hist['fulldate'].map(datetime.datetime.toordinal)
-            
-            X = df_hist[['date_ordinal']]
-            y = df_hist['revenue']
-            
-            # 3. Train Model
-            model = LinearRegression()
-            model.fit(X, y)
-            
-            # 4. Predict Future (Next 30 Days)
-            last_date = df_hist['fulldate'].max()
-            future_dates = [last_date + datetime.timedelta(days=x) for x in range(1, 31)]
-            future_ordinals = [[d.toordinal()] for d in future_dates]
-            
-            future_pred = model.predict(future_ordinals)
-            
-            df_future = pd.DataFrame({
-                'fulldate': future_dates,
-                'revenue': future_pred,
-                'type': 'Forecast'
-            })
-            
-            df_hist['type'] = 'Historical'
-            
-            # Combine for plotting
-            df_combined = pd.concat([df_hist[['fulldate', 'revenue', 'type']], df_future])
-            
-            # 5. Visualize
-            st.subheader("Sales Forecast (Next 30 Days)")
-            fig_pred = px.line(df_combined, x='fulldate', y='revenue', color='type', 
+        series = list_series()
+        if series:
+            series_type = st.sidebar.selectbox(
+                "Forecast Series", list(series), format_func=lambda t: series_labels.get(t, t)
+            )
+            series_name = series[series_type][0]
+            if len(series[series_type]) > 1:
+                series_name = st.sidebar.selectbox(series_labels.get(series_type, series_type), series[series_type])
+
+            df_combined, model = load_forecast(series_type, series_name)
+            df_future = df_combined[df_combined['type'] == 'Forecast']
+
+            st.subheader(f"Sales Forecast (Next {len(df_future)} Days)")
+            fig_pred = px.line(df_combined, x='fulldate', y='revenue', color='type',
                                color_discrete_map={'Historical': 'blue', 'Forecast': 'red'},
                                template='plotly_white')
             st.plotly_chart(fig_pred, use_container_width=True)
-            
+
             # Show metrics
-            st.write(f"**Model Coefficient (Slope):** ${model.coef_[0]:.2f} / day")
-            st.write(f"**Projected Revenue (Next 30 Days):** ${future_pred.sum():,.2f}")
-            
+            if model:
+                st.write(f"**Trend (Slope):** ${model['coefficients'].get('trend', 0):.2f} / day")
+                st.write(f"**Holiday Effect:** ${model['coefficients'].get('holiday', 0):,.2f} / day")
+                if model['rmse'] is not None:
+                    st.write(f"**In-sample RMSE:** ${model['rmse']:,.2f}")
+                st.caption(
+                    f"Trained on {model['training_days']} days through {model['trained_through']}, "
+                    f"fitted at {model['fitted_at']}."
+                )
+            st.write(f"**Projected Revenue (Next {len(df_future)} Days):** ${df_future['revenue'].sum():,.2f}")
+
         else:
-            st.warning("Not enough data to train model.")
+            st.warning("No forecast available yet. Run the ETL to fit the forecast models.")
     except Exception as e:
         st.error(f"Prediction Error: {e}")
         
+    show_cache_stats()
     st.stop() # Stop execution here so Dashboard code doesn't run
 
 st.title("🏭 Enterprise Data Warehouse Dashboard")
@@ -149,45 +146,9 @@ if not selected_categories and categories:
     st.warning("Please select at least one category.")
     st.stop()
 
-# --- DATA LOADING HELPER ---
-def get_filtered_data(start, end, cats):
-    if not cats:
-        return f"WHERE d.fulldate BETWEEN '{start}' AND '{end}'"
-        
-    cats_tuple = tuple(cats)
-    if len(cats) == 1:
-        cats_tuple = f"('{cats[0]}')"
-    
-    # Base Condition
-    where_clause = f"""
-    WHERE d.fulldate BETWEEN '{start}' AND '{end}'
-    AND p.categoryname IN {cats_tuple}
-    """
-    
-    return where_clause
-
-where_clause = get_filtered_data(start_date, end_date, selected_categories)
-
-# --- KPI SECTION ---
-kpi_query = f"""
-SELECT 
-    SUM(f.totalprice) as total_revenue,
-    SUM(f.quantity) as total_units,
-    COUNT(*) as total_transactions,
-    COUNT(DISTINCT f.customerid) as total_customers
-FROM dwh.factsales f
-JOIN dwh.dimdate d ON f.dateid = d.dateid
-JOIN dwh.dimproduct p ON f.productid = p.productid
-{where_clause}
-"""
-
-try:
-    kpi_data = read_query(kpi_query)
-except:
-    kpi_data = pd.DataFrame()
-
-col1, col2, col3, col4 = st.columns(4)
-
+# --- LAYOUT ---
+# Widget queries run concurrently (see utils/dashboard.py); every widget gets a
+# placeholder now and is drawn as soon as its own result arrives.
 def display_metric(col, label, value, prefix="", suffix=""):
     with col:
         st.markdown(f"""
@@ -197,172 +158,90 @@ def display_metric(col, label, value, prefix="", suffix=""):
         </div>
         """, unsafe_allow_html=True)
 
-if not kpi_data.empty and kpi_data.iloc[0,0] is not None:
-    display_metric(col1, "Total Revenue", kpi_data['total_revenue'].iloc[0] or 0, "$")
-    display_metric(col2, "Total Units Sold", kpi_data['total_units'].iloc[0] or 0)
-    display_metric(col3, "Transactions", kpi_data['total_transactions'].iloc[0] or 0)
-    display_metric(col4, "Total Customers", kpi_data['total_customers'].iloc[0] or 0)
-else:
-    st.info("No data available for the selected filters.")
-
+slots = {'kpi': st.empty()}
 st.markdown("---")
 
-# --- CHARTS ROW 1 ---
+# --- CHARTS ---
 c1, c2 = st.columns(2)
+c3, c4 = st.columns(2)
+c5, c6 = st.columns(2)
+chart_titles = {
+    'trend': (c1, "📈 Sales Trend Over Time"),
+    'category': (c2, "📦 Sales by Category"),
+    'product': (c3, "🏆 Top 10 Products"),
+    'city': (c4, "🏙️ Top 10 Cities"),
+    'employee': (c5, "👔 Top Employees"),
+    'holiday': (c6, "🎉 Holiday vs Non-Holiday Sales"),
+}
+for name, (column, title) in chart_titles.items():
+    with column:
+        st.subheader(title)
+        slots[name] = st.empty()
+
+for slot in slots.values():
+    slot.caption("Loading...")
+
+def render_kpi(kpi_data):
+    if not kpi_data.empty and kpi_data.iloc[0,0] is not None:
+        col1, col2, col3, col4 = st.columns(4)
+        display_metric(col1, "Total Revenue", kpi_data['total_revenue'].iloc[0] or 0, "$")
+        display_metric(col2, "Total Units Sold", kpi_data['total_units'].iloc[0] or 0)
+        display_metric(col3, "Transactions", kpi_data['total_transactions'].iloc[0] or 0)
+        display_metric(col4, "Total Customers", kpi_data['total_customers'].iloc[0] or 0)
+    else:
+        st.info("No data available for the selected filters.")
 
-# Chart 1: Sales Trend
-with c1:
-    st.subheader("📈 Sales Trend Over Time")
-    trend_query = f"""
-    SELECT d.fulldate, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    {where_clause}
-    GROUP BY d.fulldate
-    ORDER BY d.fulldate
-    """
-    try:
-        df_trend = read_query(trend_query)
-        if not df_trend.empty:
-            # Ensure revenue is float for Plotly
-            df_trend['revenue'] = df_trend['revenue'].astype(float)
-            fig_trend = px.line(df_trend, x='fulldate', y='revenue', template='plotly_white')
-            st.plotly_chart(fig_trend, use_container_width=True)
-        else:
-            st.write("No data.")
-    except Exception as e:
-        st.error(f"Error: {e}")
-
-# Chart 2: Sales by Category
-with c2:
-    st.subheader("📦 Sales by Category")
-    cat_sales_query = f"""
-    SELECT p.categoryname, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    {where_clause}
-    GROUP BY p.categoryname
-    ORDER BY revenue DESC
-    """
-    try:
-        df_cat = read_query(cat_sales_query)
-        if not df_cat.empty:
-            # Ensure revenue is float
-            df_cat['revenue'] = df_cat['revenue'].astype(float)
-            fig_cat = px.pie(df_cat, names='categoryname', values='revenue', hole=0.4, template='plotly_white')
-            st.plotly_chart(fig_cat, use_container_width=True)
-        else:
-            st.write("No data.")
-    except:
-        st.write("No data.")
+def chart_trend(df):
+    return px.line(df, x='fulldate', y='revenue', template='plotly_white')
 
-# --- CHARTS ROW 2 ---
-c3, c4 = st.columns(2)
+def chart_category(df):
+    return px.pie(df, names='categoryname', values='revenue', hole=0.4, template='plotly_white')
 
-# Chart 3: Top 10 Products
-with c3:
-    st.subheader("🏆 Top 10 Products")
-    prod_query = f"""
-    SELECT p.productname, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    {where_clause}
-    GROUP BY p.productname
-    ORDER BY revenue DESC
-    LIMIT 10
-    """
-    try:
-        df_prod = read_query(prod_query)
-        if not df_prod.empty:
-            # Ensure revenue is float
-            df_prod['revenue'] = df_prod['revenue'].astype(float)
-            fig_prod = px.bar(df_prod, x='revenue', y='productname', orientation='h', template='plotly_white')
-            fig_prod.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig_prod, use_container_width=True)
-        else:
-            st.write("No data.")
-    except:
-        st.write("No data.")
-
-# Chart 4: Top 10 Cities
-with c4:
-    st.subheader("🏙️ Top 10 Cities")
-    city_query = f"""
-    SELECT l.cityname, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    JOIN dwh.dimlocation l ON f.locationid = l.locationid
-    {where_clause}
-    GROUP BY l.cityname
-    ORDER BY revenue DESC
-    LIMIT 10
-    """
-    try:
-        df_city = read_query(city_query)
-        if not df_city.empty:
-            # Ensure revenue is float
-            df_city['revenue'] = df_city['revenue'].astype(float)
-            fig_city = px.bar(df_city, x='cityname', y='revenue', template='plotly_white', color='revenue')
-            st.plotly_chart(fig_city, use_container_width=True)
-        else:
-            st.write("No data.")
-    except:
-        st.write("No data.")
+def chart_product(df):
+    fig = px.bar(df, x='revenue', y='productname', orientation='h', template='plotly_white')
+    fig.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig
 
-# --- CHARTS ROW 3 ---
-c5, c6 = st.columns(2)
+def chart_city(df):
+    return px.bar(df, x='cityname', y='revenue', template='plotly_white', color='revenue')
 
-# Chart 5: Employee Performance
-with c5:
-    st.subheader("👔 Top Employees")
-    emp_query = f"""
-    SELECT e.employeename, SUM(f.totalprice) as revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    JOIN dwh.dimemployee e ON f.employeeid = e.employeeid
-    {where_clause}
-    GROUP BY e.employeename
-    ORDER BY revenue DESC
-    LIMIT 10
-    """
-    try:
-        df_emp = read_query(emp_query)
-        if not df_emp.empty:
-            # Ensure revenue is float
-            df_emp['revenue'] = df_emp['revenue'].astype(float)
-            fig_emp = px.bar(df_emp, x='employeename', y='revenue', template='plotly_white')
-            st.plotly_chart(fig_emp, use_container_width=True)
-        else:
-            st.write("No data.")
-    except:
-        st.write("No data.")
-
-# Chart 6: Holiday Impact
-with c6:
-    st.subheader("🎉 Holiday vs Non-Holiday Sales")
-    hol_query = f"""
-    SELECT 
-        CASE WHEN d.isholiday THEN 'Holiday' ELSE 'Regular Day' END as day_type,
-        AVG(f.totalprice) as avg_daily_revenue
-    FROM dwh.factsales f
-    JOIN dwh.dimdate d ON f.dateid = d.dateid
-    JOIN dwh.dimproduct p ON f.productid = p.productid
-    {where_clause}
-    GROUP BY d.isholiday
-    """
-    try:
-        df_hol = read_query(hol_query)
-        if not df_hol.empty:
-            # Ensure avg_daily_revenue is float
-            df_hol['avg_daily_revenue'] = df_hol['avg_daily_revenue'].astype(float)
-            fig_hol = px.bar(df_hol, x='day_type', y='avg_daily_revenue', template='plotly_white', title="Average Daily Revenue")
-            st.plotly_chart(fig_hol, use_container_width=True)
-        else:
-            st.write("No data.")
-    except:
-        st.write("No data.")
+def chart_employee(df):
+    return px.bar(df, x='employeename', y='revenue', template='plotly_white')
+
+def chart_holiday(df):
+    return px.bar(df, x='day_type', y='avg_daily_revenue', template='plotly_white', title="Average Daily Revenue")
+
+charts = {
+    'trend': chart_trend,
+    'category': chart_category,
+    'product': chart_product,
+    'city': chart_city,
+    'employee': chart_employee,
+    'holiday': chart_holiday,
+}
+
+# --- DATA LOADING ---
+sources = set()
+try:
+    for name, df, source, error in iter_dashboard_widgets(start_date, end_date, selected_categories):
+        sources.add(source)
+        with slots[name].container():
+            if error is not None:
+                st.warning(f"Widget unavailable: {error}")
+            elif name == 'kpi':
+                render_kpi(df)
+            elif not df.empty:
+                st.plotly_chart(charts[name](df), use_container_width=True)
+            else:
+                st.write("No data.")
+except Exception as e:
+    st.error(f"Error: {e}")
+
+if sources == {'aggregates'}:
+    st.sidebar.caption("Data source: daily aggregates")
+elif sources == {'fact'}:
+    st.sidebar.caption("Data source: fact table")
+elif sources:
+    st.sidebar.caption("Data source: daily aggregates (some widgets from the fact table)")
+
+show_cache_stats()
@@ -11,10 +11,30 @@ class Settings:
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "db_postgres")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
 
+    # Connection pool (see utils/db.py)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    # Port for the Prometheus-style /metrics endpoint, 0 = disabled
+    DB_METRICS_PORT: int = int(os.getenv("DB_METRICS_PORT", "0"))
+
+    # Query result cache (see utils/cache.py)
+    QUERY_CACHE_TTL: int = int(os.getenv("QUERY_CACHE_TTL", "300"))
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "128"))
+    LOAD_VERSION_CHECK_INTERVAL: int = int(os.getenv("LOAD_VERSION_CHECK_INTERVAL", "10"))
+
+    # Concurrent Dashboard widget queries (see utils/dashboard.py)
+    DASHBOARD_QUERY_WORKERS: int = int(os.getenv("DASHBOARD_QUERY_WORKERS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+    WIDGET_QUERY_TIMEOUT_MS: int = int(os.getenv("WIDGET_QUERY_TIMEOUT_MS", "10000"))
+    # How long a render waits for all widgets before showing the rest as unavailable
+    DASHBOARD_RENDER_TIMEOUT: float = float(os.getenv("DASHBOARD_RENDER_TIMEOUT", "15"))
+
     @property
     def DATABASE_URL(self):
         return (
-            f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"postgresql+psycopg2://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
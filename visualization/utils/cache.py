@@ -0,0 +1,81 @@
+# utils/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    In-process TTL + LRU cache for query results.
+
+    Streamlit re-runs app.py on every widget change but keeps imported modules
+    alive, so one instance is shared by all reruns and sessions in the process.
+    Entries are dropped when they expire, when the cache is full (least recently
+    used first) or when the ETL load version changes.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=128):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.load_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, params=None):
+        # Whitespace and trailing semicolons do not change the statement
+        normalized = " ".join(str(query).split()).rstrip(";").strip()
+        if not params:
+            return (normalized, ())
+        return (normalized, tuple(sorted((name, repr(value)) for name, value in params.items())))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def set_load_version(self, version):
+        """Invalidate everything when the ETL has published a new load."""
+        with self._lock:
+            if version == self.load_version:
+                return False
+            self.load_version = version
+            self._entries.clear()
+            return True
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "load_version": self.load_version,
+            }
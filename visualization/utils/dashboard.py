@@ -0,0 +1,249 @@
+# utils/dashboard.py
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+from config import settings
+from utils.db import read_query
+
+# The Dashboard page renders seven widgets (KPI card + six charts). Each one
+# has its own small statement and they are dispatched concurrently on the
+# pooled engine, so a render takes about as long as the slowest widget:
+# - aggregate path: one GROUP BY per widget over the small dwh.aggdaily*
+#   tables plus a fact scan for the KPI card (distinct customers are not additive)
+# - fact path: one GROUP BY per widget over factsales
+# Every statement returns the same long format: widget, label, revenue, units,
+# transactions, customers.
+
+TOP_N = 10
+WIDGETS = ['kpi', 'trend', 'category', 'product', 'city', 'employee', 'holiday']
+
+# Label expression per widget on the fact path (None = KPI, no grouping)
+FACT_WIDGET_LABELS = {
+    'kpi': None,
+    'trend': 'd.fulldate::text',
+    'category': 'p.categoryname',
+    'product': 'p.productname',
+    'city': 'l.cityname',
+    'employee': 'e.employeename',
+    'holiday': 'd.isholiday::text',
+}
+
+FACT_WIDGET_TEMPLATE = """
+SELECT '{widget}' as widget, {label} as label,
+       SUM(f.totalprice) as revenue, SUM(f.quantity) as units,
+       COUNT(*) as transactions, COUNT(DISTINCT f.customerid) as customers
+FROM dwh.factsales f
+JOIN dwh.dimdate d ON f.dateid = d.dateid
+JOIN dwh.dimproduct p ON f.productid = p.productid
+LEFT JOIN dwh.dimlocation l ON f.locationid = l.locationid
+LEFT JOIN dwh.dimemployee e ON f.employeeid = e.employeeid
+{{where_clause}}
+{group_by}
+"""
+
+FACT_WIDGET_QUERIES = {
+    widget: FACT_WIDGET_TEMPLATE.format(
+        widget=widget,
+        label=label or 'NULL',
+        group_by=f"GROUP BY {label}" if label else "",
+    )
+    for widget, label in FACT_WIDGET_LABELS.items()
+}
+
+AGG_WIDGET_QUERIES = {
+    'kpi': """
+SELECT 'kpi' as widget, NULL as label,
+       SUM(f.totalprice) as revenue, SUM(f.quantity) as units,
+       COUNT(*) as transactions, COUNT(DISTINCT f.customerid) as customers
+FROM dwh.factsales f
+JOIN dwh.dimproduct p ON f.productid = p.productid
+{where_clause}
+""",
+    'trend': """
+SELECT 'trend' as widget, a.fulldate::text as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailycategory a {agg_where_clause}
+GROUP BY a.fulldate
+""",
+    'category': """
+SELECT 'category' as widget, a.categoryname as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailycategory a {agg_where_clause}
+GROUP BY a.categoryname
+""",
+    'holiday': """
+SELECT 'holiday' as widget, a.isholiday::text as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailycategory a {agg_where_clause}
+GROUP BY a.isholiday
+""",
+    'product': """
+SELECT 'product' as widget, a.productname as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailyproduct a {agg_where_clause}
+GROUP BY a.productname
+""",
+    'city': """
+SELECT 'city' as widget, a.cityname as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailycity a {agg_where_clause}
+GROUP BY a.cityname
+""",
+    'employee': """
+SELECT 'employee' as widget, a.employeename as label, SUM(a.revenue) as revenue, SUM(a.units) as units,
+       SUM(a.transactions) as transactions, NULL as customers
+FROM dwh.aggdailyemployee a {agg_where_clause}
+GROUP BY a.employeename
+""",
+}
+
+# Shared by every session in the process; never more threads than pooled
+# connections, otherwise workers would only queue on the pool
+_executor = ThreadPoolExecutor(
+    max_workers=settings.DASHBOARD_QUERY_WORKERS,
+    thread_name_prefix="dashboard-widget",
+)
+
+
+def get_filter_params(start, end, cats):
+    """Bound parameters shared by the fact and aggregate WHERE clauses."""
+    return {
+        "start_date": start,
+        "end_date": end,
+        # DateID is YYYYMMDD, so a date range is also a DateID range. Filtering
+        # the fact on its own column lets Postgres use idx_factsales_dateid.
+        "start_dateid": int(start.strftime("%Y%m%d")),
+        "end_dateid": int(end.strftime("%Y%m%d")),
+        "categories": list(cats),
+    }
+
+
+def get_filtered_data(cats, date_col="f.dateid", cat_col="p.categoryname"):
+    # Statement text only depends on WHICH filters are active, never on their
+    # values, so Postgres and the query cache see a small fixed set of statements
+    if date_col.endswith("dateid"):
+        where_clause = f"WHERE {date_col} BETWEEN :start_dateid AND :end_dateid"
+    else:
+        where_clause = f"WHERE {date_col} BETWEEN :start_date AND :end_date"
+
+    if cats:
+        where_clause += f"\n    AND {cat_col} = ANY(:categories)"
+
+    return where_clause
+
+
+def aggregates_available():
+    # Daily aggregate tables (dwh.aggdaily*) are refreshed by the ETL after each load
+    try:
+        df = read_query("SELECT EXISTS (SELECT 1 FROM dwh.aggdailycategory) AS ready")
+        return bool(df['ready'].iloc[0])
+    except Exception:
+        return False
+
+
+def _widget(df, name, label_col, sort_by=None, ascending=False):
+    part = df[(df['widget'] == name) & df['label'].notna()]
+    part = part[['label', 'revenue', 'units', 'transactions']].rename(columns={'label': label_col})
+    if sort_by:
+        part = part.sort_values(sort_by, ascending=ascending)
+    return part.reset_index(drop=True)
+
+
+def shape_widget(name, df):
+    """Turn the long result rows of one widget into the frame its chart expects."""
+    df = df.copy()
+    for col in ['revenue', 'units', 'transactions', 'customers']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+
+    if name == 'kpi':
+        kpi_rows = df[df['widget'] == 'kpi']
+        if kpi_rows.empty or pd.isna(kpi_rows['revenue'].iloc[0]):
+            return pd.DataFrame()
+        row = kpi_rows.iloc[0]
+        return pd.DataFrame([{
+            'total_revenue': row['revenue'],
+            'total_units': row['units'],
+            'total_transactions': row['transactions'],
+            'total_customers': row['customers'],
+        }])
+
+    if name == 'trend':
+        trend = _widget(df, 'trend', 'fulldate')
+        trend['fulldate'] = pd.to_datetime(trend['fulldate'])
+        return trend.sort_values('fulldate').reset_index(drop=True)
+
+    if name == 'holiday':
+        holiday = df[df['widget'] == 'holiday'].copy()
+        holiday['day_type'] = holiday['label'].map(lambda v: 'Holiday' if v == 'true' else 'Regular Day')
+        holiday['avg_daily_revenue'] = holiday['revenue'] / holiday['transactions'].replace(0, float('nan'))
+        return holiday[['day_type', 'avg_daily_revenue']].reset_index(drop=True)
+
+    if name == 'category':
+        return _widget(df, 'category', 'categoryname', sort_by='revenue')
+    label_col = {'product': 'productname', 'city': 'cityname', 'employee': 'employeename'}[name]
+    return _widget(df, name, label_col).nlargest(TOP_N, 'revenue')
+
+
+def widget_queries(cats, use_aggregates):
+    """Final SQL per widget for the given category filter and path."""
+    where_clause = get_filtered_data(cats)
+    if use_aggregates:
+        agg_where_clause = get_filtered_data(cats, date_col="a.fulldate", cat_col="a.categoryname")
+        return {
+            widget: query.format(where_clause=where_clause, agg_where_clause=agg_where_clause)
+            for widget, query in AGG_WIDGET_QUERIES.items()
+        }
+    return {widget: query.format(where_clause=where_clause) for widget, query in FACT_WIDGET_QUERIES.items()}
+
+
+def _is_timeout(error):
+    # 57014 = query_canceled, raised when SET LOCAL statement_timeout expires
+    return getattr(getattr(error, 'orig', None), 'pgcode', None) == '57014'
+
+
+def iter_dashboard_widgets(start, end, cats, use_aggregates=None):
+    """
+    Run every widget query concurrently and yield (widget, DataFrame, source,
+    error) as each one finishes, so the page can draw it straight away.
+
+    Each statement gets WIDGET_QUERY_TIMEOUT_MS on the server. A widget whose
+    aggregate query fails for any other reason is retried on the fact table;
+    widgets still missing after DASHBOARD_RENDER_TIMEOUT are yielded with an
+    empty frame and an error instead of holding up the rest of the page.
+    """
+    if use_aggregates is None:
+        use_aggregates = aggregates_available()
+
+    params = get_filter_params(start, end, cats)
+    source = 'aggregates' if use_aggregates else 'fact'
+    fact_queries = widget_queries(cats, use_aggregates=False) if use_aggregates else None
+
+    def submit(query):
+        return _executor.submit(read_query, query, params, timeout_ms=settings.WIDGET_QUERY_TIMEOUT_MS)
+
+    futures = {submit(query): (widget, source) for widget, query in widget_queries(cats, use_aggregates).items()}
+    pending = set(futures)
+    deadline = time.monotonic() + settings.DASHBOARD_RENDER_TIMEOUT
+    while pending:
+        done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            widget, widget_source = futures[future]
+            error = future.exception()
+            if error is None:
+                yield widget, shape_widget(widget, future.result()), widget_source, None
+            elif widget_source == 'aggregates' and not _is_timeout(error):
+                retry = submit(fact_queries[widget])
+                futures[retry] = (widget, 'fact')
+                pending.add(retry)
+            else:
+                yield widget, pd.DataFrame(), widget_source, error
+
+    for future in pending:
+        # Still running: the server-side statement_timeout ends it, the result is dropped
+        future.cancel()
+        widget, widget_source = futures[future]
+        yield widget, pd.DataFrame(), widget_source, TimeoutError(
+            f"{widget} query did not finish within {settings.DASHBOARD_RENDER_TIMEOUT}s"
+        )
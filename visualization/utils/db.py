@@ -1,17 +1,119 @@
 # utils/db.py
-import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, text
 import pandas as pd
- 
+from config import settings
+from utils.cache import QueryCache
+from utils.metrics import start_metrics_server
+
+_cache = QueryCache(
+    ttl_seconds=settings.QUERY_CACHE_TTL,
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+)
+_last_version_check = 0.0
+# Sessions query concurrently: only one of them polls per interval
+_version_check_lock = threading.Lock()
+
+_engine = None
+_engine_lock = threading.Lock()
+_pool_events = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+# Pool events fire on whichever thread checks a connection in or out
+# (concurrent widget queries), so the read-modify-write needs a lock
+_pool_events_lock = threading.Lock()
+
+def _count(name):
+    def listener(*args):
+        with _pool_events_lock:
+            _pool_events[name] += 1
+    return listener
+
 def get_engine():
-    user = os.getenv("POSTGRES_USER")
-    pwd = os.getenv("POSTGRES_PASSWORD")
-    host = os.getenv("POSTGRES_HOST")
-    db = os.getenv("POSTGRES_DB")
+    # One pooled engine per process: every rerun and session shares the same
+    # connections instead of paying a new TCP/auth handshake per query.
+    global _engine
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = create_engine(
+                settings.DATABASE_URL,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_pre_ping=True,
+                connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+            )
+            event.listen(engine, "connect", _count("connects"))
+            event.listen(engine, "checkout", _count("checkouts"))
+            event.listen(engine, "checkin", _count("checkins"))
+            event.listen(engine, "invalidate", _count("invalidations"))
+            _engine = engine
+            start_metrics_server(settings.DB_METRICS_PORT, collect_metrics)
+    return _engine
 
-    conn_str = f"postgresql://{user}:{pwd}@{host}:5432/{db}"
-    return create_engine(conn_str)
+def _pool_event_counts():
+    with _pool_events_lock:
+        return dict(_pool_events)
 
-def read_query(query):
+def pool_metrics():
     engine = get_engine()
-    return pd.read_sql(query, engine)
\ No newline at end of file
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "pool_checked_out": pool.checkedout(),
+        "pool_checked_in": pool.checkedin(),
+        "pool_overflow": max(pool.overflow(), 0),
+        "pool_max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_utilization": pool.checkedout() / (pool.size() + settings.DB_MAX_OVERFLOW),
+        **{f"pool_{name}_total": count for name, count in _pool_event_counts().items()},
+    }
+
+def collect_metrics():
+    metrics = pool_metrics()
+    metrics.update({f"cache_{name}": value for name, value in cache_stats().items()})
+    return metrics
+
+def _check_load_version(engine):
+    # The ETL bumps meta.etl_loadversion after every successful load.
+    # Poll it at most once per interval instead of on every query.
+    global _last_version_check
+    with _version_check_lock:
+        now = time.monotonic()
+        if now - _last_version_check < settings.LOAD_VERSION_CHECK_INTERVAL:
+            return
+        _last_version_check = now
+    try:
+        df = pd.read_sql(text("SELECT version FROM meta.etl_loadversion WHERE id = 1"), engine)
+    except Exception:
+        # A failed poll says nothing about the data: keep the known version
+        # (and every session's cached results) until the next poll
+        return
+    _cache.set_load_version(int(df.iloc[0, 0]) if not df.empty else None)
+
+def _read_sql(engine, query, params, timeout_ms):
+    if not timeout_ms:
+        return pd.read_sql(text(query), engine, params=params)
+    # SET LOCAL only lasts until the end of this transaction, so the connection
+    # goes back to the pool with the engine-wide statement_timeout
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+        return pd.read_sql(text(query), conn, params=params)
+
+def read_query(query, params=None, use_cache=True, timeout_ms=None):
+    engine = get_engine()
+    if not use_cache:
+        return _read_sql(engine, query, params, timeout_ms)
+
+    _check_load_version(engine)
+    key = QueryCache.make_key(query, params)
+    df = _cache.get(key)
+    if df is None:
+        df = _read_sql(engine, query, params, timeout_ms)
+        _cache.set(key, df)
+    # Callers cast columns in place, so never hand out the cached frame itself
+    return df.copy()
+
+def cache_stats():
+    return _cache.stats()
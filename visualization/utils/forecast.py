@@ -0,0 +1,86 @@
+# utils/forecast.py
+import json
+import pandas as pd
+from utils.db import read_query
+
+# Forecasts are precomputed by the ETL (refresh_forecast in etl.py) into
+# dwh.forecast / dwh.forecast_model, one series per total / category / city.
+# The Prediction page only reads these small tables plus the daily aggregates
+# for the history line; nothing is trained on request.
+
+SERIES_QUERY = """
+SELECT seriestype, seriesname
+FROM dwh.forecast_model
+ORDER BY seriestype, seriesname
+"""
+
+# Daily revenue history per series type, from the dwh.aggdaily* tables
+HISTORY_QUERIES = {
+    'total': """
+        SELECT a.fulldate, SUM(a.revenue) as revenue
+        FROM dwh.aggdailycategory a
+        GROUP BY a.fulldate
+        ORDER BY a.fulldate
+    """,
+    'category': """
+        SELECT a.fulldate, SUM(a.revenue) as revenue
+        FROM dwh.aggdailycategory a
+        WHERE a.categoryname = :series_name
+        GROUP BY a.fulldate
+        ORDER BY a.fulldate
+    """,
+    'city': """
+        SELECT a.fulldate, SUM(a.revenue) as revenue
+        FROM dwh.aggdailycity a
+        WHERE a.cityname = :series_name
+        GROUP BY a.fulldate
+        ORDER BY a.fulldate
+    """,
+}
+
+FORECAST_QUERY = """
+SELECT fulldate, revenue
+FROM dwh.forecast
+WHERE seriestype = :series_type AND seriesname = :series_name
+ORDER BY fulldate
+"""
+
+MODEL_QUERY = """
+SELECT trainedthrough, trainingdays, coefficients, rmse, fittedat
+FROM dwh.forecast_model
+WHERE seriestype = :series_type AND seriesname = :series_name
+"""
+
+
+def list_series():
+    """Available series as {series type: [series names]}."""
+    df = read_query(SERIES_QUERY)
+    return {series_type: group['seriesname'].tolist() for series_type, group in df.groupby('seriestype')}
+
+
+def load_forecast(series_type, series_name):
+    """
+    History, forecast and model summary for one series.
+    Returns (combined DataFrame with a 'type' column, model dict or None).
+    """
+    params = {'series_type': series_type, 'series_name': series_name}
+    history = read_query(HISTORY_QUERIES[series_type], params)
+    forecast = read_query(FORECAST_QUERY, params)
+    model = read_query(MODEL_QUERY, params)
+
+    history['type'] = 'Historical'
+    forecast['type'] = 'Forecast'
+    combined = pd.concat([history, forecast], ignore_index=True)
+    combined['fulldate'] = pd.to_datetime(combined['fulldate'])
+    combined['revenue'] = pd.to_numeric(combined['revenue'], errors='coerce').astype(float)
+
+    if model.empty:
+        return combined, None
+    row = model.iloc[0]
+    return combined, {
+        'trained_through': row['trainedthrough'],
+        'training_days': int(row['trainingdays']),
+        'coefficients': json.loads(row['coefficients']),
+        'rmse': float(row['rmse']) if row['rmse'] is not None else None,
+        'fitted_at': row['fittedat'],
+    }
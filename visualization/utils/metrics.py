@@ -0,0 +1,52 @@
+# utils/metrics.py
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def format_metrics(metrics, prefix="dashboard"):
+    """Render a flat {name: number} dict in Prometheus text exposition format."""
+    lines = []
+    for name, value in sorted(metrics.items()):
+        if value is None or isinstance(value, bool):
+            continue
+        lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port, collect):
+    """
+    Serve collect() on http://0.0.0.0:<port>/metrics from a daemon thread.
+    Safe to call on every Streamlit rerun: only the first call starts a server.
+    """
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = format_metrics(collect()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError:
+            # Port already taken (e.g. another worker process exports it)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server